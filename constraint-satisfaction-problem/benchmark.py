@@ -0,0 +1,279 @@
+import sys
+import os
+import json
+import time
+import platform
+import resource
+import argparse
+import statistics
+import subprocess
+import multiprocessing
+import generate
+import minconflicts
+import solver
+"""Map coloring problem: benchmark harness"""
+
+# (kind, variables, colors, generator options) of the default corpus, each
+# built with seeds 0 .. instances - 1
+CORPUS = (
+    ('er', 200, 3, {'degree': 3.0}),
+    ('er', 2000, 4, {'degree': 5.0}),
+    ('delaunay', 500, 4, {}),
+    ('delaunay', 5000, 4, {}),
+    ('delaunay', 300, 3, {'keep': 0.6}),
+    ('threshold', 100, 3, {}),
+    ('threshold', 100, 3, {'planted': True}),
+)
+
+# statuses which answer the problem
+DECIDED = ('solved', 'unsatisfiable')
+
+# runs faster than this are too noisy to be reported as regressions
+NOISE_FLOOR = 0.05
+
+
+def build_corpus(directory, instances=3, corpus=CORPUS):
+    '''
+    write the instances of corpus into directory, keeping the files which
+    are already there
+    returns [(name, path)]
+    '''
+    os.makedirs(directory, exist_ok=True)
+    ret = []
+
+    for (kind, X, D, options) in corpus:
+        for seed in range(instances):
+            name = '-'.join(
+                [kind, str(X), str(D)] +
+                ['%s%s' % (key, '' if value is True else value)
+                 for (key, value) in sorted(options.items())] + [str(seed)])
+            path = os.path.join(directory, name + '.txt')
+            if not os.path.exists(path):
+                edges = generate.generate(kind, X, D, seed, **options)
+                generate.write_problem(path, X, D, edges)
+            ret.append((name, path))
+
+    return ret
+
+
+def measure(conn, path, algorithm, timeout, seed):
+    '''
+    runs in a child process: solve, then send the result and the peak RSS
+    '''
+    try:
+        result = solver.solve(path, None, algorithm, timeout, seed)
+        del result['assignment']
+    except Exception as error:
+        result = {'status': 'error', 'error': repr(error)}
+
+    result['rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send(result)
+    conn.close()
+
+
+def run(path, algorithm, timeout, seed):
+    '''
+    solve one instance in a fresh process, so the peak RSS is its own; a
+    process still running 10 seconds past its timeout is killed
+    '''
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=measure, args=(sender, path, algorithm, timeout, seed))
+    process.start()
+    sender.close()
+
+    if receiver.poll(None if timeout is None else timeout + 10):
+        result = receiver.recv()
+    else:
+        result = {'status': 'killed'}
+
+    if process.is_alive():
+        process.terminate()
+    process.join()
+
+    return result
+
+
+def percentile(values, share):
+    '''
+    returns the share (0 to 1) percentile of the sorted values, linearly
+    interpolated between the two closest ranks, so a small number of runs
+    still gets a tail estimate rather than one of its middle values
+    '''
+    rank = share * (len(values) - 1)
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(results):
+    '''
+    returns {algorithm: aggregate of its runs}
+    '''
+    ret = {}
+
+    for algorithm in sorted(set(record['algorithm'] for record in results)):
+        runs = [record for record in results
+                if record['algorithm'] == algorithm]
+        times = sorted(record.get('time', 0) for record in runs)
+        decided = [record for record in runs if record['status'] in DECIDED]
+        ret[algorithm] = {
+            'runs': len(runs),
+            'decided': len(decided),
+            'success_rate': len(decided) / len(runs),
+            'median_time': statistics.median(times),
+            'p90_time': percentile(times, 0.9),
+            'p99_time': percentile(times, 0.99),
+            'total_time': sum(times),
+            'nodes': sum(record.get('nodes', 0) for record in runs),
+            'prunes': sum(record.get('prunes', 0) for record in runs),
+            'max_rss_kb': max(record.get('rss_kb', 0) for record in runs)
+        }
+
+    return ret
+
+
+def compare(baseline, report, tolerance):
+    '''
+    returns the runs of report which got slower than tolerance times their
+    baseline run, or which no longer answer the problem
+    '''
+    before = dict(((record['instance'], record['algorithm']), record)
+                  for record in baseline['results'])
+    ret = []
+
+    for record in report['results']:
+        old = before.get((record['instance'], record['algorithm']))
+        if old is None or old['status'] not in DECIDED:
+            continue
+
+        if record['status'] not in DECIDED:
+            reason = 'status %s, was %s' % (record['status'], old['status'])
+        elif record['time'] > max(tolerance * old['time'], NOISE_FLOOR):
+            reason = 'time %.3fs, was %.3fs' % (record['time'], old['time'])
+        else:
+            continue
+
+        ret.append({
+            'instance': record['instance'],
+            'algorithm': record['algorithm'],
+            'reason': reason
+        })
+
+    return ret
+
+
+def revision():
+    '''
+    returns the git commit of the working tree, or None
+    '''
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(instances, algorithms, timeout=10, seed=0, progress=None):
+    '''
+    run every algorithm on every (name, path) of instances
+    returns the report: environment, one record per run and the summary
+    '''
+    results = []
+
+    for (name, path) in instances:
+        for algorithm in algorithms:
+            record = {'instance': name, 'algorithm': algorithm}
+            record.update(run(path, algorithm, timeout, seed))
+            results.append(record)
+            if progress is not None:
+                progress(record)
+
+    return {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'timeout': timeout,
+        'seed': seed,
+        'results': results,
+        'summary': summarize(results)
+    }
+
+
+def parse_arguments(argv):
+    algorithms = [algorithm for algorithm in solver.ALGORITHMS
+                  if algorithm != 'numpy' or minconflicts.np is not None]
+
+    parser = argparse.ArgumentParser(
+        prog='benchmark.py',
+        description='run the map coloring solvers over a corpus of '
+        'generated instances and report the results as JSON')
+    parser.add_argument('input_files', nargs='*',
+                        help='more instances to run besides the corpus')
+    parser.add_argument('--corpus', default='benchmark-corpus',
+                        help='directory of the generated instances')
+    parser.add_argument('--instances', type=int, default=3,
+                        help='seeds per kind of instance, 0 skips the corpus')
+    parser.add_argument('--algorithms', default=','.join(algorithms),
+                        help='comma separated list out of %s' %
+                        ', '.join(solver.ALGORITHMS))
+    parser.add_argument('--timeout', type=float, default=10,
+                        help='seconds per run')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the solvers')
+    parser.add_argument('--output', default=None,
+                        help='write the report there instead of stdout')
+    parser.add_argument('--baseline', default=None,
+                        help='report of an earlier version; exit with 1 if '
+                        'a run got slower or stopped answering')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='slowdown factor tolerated against --baseline')
+    parser.add_argument('--quiet', action='store_true',
+                        help='do not print every run to stderr')
+
+    args = parser.parse_args(argv[1:])
+    args.algorithms = args.algorithms.split(',')
+
+    for algorithm in args.algorithms:
+        if algorithm not in solver.ALGORITHMS:
+            parser.error('unknown algorithm: %s' % algorithm)
+
+    return args
+
+
+def main():
+    args = parse_arguments(sys.argv)
+
+    instances = build_corpus(args.corpus, args.instances) + [
+        (os.path.basename(path), path) for path in args.input_files
+    ]
+
+    def progress(record):
+        print('%s %s: %s %.3fs' % (record['instance'], record['algorithm'],
+                                   record['status'], record.get('time', 0)),
+              file=sys.stderr)
+
+    report = benchmark(instances, args.algorithms, args.timeout, args.seed,
+                       None if args.quiet else progress)
+
+    if args.baseline is not None:
+        with open(args.baseline) as fp:
+            report['regressions'] = compare(json.load(fp), report,
+                                            args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        with open(args.output, 'w') as fp:
+            fp.write(text + '\n')
+    else:
+        print(text)
+
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
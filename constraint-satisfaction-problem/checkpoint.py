@@ -0,0 +1,142 @@
+import os
+import time
+import zlib
+import pickle
+import random
+import signal
+"""Search checkpoints for the map coloring solvers"""
+
+CHECKPOINT_VERSION = 1
+
+
+def fingerprint(graph):
+    '''
+    returns what identifies the constraint graph a checkpoint belongs to
+    '''
+    return (graph.X, graph.D, graph.E, zlib.crc32(graph.indices))
+
+
+def terminated():
+    '''
+    returns a callable for DEADLINE(cancelled=...) which turns true once the
+    process received SIGTERM, so the search stops at its next poll and its
+    state can still be saved
+    '''
+    received = []
+    signal.signal(signal.SIGTERM,
+                  lambda signum, frame: received.append(signum))
+
+    return lambda: bool(received)
+
+
+class CHECKPOINT:
+    '''
+    search state of a solver saved to a file, so a run which was stopped
+    can be resumed instead of starting over
+        engine: provides snapshot(csp), returning its state as plain Python
+                data, and restore(csp, state); CHECKPOINT adds the counters of
+                the csp, the state of the random module and a fingerprint of
+                the graph
+        file: pickled, and written next to its path before being renamed
+              over it, so a process killed while saving leaves the previous
+              checkpoint intact
+        ticks: with an interval, the search loops call tick() where they
+               poll their deadline and the state is saved every interval
+               seconds
+    '''
+
+    def __init__(self, path, solver, interval=None):
+        '''
+        path: file of the checkpoint
+        solver: name of the solver, a checkpoint is only resumed by the
+                solver which wrote it
+        interval: seconds between saves during the search, None only saves
+                  when asked to
+        '''
+        self.path = path
+        self.solver = solver
+        self.interval = interval
+        self.next = None if interval is None else time.monotonic() + interval
+
+    def watch(self, csp):
+        '''
+        save the search of csp every interval seconds, if one was given
+        '''
+        if self.interval is not None:
+            csp.checkpoint = self
+
+    def due(self):
+        '''
+        returns true iff the next periodic save is due
+        '''
+        now = time.monotonic()
+        if now < self.next:
+            return False
+
+        self.next = now + self.interval
+        return True
+
+    def tick(self, engine, csp):
+        if self.due():
+            self.save(engine, csp)
+
+    def save(self, engine, csp):
+        record = {
+            'version': CHECKPOINT_VERSION,
+            'solver': self.solver,
+            'graph': fingerprint(csp.graph),
+            'random': random.getstate(),
+            'counters': dict((attribute, getattr(csp, attribute))
+                             for (_, attribute) in csp.COUNTERS),
+            'state': engine.snapshot(csp)
+        }
+
+        partial = self.path + '.partial'
+        with open(partial, 'wb') as fp:
+            pickle.dump(record, fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(partial, self.path)
+
+    def load(self, engine, csp):
+        '''
+        restore the search state saved for csp into engine and csp
+        returns false if there is no checkpoint yet
+        raises ValueError on a corrupt checkpoint, or one written by another
+        solver or for another graph
+        '''
+        try:
+            fp = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+
+        with fp:
+            try:
+                record = pickle.load(fp)
+            except (pickle.UnpicklingError, EOFError, AttributeError,
+                    ImportError, IndexError):
+                raise ValueError('corrupt checkpoint: %s' % self.path)
+
+        if not isinstance(record, dict) or \
+                record.get('version') != CHECKPOINT_VERSION:
+            raise ValueError('unknown checkpoint version: %s' % self.path)
+        if record['solver'] != self.solver:
+            raise ValueError('checkpoint of %s, not %s' %
+                             (record['solver'], self.solver))
+        if record['graph'] != fingerprint(csp.graph):
+            raise ValueError('checkpoint of another graph: %s' % self.path)
+
+        engine.restore(csp, record['state'])
+        for (attribute, value) in record['counters'].items():
+            setattr(csp, attribute, value)
+        # last, since restoring may draw random tie-breaks
+        random.setstate(record['random'])
+
+        return True
+
+    def discard(self):
+        '''
+        remove the checkpoint once the search is over
+        '''
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,278 @@
+import sys
+import json
+import time
+import random
+import argparse
+from collections import deque
+import minconflicts
+import solver
+from deadline import CANCELLED, DEADLINE
+from graph import color_peeled, degeneracy_order, has_self_loop, \
+    load_graph
+"""Map coloring problem: find the fewest colors a map needs"""
+
+# min-conflicts steps allowed to repair the coloring after removing a color,
+# and at most that many per variable: on a small map the exhaustive search
+# settles the question long before
+DEFAULT_STEPS = 100000
+STEPS_PER_VARIABLE = 1000
+
+# color classes tried, smallest first, before giving up on removing a color
+DEFAULT_ATTEMPTS = 3
+
+
+def greedy_clique(graph):
+    '''
+    returns a clique of graph, whose size is a lower bound on the number of
+    colors: every variable starts a clique which is completed greedily out
+    of its neighbours later in degeneracy order, at most degeneracy of them,
+    those with the most neighbours among them first
+    self-loops are ignored
+    '''
+    order = degeneracy_order(graph)
+    position = [0] * graph.X
+    for (idx, variable) in enumerate(order):
+        position[variable] = idx
+
+    neighbours = [set(graph.neighbours(variable))
+                  for variable in range(graph.X)]
+    best = order[:1]
+
+    for variable in order:
+        later = set(neighbour for neighbour in neighbours[variable]
+                    if position[neighbour] > position[variable])
+        if len(later) < len(best):
+            continue
+
+        clique = [variable]
+        for candidate in sorted(later, key=lambda neighbour:
+                                -len(neighbours[neighbour] & later)):
+            if all(candidate in neighbours[member] for member in clique):
+                clique.append(candidate)
+
+        if len(clique) > len(best):
+            best = clique
+
+    return best
+
+
+def is_bipartite(graph):
+    '''
+    returns true iff graph has no odd cycle, i.e. two colors are enough
+    '''
+    side = [-1] * graph.X
+
+    for root in range(graph.X):
+        if side[root] >= 0:
+            continue
+
+        side[root] = 0
+        queue = deque([root])
+        while queue:
+            variable = queue.popleft()
+            for neighbour in graph.neighbours(variable):
+                if side[neighbour] < 0:
+                    side[neighbour] = 1 - side[variable]
+                    queue.append(neighbour)
+                elif side[neighbour] == side[variable]:
+                    return False
+
+    return True
+
+
+def lower_bound(graph):
+    '''
+    returns a number of colors graph cannot be colored with less than
+    '''
+    ret = len(greedy_clique(graph))
+
+    if ret < 3 and not is_bipartite(graph):
+        ret = 3
+
+    return ret
+
+
+def remove_color(graph, assignment, color, colors):
+    '''
+    returns assignment with one color less: color is dropped, the colors
+    above it move down by one, and the variables which held it take the
+    value shared with the fewest of their neighbours
+    '''
+    ret = {}
+    removed = []
+
+    for (variable, value) in enumerate(assignment):
+        if value == color:
+            removed.append(variable)
+        else:
+            ret[variable] = value if value < color else value - 1
+
+    for variable in removed:
+        counts = [0] * (colors - 1)
+        for neighbour in graph.neighbours(variable):
+            if neighbour in ret:
+                counts[ret[neighbour]] += 1
+        ret[variable] = counts.index(min(counts))
+
+    return ret
+
+
+def solve(problem, timeout=60, seed=None, steps=DEFAULT_STEPS,
+          attempts=DEFAULT_ATTEMPTS, exact=True, cancelled=None):
+    '''
+    color a map with as few colors as possible within timeout
+    starts from a greedy coloring in degeneracy order, then repeatedly drops
+    a color class, smallest first: the variables of that class are given
+    another color and MINCONFLICTS repairs the conflicts this leaves,
+    starting from the previous coloring instead of from scratch
+    stops once the number of colors meets lower_bound, or once attempts
+    classes could not be removed; with exact, DFSB mode 1 then searches a
+    coloring with one color less for the rest of the time, which either
+    finds one, and the reduction goes on, or proves the last one optimal
+    inputs: problem, see solver.as_graph; its number of colors is not used
+            timeout, seed, cancelled: as solver.solve
+            steps: min-conflicts steps allowed for each class, see
+                   STEPS_PER_VARIABLE
+    returns: {
+              'status': 'optimal' (no coloring with fewer colors exists),
+                        'solved' (no proof of that, e.g. the time ran out)
+                        or 'unsatisfiable' (a self-loop leaves no coloring
+                        at all)
+              'colors': number of colors of assignment
+              'lower_bound': the best lower bound shown, equal to colors
+                             when optimal
+              'assignment': value of every variable, or None
+              'steps': min-conflicts steps
+              'nodes': DFSB nodes
+              'time': seconds spent, parsing included
+              }
+    raises ValueError on a malformed problem
+    '''
+    start = time.monotonic()
+    deadline = DEADLINE(timeout, cancelled)
+    # the number of colors of the problem is replaced by each search anyway
+    graph = solver.as_graph(problem, 1)
+
+    if seed is not None:
+        random.seed(seed)
+
+    ret = {
+        'status': 'solved',
+        'colors': 0,
+        'lower_bound': 0,
+        'assignment': [],
+        'steps': 0,
+        'nodes': 0
+    }
+
+    if has_self_loop(graph):
+        ret.update(status='unsatisfiable', colors=None, assignment=None)
+    elif graph.X > 0:
+        assignment = color_peeled(graph, [], [],
+                                  degeneracy_order(graph)[::-1])
+        ret['assignment'] = assignment
+        ret['colors'] = max(assignment) + 1
+        ret['lower_bound'] = lower_bound(graph)
+        try:
+            reduce_colors(graph, ret, deadline, steps, attempts, exact)
+        except (TimeoutError, CANCELLED):
+            pass
+
+    if ret['colors'] is not None and ret['colors'] <= ret['lower_bound']:
+        ret['status'] = 'optimal'
+    ret['time'] = time.monotonic() - start
+
+    return ret
+
+
+def reduce_colors(graph, ret, deadline, steps, attempts, exact):
+    '''
+    the reduction loop of solve, which updates ret as colors are removed
+    '''
+    while ret['colors'] > ret['lower_bound']:
+        colors = ret['colors']
+        assignment = ret['assignment']
+        sizes = [0] * colors
+        for value in assignment:
+            sizes[value] += 1
+        classes = sorted(range(colors), key=sizes.__getitem__)
+        budget = min(steps, STEPS_PER_VARIABLE * graph.X)
+
+        for color in classes[:attempts]:
+            csp = minconflicts.CSP(
+                graph.with_values(colors - 1), None,
+                assignment=remove_color(graph, assignment, color, colors))
+            csp.deadline = deadline
+            try:
+                solution = minconflicts.MINCONFLICTS().main_process(csp,
+                                                                    budget)
+            finally:
+                ret['steps'] += csp.counter
+
+            if csp.goal_test(solution):
+                ret['assignment'] = [solution[variable]
+                                     for variable in range(graph.X)]
+                ret['colors'] = colors - 1
+                break
+        else:
+            if not exact:
+                return
+
+            remaining = None
+            if deadline.expires is not None:
+                remaining = max(0, deadline.expires - time.monotonic())
+            result = solver.solve(graph.with_values(colors - 1), None,
+                                  'dfsb1', remaining, None,
+                                  deadline.cancelled, peel=True)
+            ret['nodes'] += result['nodes']
+
+            if result['status'] == 'unsatisfiable':
+                ret['lower_bound'] = colors
+            elif result['status'] == 'solved':
+                ret['assignment'] = result['assignment']
+                ret['colors'] = colors - 1
+                continue
+            return
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='chromatic.py',
+        description='color a map with as few colors as possible; the '
+        'number of colors of the input file is ignored')
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--steps', type=int, default=DEFAULT_STEPS,
+                        help='min-conflicts steps allowed to remove a color')
+    parser.add_argument('--attempts', type=int, default=DEFAULT_ATTEMPTS,
+                        help='color classes tried before the exhaustive '
+                        'search')
+    parser.add_argument('--no-exact', dest='exact', action='store_false',
+                        help='stop once local search cannot remove a color '
+                        'instead of searching exhaustively')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse/write a binary graph cache next to the '
+                        'input file')
+
+    return parser.parse_args(argv[1:])
+
+
+def main():
+    args = parse_arguments(sys.argv)
+
+    try:
+        result = solve(load_graph(args.input_file, args.cache), args.timeout,
+                       args.seed, args.steps, args.attempts, args.exact)
+    except ValueError:
+        print('Invalid input file')
+        sys.exit(-1)
+
+    solver.write_output(args.output_file, result)
+    print(json.dumps(dict((key, value) for (key, value) in result.items()
+                          if key != 'assignment')))
+
+
+if __name__ == '__main__':
+    main()
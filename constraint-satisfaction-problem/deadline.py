@@ -0,0 +1,38 @@
+import time
+"""Cooperative time limits and cancellation for the map coloring solvers"""
+
+
+class CANCELLED(Exception):
+    '''
+    raised by DEADLINE.check() once the search has been cancelled
+    '''
+
+
+class DEADLINE:
+    '''
+    time limit and cancellation token polled by the search loops through
+    check(), so a solve can be bounded or stopped without the process-wide
+    SIGALRM of the old TIMER and several solves can run in one process
+    '''
+
+    def __init__(self, timeout=None, cancelled=None):
+        '''
+        timeout: seconds from now, None never expires
+        cancelled: callable returning true once the search should stop,
+                   e.g. a flag in shared memory set by another process
+        '''
+        self.timeout = timeout
+        self.expires = None if timeout is None else time.monotonic() + timeout
+        self.cancelled = cancelled
+
+    def expired(self):
+        return self.expires is not None and time.monotonic() >= self.expires
+
+    def check(self):
+        '''
+        raise CANCELLED once cancelled, TimeoutError once the deadline passed
+        '''
+        if self.cancelled is not None and self.cancelled():
+            raise CANCELLED
+        if self.expires is not None and time.monotonic() >= self.expires:
+            raise TimeoutError
@@ -0,0 +1,299 @@
+import sys
+import time
+import argparse
+import multiprocessing
+from collections import deque
+import solver
+from graph import color_peeled, has_self_loop, k_core, load_graph, \
+    subgraph
+"""Map coloring problem: solve connected or biconnected pieces separately"""
+
+
+def components(graph):
+    '''
+    returns the connected components of graph, as lists of variables
+    '''
+    component = [-1] * graph.X
+    ret = []
+
+    for root in range(graph.X):
+        if component[root] >= 0:
+            continue
+
+        label = len(ret)
+        component[root] = label
+        members = [root]
+        stack = [root]
+        while stack:
+            variable = stack.pop()
+            for neighbour in graph.neighbours(variable):
+                if component[neighbour] < 0:
+                    component[neighbour] = label
+                    members.append(neighbour)
+                    stack.append(neighbour)
+
+        ret.append(members)
+
+    return ret
+
+
+def blocks(graph):
+    '''
+    returns the biconnected components (blocks) of graph, as lists of
+    variables; two blocks share at most one variable, an articulation point,
+    and an isolated variable is a block of its own
+    self-loops are ignored
+    reference: Hopcroft and Tarjan, Algorithm 447, run on an explicit stack
+    '''
+    depth = [-1] * graph.X
+    low = [0] * graph.X
+    ret = []
+
+    for root in range(graph.X):
+        if depth[root] >= 0:
+            continue
+
+        depth[root] = 0
+        found = len(ret)
+        edges = []
+        stack = [(root, -1, iter(graph.neighbours(root)))]
+
+        while stack:
+            variable, parent, neighbours = stack[-1]
+
+            for neighbour in neighbours:
+                if neighbour == variable:
+                    continue
+                if depth[neighbour] < 0:
+                    depth[neighbour] = low[neighbour] = depth[variable] + 1
+                    edges.append((variable, neighbour))
+                    stack.append((neighbour, variable,
+                                  iter(graph.neighbours(neighbour))))
+                    break
+                if neighbour != parent and depth[neighbour] < depth[variable]:
+                    low[variable] = min(low[variable], depth[neighbour])
+                    edges.append((variable, neighbour))
+            else:
+                stack.pop()
+                if parent < 0:
+                    continue
+
+                low[parent] = min(low[parent], low[variable])
+                if low[variable] >= depth[parent]:
+                    # parent separates the edges pushed since (parent,
+                    # variable) from the rest of the graph
+                    block = set()
+                    while True:
+                        edge = edges.pop()
+                        block.update(edge)
+                        if edge == (parent, variable):
+                            break
+                    ret.append(list(block))
+
+        if len(ret) == found:
+            ret.append([root])
+
+    return ret
+
+
+def stitch(X, pieces, colorings):
+    '''
+    returns the assignment of the X variables combining the colorings of
+    every piece; a piece sharing an articulation point with a piece already
+    placed gets two of its colors swapped so both agree on that variable
+    pieces are placed in breadth first order of the block-cut tree, so each
+    one meets at most one variable that is already colored
+    '''
+    owners = {}
+    for (idx, piece) in enumerate(pieces):
+        for variable in piece:
+            owners.setdefault(variable, []).append(idx)
+
+    assignment = [None] * X
+    placed = [False] * len(pieces)
+
+    for start in range(len(pieces)):
+        if placed[start]:
+            continue
+
+        placed[start] = True
+        queue = deque([start])
+        while queue:
+            idx = queue.popleft()
+            piece = pieces[idx]
+            coloring = colorings[idx]
+
+            swap = {}
+            for (variable, value) in zip(piece, coloring):
+                if assignment[variable] is not None:
+                    swap = {value: assignment[variable],
+                            assignment[variable]: value}
+                    break
+
+            for (variable, value) in zip(piece, coloring):
+                assignment[variable] = swap.get(value, value)
+
+            for variable in piece:
+                for other in owners[variable]:
+                    if not placed[other]:
+                        placed[other] = True
+                        queue.append(other)
+
+    return assignment
+
+
+def trivial(graph, piece):
+    '''
+    returns the coloring of a piece too small to be worth a search, False
+    if it has none, or None for any other piece
+    '''
+    if len(piece) == 1:
+        return [0]
+    if len(piece) == 2:
+        # a connected piece of two variables is a single constraint
+        return [0, 1] if graph.D >= 2 else False
+
+    return None
+
+
+def solve_piece(job):
+    '''
+    solve one piece in a pool process
+    inputs: job, an (index, GRAPH, algorithm, deadline, seed) tuple where
+            deadline is an absolute time.time(), or None
+    returns (index, solver.solve result)
+    '''
+    idx, graph, algorithm, deadline, seed = job
+    timeout = None if deadline is None else max(0, deadline - time.time())
+
+    return idx, solver.solve(graph, None, algorithm, timeout, seed)
+
+
+def solve(problem, colors=None, algorithm='dfsb1', timeout=60, seed=None,
+          cancelled=None, workers=1, biconnected=False, peel=False):
+    '''
+    solve a map coloring problem one connected component at a time, so a
+    failure deep in one component never backtracks over the others
+    inputs: as solver.solve, plus
+            workers: number of processes solving pieces, 1 solves them in
+                     this process (cancelled is only polled then)
+            biconnected: split into blocks instead of connected components
+            peel: as solver.solve, the core is split into pieces
+    returns: as solver.solve, plus 'pieces': number of pieces
+             the first piece which is not solved decides the status
+    raises ValueError on a malformed problem or an unknown algorithm
+    '''
+    if algorithm not in solver.ALGORITHMS:
+        raise ValueError('unknown algorithm: %s' % algorithm)
+
+    start = time.monotonic()
+    deadline = None if timeout is None else time.time() + timeout
+    graph = solver.as_graph(problem, colors)
+    if peel:
+        full = graph
+        core, peeled = k_core(full, full.D)
+        graph = subgraph(full, core)
+    pieces = blocks(graph) if biconnected else components(graph)
+
+    ret = {
+        'status': 'solved',
+        'assignment': None,
+        'nodes': 0,
+        'pieces': len(pieces)
+    }
+    if peel:
+        ret['core'] = graph.X
+
+    if has_self_loop(graph):
+        ret['status'] = 'unsatisfiable'
+        pieces = []
+
+    colorings = [trivial(graph, piece) for piece in pieces]
+    if False in colorings:
+        ret['status'] = 'unsatisfiable'
+        pieces = []
+
+    # largest first, so the pool is not left waiting on one big piece
+    jobs = sorted(
+        ((idx, subgraph(graph, pieces[idx]), algorithm, deadline,
+          None if seed is None else seed + idx)
+         for idx in range(len(pieces)) if colorings[idx] is None),
+        key=lambda job: -job[1].X)
+
+    if workers > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(workers, len(jobs)))
+        results = pool.imap_unordered(solve_piece, jobs)
+    else:
+        pool = None
+        results = (
+            (idx, solver.solve(piece, None, algorithm,
+                               None if deadline is None else
+                               max(0, deadline - time.time()), piece_seed,
+                               cancelled))
+            for (idx, piece, _, _, piece_seed) in jobs)
+
+    try:
+        for (idx, result) in results:
+            ret['nodes'] += result['nodes']
+            if result['status'] != 'solved':
+                ret['status'] = result['status']
+                break
+            colorings[idx] = result['assignment']
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if ret['status'] == 'solved':
+        ret['assignment'] = stitch(graph.X, pieces, colorings)
+        if peel:
+            ret['assignment'] = color_peeled(full, core, ret['assignment'],
+                                             peeled)
+    ret['time'] = time.monotonic() - start
+
+    return ret
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='decompose.py',
+        description='solve the connected components of a map coloring '
+        'problem independently')
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('--algorithm', choices=solver.ALGORITHMS,
+                        default='dfsb1')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes solving components')
+    parser.add_argument('--biconnected', action='store_true',
+                        help='split at articulation points as well')
+    parser.add_argument('--peel', action='store_true',
+                        help='only search the k-core of the graph, k being '
+                        'the number of colors')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse/write a binary graph cache next to the '
+                        'input file')
+    parser.add_argument('--mmap', action='store_true',
+                        help='memory-map the graph cache (implies --cache)')
+
+    return parser.parse_args(argv[1:])
+
+
+def main():
+    args = parse_arguments(sys.argv)
+
+    try:
+        graph = load_graph(args.input_file, args.cache, args.mmap)
+        result = solve(graph, None, args.algorithm, args.timeout, args.seed,
+                       None, args.workers, args.biconnected, args.peel)
+    except ValueError:
+        print('Invalid input file')
+        sys.exit(-1)
+
+    solver.write_output(args.output_file, result)
+
+
+if __name__ == '__main__':
+    main()
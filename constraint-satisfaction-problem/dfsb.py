@@ -1,19 +1,42 @@
 import sys
 import os
-import time
-import signal
-import copy
 import random
+import heapq
+import argparse
+from collections import deque, OrderedDict
+from domain import DOMAIN
+from deadline import CANCELLED, DEADLINE
+from checkpoint import CHECKPOINT, terminated
+from graph import GRAPH, color_peeled, degeneracy_order, has_self_loop, \
+    k_core, load_graph, subgraph
+from stats import STATS
 """Map coloring problem"""
 
 DEBUG = False
 DEBUG_WITH_BREAK = False
 
+# default bound on the number of nogoods learned by mode 2
+DEFAULT_NOGOODS = 10000
+
+# inference run by mode 1 and 2 after each assignment
+#     fc: forward checking, only the neighbours of the assigned variable
+#     ac3: AC3 with the not-equal specific revise
+#     ac3rm: AC3 with residual supports (AC-3rm), a general revise which
+#            caches the last support found for every value
+INFERENCES = ('fc', 'ac3', 'ac3rm')
+DEFAULT_INFERENCE = 'ac3'
+
+# failure limit schedules of DFSB.search_restarting, see RESTARTS
+SCHEDULES = ('luby', 'geometric')
+
 
 # 1 Input file
 # 2 Output file
 # 3 mode 0: plain DFS-B,
 #        1: DFS-B with variable, value ordering + AC3 for constraint propagation
+#        2: mode 1 + conflict-directed backjumping and nogood learning;
+#           both thrash far less than mode 0, mode 2 only pays off over
+#           mode 1 on the hardest instances near the coloring threshold
 class CSP:
     '''
     pseudo code references:
@@ -21,26 +44,68 @@ class CSP:
         for structure enhancement purpose: http://aima.cs.berkeley.edu/python/csp.html
     '''
 
-    def __init__(self, argv):
-        if len(argv) != 4:
-            print('Invalid input arguments. Usage:')
-            print('\tdfsb.py <input_file> <output_file> <mode_flag>')
-            sys.exit(-1)
-
-        self.csp = self.parse_input(argv[1])
-        self.output = argv[2]
-        self.mode = int(argv[3])
-        self.m0_domain = {}
-        self.m1_domain = {}
+    # counters reported by STATS: (name, attribute)
+    COUNTERS = (('nodes', 'counter'), ('backtracks', 'backtrack_counter'),
+                ('arcs', 'prune_counter'), ('revisions', 'revision_counter'),
+                ('pruned', 'removal_counter'), ('supports', 'support_counter'),
+                ('restarts', 'restart_counter'))
+
+    def __init__(self, input_file, output_file=None, mode=1, cache=False,
+                 mapped=False, nogoods=DEFAULT_NOGOODS,
+                 inference=DEFAULT_INFERENCE, symmetry=False):
+        '''
+        input_file: path of the input file, or an already loaded GRAPH
+        nogoods: capacity of the nogood database of mode 2
+        inference: one of INFERENCES, used by mode 1 and 2
+        symmetry: break the symmetry between colors, see
+                  HEURISTICS.order_domain_values
+        raises ValueError on a malformed input file, an unknown mode or an
+        unknown inference
+        '''
+        self.csp = self.parse_input(input_file, cache, mapped)
+        self.output = output_file
+        self.mode = mode
+        self.inference = inference
+        self.symmetry = symmetry
+        # number of assigned variables holding each value
+        self.value_counter = [0] * self.csp['D']
+        self.m0_domain = None
+        self.m1_domain = None
+        self.order = None
+        self.selector = None
+        self.nogoods = None
+        self.pruned_by = None
+        self.conflict = None
+        self.residues = {}
+        self.deadline = DEADLINE()
+        self.stats = None
+        self.checkpoint = None
+        # (full graph, core, peeled) when only the core of the input is
+        # searched, see expand
+        self.peeled = None
         self.counter = 0
+        self.backtrack_counter = 0
+        # arcs processed, arcs revised, values removed and supports checked
+        # by inference
         self.prune_counter = 0
+        self.revision_counter = 0
+        self.removal_counter = 0
+        self.support_counter = 0
+        self.restart_counter = 0
 
         self.input_checking()
 
         if self.mode == 0:
             self.init_m0_domain()
+            self.order = degeneracy_order(self.graph)
         else:
             self.init_m1_domain()
+            self.selector = SELECTOR(self)
+
+        if self.mode == 2:
+            self.nogoods = NOGOODS(nogoods)
+            self.pruned_by = [[-1] * self.csp['D']
+                              for _ in range(self.csp['X'])]
 
     def print_csp(self):
         attrs = vars(self)
@@ -48,74 +113,48 @@ class CSP:
 
     def input_checking(self):
         '''
-        input argument checking, if mode is not 0 or 1, exit
+        input argument checking, if mode is not 0, 1 or 2 or inference is
+        not one of INFERENCES, raise ValueError
         '''
-        if self.mode != 0 and self.mode != 1:
-            print('Invalid input file')
-            sys.exit(-1)
+        if self.mode not in (0, 1, 2):
+            raise ValueError('invalid mode: %r' % self.mode)
+        if self.inference not in INFERENCES:
+            raise ValueError('invalid inference: %r' % self.inference)
 
     def init_m0_domain(self):
-        for variable in range(self.csp['X']):
-            self.m0_domain[variable] = [
-                value for value in range(self.csp['D'])
-            ]
+        self.m0_domain = DOMAIN(self.csp['X'], self.csp['D'])
 
     def init_m1_domain(self):
-        for variable in range(self.csp['X']):
-            self.m1_domain[variable] = [
-                value for value in range(self.csp['D'])
-            ]
+        self.m1_domain = DOMAIN(self.csp['X'], self.csp['D'])
 
-    def parse_input(self, file_name):
+    def parse_input(self, file_name, cache=False, mapped=False):
         '''
         inputs: input file
+                cache: reuse/write the binary graph cache, see graph.py
+                mapped: read the neighbours straight from a memory map of
+                        the cache
         returns: csp {
                       'X': variables
                       'D': domains
-                      'C':{'counts': number of counstraints
-                           'counstraint': each constraint}
+                      'C': neighbours of each variable
                       }
         '''
-        ret = {}
-        fp = open(file_name, 'r')
-
-        try:
-            ret['C'] = {}
-            ret['X'], constraint_num, ret['D'] = map(
-                int,
-                fp.readline().rstrip('\n').split('\t'))
-            constraints = fp.readlines()
-
-            if len(constraints) != constraint_num:
-                raise
-
-            ret['C'] = {val: [] for val in range(ret['X'])}
-
-            for cons in constraints:
-                x, y = map(int, cons.rstrip('\n').split('\t'))
-                if y not in ret['C'][x]:
-                    ret['C'][x].append(y)
-                if x not in ret['C'][y]:
-                    ret['C'][y].append(x)
-
-            self.variable_list = list(range(ret['X']))
-
-            fp.close()
-        except:
-            print('Invalid input file')
-            fp.close()
-            sys.exit(-1)
+        if isinstance(file_name, GRAPH):
+            self.graph = file_name
+        else:
+            self.graph = load_graph(file_name, cache, mapped)
 
-        return ret
+        return {
+            'X': self.graph.X,
+            'D': self.graph.D,
+            'C': self.graph.adjacency()
+        }
 
     def create_output(self, assignment):
         fp = open(self.output, 'w')
 
         if self.goal_test(assignment):
-            [
-                fp.write(str(assignment[result]) + '\n')
-                for result in range(self.csp['X'])
-            ]
+            [fp.write(str(value) + '\n') for value in self.expand(assignment)]
         else:
             fp.write("No answer")
 
@@ -132,22 +171,48 @@ class CSP:
                 print("No answer")
             print("=========================\n\n")
 
+    def expand(self, assignment):
+        '''
+        returns the value of every variable of the input; with peeled, the
+        variables left out of the search are colored greedily around
+        assignment (see graph.color_peeled)
+        '''
+        values = [assignment[variable] for variable in range(self.csp['X'])]
+        if self.peeled is None:
+            return values
+
+        full, core, peeled = self.peeled
+
+        return color_peeled(full, core, values, peeled)
+
     def assign_value(self, variable, value, assignment):
         '''
         assign variable and value to assignment
         '''
         self.counter += 1
         assignment[variable] = value
+        self.value_counter[value] += 1
 
-        if self.mode == 1:
+        if self.mode != 0:
             if DEBUG_WITH_BREAK:
                 print("variable: ", variable, "value: ", value)
                 print(self.csp)
                 print("constrants: ", self.csp['C'][variable])
                 print([(Xj, variable) for Xj in self.csp['C'][variable]])
 
-            return HEURISTICS().AC3(
-                self, [(Xj, variable) for Xj in self.csp['C'][variable]])
+            self.selector.assign(variable)
+            mark = self.m1_domain.mark()
+            if self.inference == 'fc':
+                consistent = HEURISTICS().forward_check(self, variable, value)
+            elif self.inference == 'ac3rm':
+                consistent = HEURISTICS().AC3rm(
+                    self, [(Xj, variable) for Xj in self.csp['C'][variable]])
+            else:
+                consistent = HEURISTICS().AC3(
+                    self, [(Xj, variable) for Xj in self.csp['C'][variable]])
+            self.selector.update(self.m1_domain.changed(mark))
+
+            return consistent
 
         return True
 
@@ -156,12 +221,39 @@ class CSP:
         unassign variable and value to assignment
         '''
         if variable in assignment:
-            assignment.pop(variable)
+            self.value_counter[assignment.pop(variable)] -= 1
+
+            if self.mode != 0:
+                self.selector.unassign(variable)
 
-        if self.mode == 1:
-            self.m1_domain[variable] = [
-                value for value in range(self.csp['D'])
-            ]
+    def explain(self, variable):
+        '''
+        returns the assigned variables responsible for the values removed
+        from the domain of variable (mode 2)
+        pruned_by[variable][value] is the variable whose domain was down to
+        value when inference removed it; that variable explains the removal
+        if it is assigned, otherwise the reasons of its own removed values do;
+        values removed before the search (-1) have no reason
+        '''
+        assigned = self.selector.assigned
+        reasons = set()
+        seen = set([variable])
+        todo = [variable]
+
+        while todo:
+            current = todo.pop()
+            pruned_by = self.pruned_by[current]
+            for value in self.m1_domain.removed(current):
+                reason = pruned_by[value]
+                if reason < 0:
+                    continue
+                if assigned[reason]:
+                    reasons.add(reason)
+                elif reason not in seen:
+                    seen.add(reason)
+                    todo.append(reason)
+
+        return reasons
 
     # def constraints(self, variable_1, value_1, variable_2, value_2):
     #     if variable_2 in self.csp['C'][variable_1] and value_1 == value_2:
@@ -210,59 +302,374 @@ class CSP:
         return True
 
 
+class FRAME:
+    '''
+    one level of the explicit DFSB stack
+        variable: the variable assigned at this level
+        values: its values in the order they are tried
+        index: position of the next value to try
+        mark: trail position before the first value was tried (mode 1, 2)
+        active: true while variable holds values[index - 1]
+        conflict: earlier variables responsible for the values of variable
+                  that failed so far (mode 2)
+    '''
+
+    def __init__(self, variable, values, mark, conflict=None):
+        self.variable = variable
+        self.values = values
+        self.index = 0
+        self.mark = mark
+        self.active = False
+        self.conflict = conflict
+
+
+# returned by DFSB.search when it stopped after max_nodes
+PAUSED = 'paused'
+
+
 class DFSB:
     '''
+    iterative backtracking over an explicit stack of FRAMEs, so the search
+    depth is not bounded by the recursion limit and a search can be paused
+    and resumed later: the stack and assignment stay in the DFSB object
     pseudo code references:
         DFSB: AIMA [Fig 6.5]
     '''
 
-    def search(self, csp):
+    def __init__(self):
+        self.stack = None
+        self.assignment = None
+
+    def search(self, csp, max_nodes=None, max_fails=None):
         '''
         returns a solution, or failure
+        max_nodes: expand at most that many nodes, then return PAUSED; the
+                   next search(csp) call resumes where this one stopped
+        max_fails: likewise, after that many values were found inconsistent
         '''
-        return self.recursive_search({}, csp)
+        if self.stack is None:
+            self.stack = []
+            self.assignment = {}
+            if not self.expand(csp):
+                self.stack = None
+                return self.assignment
+
+        if csp.mode == 2:
+            ret = self.run_backjumping(csp, max_nodes, max_fails)
+        else:
+            ret = self.run(csp, max_nodes, max_fails)
+        if ret is not PAUSED:
+            self.stack = None
+
+        return ret
 
-    def recursive_search(self, assignment, csp):
+    def expand(self, csp):
         '''
-        returns a solution, or failure
+        push a frame for the next unassigned variable
+        returns false iff the assignment is already complete
         '''
-        if len(assignment) == csp.csp['X']:
-            return assignment
-
-        variable = HEURISTICS().select_unsigned_variable(assignment, csp)
+        if len(self.assignment) == csp.csp['X']:
+            return False
 
+        variable = HEURISTICS().select_unsigned_variable(self.assignment, csp)
+        values = HEURISTICS().order_domain_values(variable, self.assignment,
+                                                  csp)
+        # domains are restored from the trail instead of a deep copy,
+        # so each node only pays for the values it actually pruned
         if csp.mode == 0:
-            for value in HEURISTICS().order_domain_values(
-                    variable, assignment, csp):
-                if csp.check_conflict(variable, value, assignment):
-                    csp.assign_value(variable, value, assignment)
-                    result = self.recursive_search(assignment, csp)
-                    if result is not None:
-                        return result
-                csp.unassign_value(variable, assignment)
-        elif csp.mode == 1:
-            m1_domain_backup = copy.deepcopy(csp.m1_domain)
-            for value in HEURISTICS().order_domain_values(
-                    variable, assignment, csp):
-
-                if csp.check_conflict(variable, value, assignment):
-                    csp.m1_domain[variable] = [value]
-                    if csp.assign_value(variable, value, assignment):
-                        result = self.recursive_search(assignment, csp)
-                        if result is not None:
-                            return result
-
-                csp.m1_domain = m1_domain_backup
-                csp.unassign_value(variable, assignment)
+            self.stack.append(FRAME(variable, values, 0))
+        else:
+            self.stack.append(FRAME(variable, values, csp.m1_domain.mark(),
+                                    csp.explain(variable)
+                                    if csp.mode == 2 else None))
+
+        # polled once the frame is pushed, so a search stopped here resumes
+        # by trying the values of variable
+        csp.deadline.check()
+        if csp.stats is not None:
+            csp.stats.tick()
+        if csp.checkpoint is not None:
+            csp.checkpoint.tick(self, csp)
+
+        return True
+
+    def snapshot(self, csp):
+        '''
+        returns the search state as plain data for checkpoint.CHECKPOINT:
+        the stack, the assignment and the domains with their trail, plus
+        the nogoods and the explanations of mode 2
+        the residues of AC3rm are only a cache and are left out, the heap of
+        csp.selector is rebuilt by restore
+        '''
+        domain = csp.m0_domain if csp.mode == 0 else csp.m1_domain
+        state = {
+            'stack': None if self.stack is None else [
+                (frame.variable, frame.values, frame.index, frame.mark,
+                 frame.active, frame.conflict) for frame in self.stack
+            ],
+            'assignment': self.assignment,
+            'bits': domain.bits,
+            'sizes': domain.sizes,
+            'trail': domain.trail
+        }
+
+        if csp.mode == 2:
+            state['nogoods'] = list(csp.nogoods.entries)
+            state['pruned_by'] = csp.pruned_by
+
+        return state
+
+    def restore(self, csp, state):
+        '''
+        resume the search saved by snapshot: the next search(csp) call
+        continues where it stopped
+        '''
+        self.stack = None
+        self.assignment = state['assignment']
+        if state['stack'] is not None:
+            self.stack = []
+            for (variable, values, index, mark, active, conflict) in \
+                    state['stack']:
+                frame = FRAME(variable, values, mark, conflict)
+                frame.index = index
+                frame.active = active
+                self.stack.append(frame)
+
+        domain = csp.m0_domain if csp.mode == 0 else csp.m1_domain
+        domain.bits = state['bits']
+        domain.sizes = state['sizes']
+        domain.trail = state['trail']
+
+        csp.value_counter = [0] * csp.csp['D']
+        for value in (self.assignment or {}).values():
+            csp.value_counter[value] += 1
+
+        if csp.mode == 2:
+            csp.nogoods = NOGOODS(csp.nogoods.capacity, csp.nogoods.max_size)
+            for nogood in state['nogoods']:
+                csp.nogoods.learn(nogood)
+            csp.pruned_by = state['pruned_by']
+
+        if csp.mode != 0:
+            csp.selector = SELECTOR(csp)
+            for variable in self.assignment or {}:
+                csp.selector.assign(variable)
+            csp.selector.rebuild()
+
+    def search_restarting(self, csp, restarts, retain=True):
+        '''
+        run search(csp) with the successive failure limits of restarts,
+        starting over from an empty assignment each time one is reached;
+        the heap of csp.selector is rebuilt, so ties between variables are
+        broken by fresh random draws on every run
+        retain: keep the nogoods learned by mode 2 from one run to the next
+        returns a solution, or failure; the limits of RESTARTS keep growing,
+        so an unsatisfiable problem is still proved so eventually
+        '''
+        for max_fails in restarts:
+            ret = self.search(csp, max_fails=max_fails)
+            if ret is not PAUSED:
+                return ret
+
+            self.abandon(csp)
+            csp.restart_counter += 1
+            if csp.mode != 0:
+                csp.selector.rebuild()
+            if csp.mode == 2 and not retain:
+                csp.nogoods = NOGOODS(csp.nogoods.capacity,
+                                      csp.nogoods.max_size)
 
         return None
 
+    def abandon(self, csp):
+        '''
+        drop a paused search, taking back every assignment it made
+        '''
+        while self.stack:
+            frame = self.stack.pop()
+            if frame.active:
+                self.retract(frame, csp)
+
+        self.stack = None
+
+    def retract(self, frame, csp):
+        '''
+        take back the value tried by frame and everything it pruned
+        '''
+        if csp.mode != 0:
+            csp.selector.update(csp.m1_domain.undo(frame.mark))
+        csp.unassign_value(frame.variable, self.assignment)
+        frame.active = False
+
+    def run(self, csp, max_nodes=None, max_fails=None):
+        '''
+        returns a solution, failure, or PAUSED
+        '''
+        stack = self.stack
+        assignment = self.assignment
+        nodes = 0
+        fails = 0
+
+        while stack:
+            frame = stack[-1]
+
+            if frame.active:
+                self.retract(frame, csp)
+
+            if frame.index == len(frame.values):
+                stack.pop()
+                csp.backtrack_counter += 1
+                continue
+
+            if max_nodes is not None and nodes >= max_nodes:
+                return PAUSED
+            if max_fails is not None and fails >= max_fails:
+                return PAUSED
+
+            value = frame.values[frame.index]
+            frame.index += 1
+
+            if not csp.check_conflict(frame.variable, value, assignment):
+                fails += 1
+                continue
+
+            if csp.mode == 1:
+                csp.m1_domain.reduce(frame.variable, value)
+
+            frame.active = True
+            nodes += 1
+            if not csp.assign_value(frame.variable, value, assignment):
+                fails += 1
+                continue
+
+            if not self.expand(csp):
+                return assignment
+
+        return None
+
+    def run_backjumping(self, csp, max_nodes=None, max_fails=None):
+        '''
+        mode 2: AC3 with conflict-directed backjumping
+        once every value of a variable failed, the assignments of its
+        conflict set are learned as a nogood and the search jumps back to the
+        most recent variable of that set instead of the previous one
+        returns a solution, failure, or PAUSED
+        reference: Prosser, Hybrid algorithms for the constraint
+                   satisfaction problem (CBJ)
+        '''
+        stack = self.stack
+        assignment = self.assignment
+        nodes = 0
+        fails = 0
+
+        while stack:
+            frame = stack[-1]
+
+            if frame.active:
+                self.retract(frame, csp)
+
+            if frame.index == len(frame.values):
+                csp.backtrack_counter += 1
+                conflict = frame.conflict
+                if not conflict:
+                    # failure does not depend on any assignment
+                    stack.clear()
+                    return None
+
+                csp.nogoods.learn(
+                    frozenset((variable, assignment[variable])
+                              for variable in conflict))
+
+                stack.pop()
+                while stack[-1].variable not in conflict:
+                    self.retract(stack.pop(), csp)
+                stack[-1].conflict |= conflict
+                stack[-1].conflict.discard(stack[-1].variable)
+                continue
+
+            if max_nodes is not None and nodes >= max_nodes:
+                return PAUSED
+            if max_fails is not None and fails >= max_fails:
+                return PAUSED
+
+            value = frame.values[frame.index]
+            frame.index += 1
+
+            nogood = csp.nogoods.violated(assignment, frame.variable, value)
+            if nogood is not None:
+                fails += 1
+                frame.conflict.update(variable for (variable, _) in nogood
+                                      if variable != frame.variable)
+                continue
+
+            pruned_by = csp.pruned_by[frame.variable]
+            for other in csp.m1_domain.values(frame.variable):
+                pruned_by[other] = frame.variable
+            csp.m1_domain.reduce(frame.variable, value)
+            frame.active = True
+            nodes += 1
+            if not csp.assign_value(frame.variable, value, assignment):
+                fails += 1
+                frame.conflict |= csp.conflict
+                frame.conflict.discard(frame.variable)
+                continue
+
+            if not self.expand(csp):
+                return assignment
+
+        return None
+
+
+def luby(index):
+    '''
+    returns the index-th term (from 1) of the Luby sequence
+    1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    reference: Luby, Sinclair and Zuckerman, Optimal speedup of Las Vegas
+               algorithms
+    '''
+    while True:
+        # size = 2 ** (k - 1) for the smallest k with index <= 2 ** k - 1
+        size = 1
+        while 2 * size - 1 < index:
+            size *= 2
+        if 2 * size - 1 == index:
+            return size
+        index -= size - 1
+
+
+class RESTARTS:
+    '''
+    failure limits of the successive runs of DFSB.search_restarting
+        luby: base times the Luby sequence
+        geometric: base, base * factor, base * factor ** 2, ...
+    '''
+
+    def __init__(self, schedule='luby', base=100, factor=1.5):
+        if schedule not in SCHEDULES:
+            raise ValueError('unknown restart schedule: %s' % schedule)
+
+        self.schedule = schedule
+        self.base = base
+        self.factor = factor
+
+    def __iter__(self):
+        index = 1
+        limit = float(self.base)
+
+        while True:
+            if self.schedule == 'luby':
+                yield self.base * luby(index)
+            else:
+                yield int(limit)
+                limit *= self.factor
+            index += 1
+
 
 class HEURISTICS:
     '''
     variable ordering purpose: select_unsigned_variable
     value ordering purpose: order_domain_values
-    inference purpose: AC_3
+    inference purpose: forward_check, AC3, AC3rm
     references:
         AIMA chapter 6.3.1
     '''
@@ -270,67 +677,22 @@ class HEURISTICS:
     def select_unsigned_variable(self, assignment, csp):
         '''
         case DFSB plain:
-            select unsigned variable in a fixed order
+            select unsigned variable in a fixed order, the degeneracy
+            order of the graph: mode 0 assigns variables in that order, so
+            the next one is at position len(assignment)
         case DFSB++:
             select unsigned variable based on the following heuristics:
                 1. minimum-remaining-values
                 2. degree
+            both are maintained incrementally by csp.selector
 
         references: AIMA chapter 6.3.1
 
         '''
         if csp.mode == 0:
-            for variable in range(csp.csp['X']):
-                if variable not in assignment:
-                    return variable
+            return csp.order[len(assignment)]
         else:
-            # filtered_by_degree = self.degree(assignment, csp)
-            modified_variable_list = csp.variable_list[:]
-            for variable in assignment:
-                modified_variable_list.remove(variable)
-
-            variables = self.minimum_remaining_values(modified_variable_list,
-                                                      csp)
-            variable = self.degree(variables, csp)
-
-            return variable
-
-    def degree(self, variables, csp):
-        '''
-        returns one of the most constrained unsigned variables randomly
-        '''
-        modified_constraint = []
-
-        for variable in variables:
-            modified_constraint.append((variable, len(csp.csp['C'][variable])))
-
-        max_len = max(modified_constraint, key=lambda x: x[1])
-
-        variables = [
-            idx[0] for idx in modified_constraint if idx[1] == max_len[1]
-        ]
-
-        return random.choice(variables)
-
-    def minimum_remaining_values(self, variables, csp):
-        '''
-        returns those unsigned variables which have minimum remaining values
-        '''
-        if len(variables) == 1:
-            return variables
-        else:
-            ret_value = len(csp.m1_domain[variables[0]])
-            ret_variable = []
-            for variable in variables:
-                curr_value = len(csp.m1_domain[variable])
-                if curr_value < ret_value:
-                    ret_value = curr_value
-                    ret_variable = [variable]
-
-                elif curr_value == ret_value:
-                    ret_variable.append(variable)
-
-            return ret_variable
+            return csp.selector.select()
 
     def order_domain_values(self, variable, assignment, csp):
         '''
@@ -338,18 +700,60 @@ class HEURISTICS:
                  = 1 => using least-constraining-value heuristic
         '''
         if csp.mode == 0:
-            values = csp.m0_domain[variable][:]
+            values = csp.m0_domain.values(variable)
         else:
-            value_list = csp.m1_domain[variable]
+            value_list = csp.m1_domain.values(variable)
             conflict_list = [[
                 csp.count_conflicts(variable, value, assignment), value
             ] for value in value_list]
 
             values = [value[1] for value in sorted(conflict_list)]
-            csp.m1_domain[variable] = values
+
+        if csp.symmetry:
+            values = self.break_symmetry(values, csp)
 
         return values
 
+    def break_symmetry(self, values, csp):
+        '''
+        colors no assigned variable holds are interchangeable, so only the
+        smallest of them is worth trying next to the colors in use; the
+        first variable gets color 0 and a search over D colors skips up to
+        D! equivalent subtrees
+        '''
+        used = csp.value_counter
+        fresh = min((value for value in values if used[value] == 0),
+                    default=None)
+
+        return [
+            value for value in values if used[value] != 0 or value == fresh
+        ]
+
+    def forward_check(self, csp, variable, value):
+        '''
+        remove value from the domain of every neighbour of variable
+        returns false on a domain wipeout
+        reference:
+            AIMA chapter 6.3.2
+        '''
+        domain = csp.m1_domain
+
+        for Xk in csp.csp['C'][variable]:
+            csp.prune_counter += 1
+            if not domain.remove(Xk, value):
+                continue
+
+            csp.revision_counter += 1
+            csp.removal_counter += 1
+            if csp.pruned_by is not None:
+                csp.pruned_by[Xk][value] = variable
+            if domain.size(Xk) == 0:
+                if csp.pruned_by is not None:
+                    csp.conflict = csp.explain(Xk)
+                return False
+
+        return True
+
     def AC3(self, csp, queue=None):
         '''
         reference:
@@ -359,68 +763,416 @@ class HEURISTICS:
             queue = [(Xi, Xj) for Xi in range(csp.csp['X'])
                      for Xj in csp.csp['C'][Xi]]
 
+        # queued mirrors the content of queue so an arc is never waiting twice
+        queue = deque(queue)
+        queued = set(queue)
+
         while queue:
             csp.prune_counter += 1
-            (Xi, Xj) = queue.pop()
+            arc = queue.popleft()
+            queued.discard(arc)
+            (Xi, Xj) = arc
             if self.revise(csp, Xi, Xj):
-                if len(csp.m1_domain[Xi]) == 0:
+                size = csp.m1_domain.size(Xi)
+                if size == 0:
+                    if csp.pruned_by is not None:
+                        csp.conflict = csp.explain(Xi)
                     return False
 
-                for Xk in csp.csp['C'][Xi]:
-                    queue.append((Xk, Xi))
+                # under not-equal, Xi can only prune a neighbour once its
+                # own domain is down to a single value
+                if size == 1:
+                    for Xk in csp.csp['C'][Xi]:
+                        if Xk != Xj and (Xk, Xi) not in queued:
+                            queued.add((Xk, Xi))
+                            queue.append((Xk, Xi))
 
         return True
 
     def revise(self, csp, Xi, Xj):
         '''
         returns true iff we revise the domain of Xi
+        every constraint is not-equal, so a value of Xi only loses its last
+        support when the domain of Xj is down to that same single value
         reference:
             AIMA chapter 6.2.2 
         '''
+        value_Xj = csp.m1_domain.singleton(Xj)
+
+        if value_Xj is None:
+            return False
+
+        if not csp.m1_domain.remove(Xi, value_Xj):
+            return False
+
+        csp.revision_counter += 1
+        csp.removal_counter += 1
+        # mode 2 remembers why the value went, see CSP.explain
+        if csp.pruned_by is not None:
+            csp.pruned_by[Xi][value_Xj] = Xj
+
+        return True
+
+    def AC3rm(self, csp, queue=None):
+        '''
+        AC3 with residual supports: unlike AC3 above it does not rely on
+        the not-equal shortcut, every arc of a variable whose domain shrank
+        is revised again
+        reference:
+            Lecoutre and Hemery, A study of residual supports in arc
+            consistency (AC-3rm)
+        '''
+        if queue == None:
+            queue = [(Xi, Xj) for Xi in range(csp.csp['X'])
+                     for Xj in csp.csp['C'][Xi]]
+
+        queue = deque(queue)
+        queued = set(queue)
+
+        while queue:
+            csp.prune_counter += 1
+            arc = queue.popleft()
+            queued.discard(arc)
+            (Xi, Xj) = arc
+            if self.revise_rm(csp, Xi, Xj):
+                if csp.m1_domain.size(Xi) == 0:
+                    if csp.pruned_by is not None:
+                        csp.conflict = csp.explain(Xi)
+                    return False
+
+                for Xk in csp.csp['C'][Xi]:
+                    if Xk != Xj and (Xk, Xi) not in queued:
+                        queued.add((Xk, Xi))
+                        queue.append((Xk, Xi))
+
+        return True
+
+    def revise_rm(self, csp, Xi, Xj):
+        '''
+        returns true iff we revise the domain of Xi
+        csp.residues[(Xi, Xj)][a] is the last value of Xj found to support
+        value a of Xi; it is checked first and, since supports under
+        not-equal are symmetric, also recorded for (Xj, Xi)
+        residues stay valid across backtracking, so they are never restored
+        '''
+        domain = csp.m1_domain
+        residues = csp.residues
+        support = residues.get((Xi, Xj))
+        if support is None:
+            support = residues[(Xi, Xj)] = [-1] * csp.csp['D']
+        reverse = residues.get((Xj, Xi))
+        if reverse is None:
+            reverse = residues[(Xj, Xi)] = [-1] * csp.csp['D']
+
+        # a variable never supports itself
+        values_Xj = domain.values(Xj) if Xi != Xj else []
         revised = False
 
-        for value_Xi in csp.m1_domain[Xi]:
-            should_remove = True
+        for value in domain.values(Xi):
+            csp.support_counter += 1
+            residue = support[value]
+            if residue >= 0 and domain.contains(Xj, residue):
+                continue
 
-            for value_Xj in csp.m1_domain[Xj]:
-                if value_Xi != value_Xj:
-                    should_remove = False
+            for value_Xj in values_Xj:
+                csp.support_counter += 1
+                if value_Xj != value:
+                    support[value] = value_Xj
+                    reverse[value_Xj] = value
                     break
-
-            if should_remove:
-                csp.m1_domain[Xi].remove(value_Xi)
+            else:
+                domain.remove(Xi, value)
+                csp.removal_counter += 1
+                # the domain of Xj is down to value, see CSP.explain
+                if csp.pruned_by is not None:
+                    csp.pruned_by[Xi][value] = Xj
                 revised = True
 
+        if revised:
+            csp.revision_counter += 1
+
         return revised
 
 
-class TIMER:
+class NOGOODS:
     '''
-    reference: https://docs.python.org/3/library/signal.html#example
+    bounded database of learned nogoods: sets of (variable, value)
+    assignments which cannot all hold in a solution
+    nogoods are indexed by each of their assignments, larger ones than
+    max_size are not kept, and once capacity is reached the least recently
+    used one is evicted
     '''
 
-    def __init__(self, time=60):
-        self.time = time
-        signal.signal(signal.SIGALRM, self.timeout)
-        signal.alarm(self.time)
+    def __init__(self, capacity=DEFAULT_NOGOODS, max_size=8):
+        self.capacity = capacity
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.index = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def learn(self, nogood):
+        if self.capacity <= 0 or not nogood or \
+                len(nogood) > self.max_size or nogood in self.entries:
+            return
+
+        if len(self.entries) >= self.capacity:
+            evicted, _ = self.entries.popitem(last=False)
+            for pair in evicted:
+                self.index[pair].discard(evicted)
+                if not self.index[pair]:
+                    del self.index[pair]
+
+        self.entries[nogood] = True
+        for pair in nogood:
+            self.index.setdefault(pair, set()).add(nogood)
 
-    def timeout(self, signum, frame):
-        raise TimeoutError
+    def violated(self, assignment, variable, value):
+        '''
+        returns a nogood which assigning value to variable would complete,
+        or None
+        '''
+        for nogood in self.index.get((variable, value), ()):
+            for (other, other_value) in nogood:
+                if other != variable and assignment.get(other) != other_value:
+                    break
+            else:
+                self.entries.move_to_end(nogood)
+                return nogood
+
+        return None
+
+
+class SELECTOR:
+    '''
+    unassigned variables of mode 1 kept in a heap keyed by
+        (remaining values, -unassigned neighbours, random tie-break)
+    so minimum-remaining-values with the degree heuristic as tie-breaker
+    costs O(log X) per update instead of a scan over every variable
+
+    a variable is pushed again whenever its key changes (domain pruned or
+    restored, neighbour assigned or unassigned); outdated entries are
+    recognised by their version and dropped when they reach the top
+    '''
+
+    def __init__(self, csp):
+        self.csp = csp
+        self.degree = [len(csp.csp['C'][variable])
+                       for variable in range(csp.csp['X'])]
+        self.assigned = [False] * csp.csp['X']
+        self.version = [0] * csp.csp['X']
+        self.rebuild()
+
+    def key(self, variable):
+        return (self.csp.m1_domain.size(variable), -self.degree[variable],
+                random.random(), variable, self.version[variable])
+
+    def rebuild(self):
+        self.heap = [
+            self.key(variable) for variable in range(self.csp.csp['X'])
+            if not self.assigned[variable]
+        ]
+        heapq.heapify(self.heap)
+
+    def touch(self, variable):
+        '''
+        re-key variable after its domain or degree changed
+        '''
+        if self.assigned[variable]:
+            return
+
+        self.version[variable] += 1
+        heapq.heappush(self.heap, self.key(variable))
+
+        if len(self.heap) > 4 * len(self.assigned) + 64:
+            self.rebuild()
+
+    def update(self, variables):
+        for variable in variables:
+            self.touch(variable)
+
+    def select(self):
+        '''
+        returns the unassigned variable with the smallest key, or None
+        '''
+        heap = self.heap
+
+        while heap:
+            entry = heap[0]
+            variable = entry[3]
+            if not self.assigned[variable] and \
+                    entry[4] == self.version[variable]:
+                return variable
+            heapq.heappop(heap)
+
+        return None
+
+    def assign(self, variable):
+        self.assigned[variable] = True
+
+        for neighbour in self.csp.csp['C'][variable]:
+            self.degree[neighbour] -= 1
+            self.touch(neighbour)
+
+    def unassign(self, variable):
+        self.assigned[variable] = False
+
+        for neighbour in self.csp.csp['C'][variable]:
+            self.degree[neighbour] += 1
+            self.touch(neighbour)
+
+        self.touch(variable)
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='dfsb.py',
+        description='backtracking search for map coloring')
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('mode_flag', type=int, choices=(0, 1, 2),
+                        help='0: plain DFS-B, 1: DFS-B with variable, value '
+                        'ordering + AC3, 2: mode 1 + conflict-directed '
+                        'backjumping + nogood learning')
+    parser.add_argument('--nogoods', type=int, default=DEFAULT_NOGOODS,
+                        help='capacity of the nogood database of mode 2')
+    parser.add_argument('--inference', choices=INFERENCES,
+                        default=DEFAULT_INFERENCE,
+                        help='propagation after each assignment of mode 1 '
+                        'and 2: forward checking, AC3 or AC3 with residual '
+                        'supports')
+    parser.add_argument('--symmetry', action='store_true',
+                        help='try a single unused color at each variable, '
+                        'the others lead to equivalent subtrees')
+    parser.add_argument('--restarts', choices=SCHEDULES, default=None,
+                        help='restart mode 1 and 2 from scratch once a '
+                        'number of inconsistent values following this '
+                        'schedule is reached')
+    parser.add_argument('--restart-base', type=int, default=100,
+                        help='failure limit of the first run')
+    parser.add_argument('--restart-factor', type=float, default=1.5,
+                        help='growth of the failure limit of the geometric '
+                        'schedule')
+    parser.add_argument('--forget', action='store_true',
+                        help='drop the nogoods of mode 2 on every restart')
+    parser.add_argument('--stats', action='store_true',
+                        help='write the counters and phase timings of the '
+                        'run to stderr as a JSON line')
+    parser.add_argument('--stats-file', default=None,
+                        help='write them to this file instead (implies '
+                        '--stats)')
+    parser.add_argument('--stats-interval', type=float, default=None,
+                        help='also write a sample line every that many '
+                        'seconds of search')
+    parser.add_argument('--checkpoint', default=None,
+                        help='save the search state to this file when the '
+                        'search times out or gets SIGTERM')
+    parser.add_argument('--checkpoint-interval', type=float, default=None,
+                        help='also save it every that many seconds of search')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the search saved in --checkpoint, if '
+                        'there is one')
+    parser.add_argument('--peel', action='store_true',
+                        help='only search the k-core of the graph, k being '
+                        'the number of colors')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse/write a binary graph cache next to the '
+                        'input file')
+    parser.add_argument('--mmap', action='store_true',
+                        help='memory-map the graph cache instead of loading '
+                        'it into Python lists (implies --cache)')
+
+    args = parser.parse_args(argv[1:])
+
+    if args.checkpoint is None and \
+            (args.resume or args.checkpoint_interval is not None):
+        parser.error('--resume and --checkpoint-interval need --checkpoint')
+    if args.restarts is not None and args.mode_flag == 0:
+        # mode 0 has no random tie-breaks, every run would be the same
+        parser.error('--restarts needs mode 1 or 2')
+
+    return args
 
 
 def main():
+    args = parse_arguments(sys.argv)
+
+    checkpoint = None
+    if args.checkpoint is not None:
+        checkpoint = CHECKPOINT(args.checkpoint, 'dfsb%d' % args.mode_flag,
+                                args.checkpoint_interval)
+        deadline = DEADLINE(60, terminated())
+    else:
+        deadline = DEADLINE(60)
+
+    stream = None
+    if args.stats_file is not None:
+        stream = open(args.stats_file, 'w')
+    elif args.stats:
+        stream = sys.stderr
+    stats = STATS(stream, args.stats_interval, solver='dfsb',
+                  mode=args.mode_flag, input=args.input_file)
+    engine = DFSB()
+
+    try:
+        with stats.phase('parse'):
+            graph = load_graph(args.input_file, args.cache, args.mmap)
+        with stats.phase('preprocess'):
+            if args.peel:
+                full = graph
+                core, peeled = k_core(full, full.D)
+                graph = subgraph(full, core)
+            csp = CSP(graph, args.output_file, args.mode_flag, args.cache,
+                      args.mmap, args.nogoods, args.inference, args.symmetry)
+            if args.peel:
+                csp.peeled = (full, core, peeled)
+        csp.deadline = deadline
+        stats.watch(csp)
+    except ValueError:
+        print('Invalid input file')
+        sys.exit(-1)
+
+    if checkpoint is not None:
+        checkpoint.watch(csp)
+        if args.resume:
+            try:
+                checkpoint.load(engine, csp)
+            except ValueError:
+                print('Invalid checkpoint file')
+                sys.exit(-1)
+
     try:
-        TIMER(60)
-        start = time.time()
+        with stats.phase('search'):
+            if has_self_loop(graph):
+                # mode 0 does not check a variable against itself
+                ret = None
+            elif args.restarts is not None:
+                ret = engine.search_restarting(
+                    csp, RESTARTS(args.restarts, args.restart_base,
+                                  args.restart_factor), not args.forget)
+            else:
+                ret = engine.search(csp)
+        if ret is None:
+            status = 'unsatisfiable'
+        elif csp.goal_test(ret):
+            status = 'solved'
+        else:
+            status = 'failed'
+        if checkpoint is not None:
+            checkpoint.discard()
 
-        csp = CSP(sys.argv)
+        with stats.phase('output'):
+            csp.create_output(ret)
 
-        ret = DFSB().search(csp)
-        csp.create_output(ret)
-        end = time.time()
+    except (TimeoutError, CANCELLED) as error:
+        status = 'timeout' if isinstance(error, TimeoutError) else 'cancelled'
+        with stats.phase('output'):
+            if checkpoint is not None:
+                checkpoint.save(engine, csp)
+            csp.create_output(None)
 
-    except TimeoutError:
-        csp.create_output(None)
+    stats.emit('done', status=status)
 
 
 if __name__ == '__main__':
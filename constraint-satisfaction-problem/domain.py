@@ -0,0 +1,123 @@
+"""Bitset domains for the map coloring problem"""
+
+
+def popcount(bits):
+    '''
+    returns the number of values set in a domain bitmask
+    '''
+    return bin(bits).count('1')
+
+
+class DOMAIN:
+    '''
+    the domain of every variable is stored as an integer bitmask:
+    bit v is set iff value v is still in the domain of the variable
+
+    membership, removal, size (used by minimum-remaining-values) and the
+    singleton test used by revise are single bit operations, and every
+    removal is recorded on a trail so backtracking can undo it
+    '''
+
+    def __init__(self, variables, values):
+        self.full = (1 << values) - 1
+        self.bits = [self.full] * variables
+        self.sizes = [values] * variables
+        self.trail = []
+
+    def values(self, variable):
+        '''
+        returns the values left in the domain of variable in ascending order
+        '''
+        bits = self.bits[variable]
+        ret = []
+
+        while bits:
+            low = bits & -bits
+            ret.append(low.bit_length() - 1)
+            bits ^= low
+
+        return ret
+
+    def removed(self, variable):
+        '''
+        returns the values no longer in the domain of variable
+        '''
+        bits = self.full & ~self.bits[variable]
+        ret = []
+
+        while bits:
+            low = bits & -bits
+            ret.append(low.bit_length() - 1)
+            bits ^= low
+
+        return ret
+
+    def size(self, variable):
+        return self.sizes[variable]
+
+    def contains(self, variable, value):
+        return (self.bits[variable] >> value) & 1 == 1
+
+    def singleton(self, variable):
+        '''
+        returns the only value left in the domain of variable, or None
+        '''
+        if self.sizes[variable] != 1:
+            return None
+
+        return self.bits[variable].bit_length() - 1
+
+    def remove(self, variable, value):
+        '''
+        remove value from the domain of variable
+        returns true iff the domain changed
+        '''
+        bit = 1 << value
+
+        if not self.bits[variable] & bit:
+            return False
+
+        self.bits[variable] ^= bit
+        self.sizes[variable] -= 1
+        self.trail.append((variable, bit))
+
+        return True
+
+    def reduce(self, variable, value):
+        '''
+        reduce the domain of variable to the single value
+        '''
+        removed = self.bits[variable] & ~(1 << value)
+
+        if removed:
+            self.bits[variable] ^= removed
+            self.sizes[variable] -= popcount(removed)
+            self.trail.append((variable, removed))
+
+    def mark(self):
+        '''
+        returns the current trail position
+        '''
+        return len(self.trail)
+
+    def undo(self, mark):
+        '''
+        restore every value removed since the trail was at mark
+        returns the variables whose domain was restored
+        '''
+        trail = self.trail
+        restored = []
+
+        while len(trail) > mark:
+            variable, removed = trail.pop()
+            self.bits[variable] |= removed
+            self.sizes[variable] += popcount(removed)
+            restored.append(variable)
+
+        return restored
+
+    def changed(self, mark):
+        '''
+        returns the variables whose domain shrank since the trail was at mark
+        '''
+        return [variable for (variable, removed) in self.trail[mark:]]
@@ -4,6 +4,7 @@ import time
 import signal
 import copy
 import random
+from graph import load_graph
 """Map coloring problem"""
 
 DEBUG = True
@@ -53,41 +54,18 @@ class CSP:
         returns: csp {
                       'X': variables
                       'D': domains
-                      'C':{'counts': number of counstraints
-                           'counstraint': each constraint}
+                      'C': neighbours of each variable
                       }
         '''
-        ret = {}
-        fp = open(file_name, 'r')
-
         try:
-            ret['C'] = {}
-            ret['X'], constraint_num, ret['D'] = map(
-                int,
-                fp.readline().rstrip('\n').split('\t'))
-            constraints = fp.readlines()
-
-            if len(constraints) != constraint_num:
-                raise
-
-            ret['C'] = {val: [] for val in range(ret['X'])}
-
-            for cons in constraints:
-                x, y = map(int, cons.rstrip('\n').split('\t'))
-                if y not in ret['C'][x]:
-                    ret['C'][x].append(y)
-                if x not in ret['C'][y]:
-                    ret['C'][y].append(x)
-
-            self.variable_list = list(range(ret['X']))
-
-            fp.close()
-        except:
+            graph = load_graph(file_name)
+        except ValueError:
             print('Invalid input file')
-            fp.close()
             sys.exit(-1)
 
-        return ret
+        self.variable_list = list(range(graph.X))
+
+        return {'X': graph.X, 'D': graph.D, 'C': graph.adjacency()}
 
     def create_output(self, assignment):
         fp = open(self.output, 'w')
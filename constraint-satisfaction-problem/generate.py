@@ -0,0 +1,245 @@
+import sys
+import math
+import random
+import argparse
+import itertools
+from collections import deque
+"""Map coloring problem: seeded instance generators"""
+
+# kinds of instances generate() can build
+KINDS = ('er', 'delaunay', 'threshold')
+
+# average degree at which random graphs stop being D-colorable (D: degree)
+THRESHOLDS = {3: 4.69, 4: 8.90, 5: 13.69}
+
+
+def random_edges(X, E, rng, coloring=None):
+    '''
+    returns E distinct random edges over X variables; with a coloring, only
+    edges between variables of different colors are drawn, so the coloring
+    stays a solution
+    '''
+    edges = set()
+    limit = X * (X - 1) // 2
+    if coloring is not None:
+        sizes = [coloring.count(value) for value in set(coloring)]
+        limit -= sum(size * (size - 1) // 2 for size in sizes)
+    if E > limit:
+        raise ValueError('cannot draw %d edges, at most %d' % (E, limit))
+
+    while len(edges) < E:
+        x = rng.randrange(X)
+        y = rng.randrange(X)
+        if x == y or (coloring is not None and coloring[x] == coloring[y]):
+            continue
+        edges.add((min(x, y), max(x, y)))
+
+    return sorted(edges)
+
+
+def erdos_renyi(X, D, degree, seed=0, planted=False):
+    '''
+    returns the edges of a G(X, E) random graph of average degree degree
+    planted: only keep edges compatible with a hidden random coloring, so
+             the instance is satisfiable
+    '''
+    rng = random.Random(seed)
+    coloring = [rng.randrange(D) for _ in range(X)] if planted else None
+
+    return random_edges(X, int(round(degree * X / 2)), rng, coloring)
+
+
+def threshold(X, D, seed=0, planted=False):
+    '''
+    returns the edges of a random graph at the D-coloring phase transition,
+    where random instances are hardest
+    '''
+    degree = THRESHOLDS.get(D, 2 * D * math.log(D))
+
+    return erdos_renyi(X, D, degree, seed, planted)
+
+
+def circumcircle(points, a, b, c):
+    '''
+    returns (x, y, squared radius) of the circle through three points
+    '''
+    (ax, ay), (bx, by), (cx, cy) = points[a], points[b], points[c]
+    d = 2 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if abs(d) < 1e-300:
+        return 0.0, 0.0, float('inf')
+
+    a2 = ax * ax + ay * ay
+    b2 = bx * bx + by * by
+    c2 = cx * cx + cy * cy
+    x = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    y = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+
+    return x, y, (ax - x) ** 2 + (ay - y) ** 2
+
+
+def delaunay_edges(points):
+    '''
+    returns the edges of the Delaunay triangulation of points in the unit
+    square, a planar graph
+    Bowyer-Watson: each point removes the triangles whose circumcircle holds
+    it (an edge connected cavity, searched for from the triangles of the
+    previous point since points come in strips) and fans the cavity around
+    itself
+    reference: Watson, Computing the n-dimensional Delaunay tessellation
+    '''
+    X = len(points)
+    points = list(points) + [(-10.0, -10.0), (30.0, -10.0), (-10.0, 30.0)]
+    triangles = {}
+    sides = {}
+    ids = itertools.count()
+
+    def side(a, b):
+        return (a, b) if a < b else (b, a)
+
+    def add(a, b, c):
+        idx = next(ids)
+        triangles[idx] = (a, b, c) + circumcircle(points, a, b, c)
+        for edge in (side(a, b), side(b, c), side(c, a)):
+            sides.setdefault(edge, set()).add(idx)
+        return idx
+
+    def inside(idx, x, y):
+        triangle = triangles[idx]
+        return (x - triangle[3]) ** 2 + (y - triangle[4]) ** 2 < triangle[5]
+
+    def find(recent, x, y):
+        # breadth first from the triangles of the previous point
+        seen = set(recent)
+        queue = deque(recent)
+        while queue:
+            idx = queue.popleft()
+            if inside(idx, x, y):
+                return idx
+            a, b, c = triangles[idx][:3]
+            for edge in (side(a, b), side(b, c), side(c, a)):
+                for other in sides[edge]:
+                    if other not in seen:
+                        seen.add(other)
+                        queue.append(other)
+
+    recent = [add(X, X + 1, X + 2)]
+
+    # boustrophedon strips keep consecutive points close to each other
+    strips = max(1, int(math.sqrt(X)))
+    order = sorted(range(X), key=lambda p: (
+        int(points[p][0] * strips),
+        points[p][1] if int(points[p][0] * strips) % 2 == 0 else
+        -points[p][1]))
+
+    for p in order:
+        x, y = points[p]
+        start = find(recent, x, y)
+
+        cavity = set([start])
+        stack = [start]
+        while stack:
+            a, b, c = triangles[stack.pop()][:3]
+            for edge in (side(a, b), side(b, c), side(c, a)):
+                for other in sides[edge]:
+                    if other not in cavity and inside(other, x, y):
+                        cavity.add(other)
+                        stack.append(other)
+
+        boundary = []
+        for idx in cavity:
+            a, b, c = triangles[idx][:3]
+            for edge in (side(a, b), side(b, c), side(c, a)):
+                if len(sides[edge] & cavity) == 1:
+                    boundary.append(edge)
+
+        for idx in cavity:
+            a, b, c = triangles.pop(idx)[:3]
+            for edge in (side(a, b), side(b, c), side(c, a)):
+                sides[edge].discard(idx)
+                if not sides[edge]:
+                    del sides[edge]
+
+        recent = [add(a, b, p) for (a, b) in boundary]
+
+    return sorted(edge for edge in sides if edge[1] < X)
+
+
+def delaunay(X, D, seed=0, keep=1.0):
+    '''
+    returns the edges of a random planar map: the Delaunay triangulation of
+    X random points, of which a share keep of the edges is kept
+    '''
+    rng = random.Random(seed)
+    points = [(rng.random(), rng.random()) for _ in range(X)]
+    edges = delaunay_edges(points)
+
+    if keep < 1.0:
+        edges = [edge for edge in edges if rng.random() < keep]
+
+    return edges
+
+
+def generate(kind, X, D, seed=0, degree=None, planted=False, keep=1.0):
+    '''
+    returns the edges of an instance of kind, one of KINDS
+    degree: average degree of 'er' instances, D by default
+    raises ValueError on an unknown kind
+    '''
+    if kind == 'er':
+        return erdos_renyi(X, D, D if degree is None else degree, seed,
+                           planted)
+    if kind == 'delaunay':
+        return delaunay(X, D, seed, keep)
+    if kind == 'threshold':
+        return threshold(X, D, seed, planted)
+
+    raise ValueError('unknown kind: %s' % kind)
+
+
+def write_problem(path, X, D, edges):
+    '''
+    write an instance in the input format of dfsb.py/minconflicts.py
+    '''
+    with open(path, 'w') as fp:
+        fp.write('%d\t%d\t%d\n' % (X, len(edges), D))
+        for (x, y) in edges:
+            fp.write('%d\t%d\n' % (x, y))
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='generate.py', description='generate map coloring instances')
+    parser.add_argument('kind', choices=KINDS,
+                        help='er: Erdos-Renyi random graph, delaunay: random '
+                        'planar map, threshold: random graph at the '
+                        'coloring phase transition')
+    parser.add_argument('output_file')
+    parser.add_argument('variables', type=int)
+    parser.add_argument('--colors', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--degree', type=float, default=None,
+                        help='average degree of er instances')
+    parser.add_argument('--planted', action='store_true',
+                        help='hide a coloring in er/threshold instances so '
+                        'they are satisfiable')
+    parser.add_argument('--keep', type=float, default=1.0,
+                        help='share of the edges of delaunay maps kept')
+
+    return parser.parse_args(argv[1:])
+
+
+def main():
+    args = parse_arguments(sys.argv)
+
+    try:
+        edges = generate(args.kind, args.variables, args.colors, args.seed,
+                         args.degree, args.planted, args.keep)
+    except ValueError as error:
+        print(error)
+        sys.exit(-1)
+
+    write_problem(args.output_file, args.variables, args.colors, edges)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,413 @@
+import os
+import mmap
+import struct
+from array import array
+"""Constraint graph loading for the map coloring problem"""
+
+# binary cache layout: header, indptr (X + 1 int64), indices (nnz int32)
+CACHE_MAGIC = b'CSPG'
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct('<4sIqqqqqq')
+CACHE_SUFFIX = '.csr'
+
+
+class GRAPH:
+    '''
+    undirected constraint graph in CSR form
+        X: number of variables
+        D: number of values
+        E: number of constraints listed in the input file
+        indptr, indices: the neighbours of variable v are
+                         indices[indptr[v]:indptr[v + 1]]
+    '''
+
+    def __init__(self, X, D, E, indptr, indices, buffer=None):
+        '''
+        indptr/indices are arrays, or memoryviews into buffer when the graph
+        is mapped from a cache file (see map_cache)
+        '''
+        self.X = X
+        self.D = D
+        self.E = E
+        self.indptr = indptr
+        self.indices = indices
+        self.buffer = buffer
+
+    def is_mapped(self):
+        return self.buffer is not None
+
+    def with_values(self, D):
+        '''
+        returns the same constraint graph with D values per variable
+        '''
+        return GRAPH(self.X, D, self.E, self.indptr, self.indices, self.buffer)
+
+    def neighbours(self, variable):
+        return self.indices[self.indptr[variable]:self.indptr[variable + 1]]
+
+    def degree(self, variable):
+        return self.indptr[variable + 1] - self.indptr[variable]
+
+    def adjacency(self):
+        '''
+        returns the neighbour lists of every variable, indexed by variable
+        a mapped graph returns a NEIGHBOURS view instead, so no Python object
+        is built per edge
+        '''
+        if self.is_mapped():
+            return NEIGHBOURS(self)
+
+        indptr = self.indptr
+        indices = self.indices
+
+        return [
+            indices[indptr[variable]:indptr[variable + 1]].tolist()
+            for variable in range(self.X)
+        ]
+
+
+class NEIGHBOURS:
+    '''
+    read-only stand-in for the list of neighbour lists returned by
+    GRAPH.adjacency(); every item is a memoryview slice of the graph indices
+    '''
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return self.graph.X
+
+    def __getitem__(self, variable):
+        if not 0 <= variable < self.graph.X:
+            raise IndexError(variable)
+
+        return self.graph.neighbours(variable)
+
+    def __iter__(self):
+        for variable in range(self.graph.X):
+            yield self.graph.neighbours(variable)
+
+
+def parse_graph(file_name):
+    '''
+    stream the tab separated input file
+        X   E   D
+        x   y       (E lines, one not-equal constraint each)
+    raises ValueError on a malformed file
+    '''
+    with open(file_name, 'r') as fp:
+        try:
+            X, E, D = map(int, fp.readline().rstrip('\n').split('\t'))
+        except ValueError:
+            raise ValueError('invalid header in %s' % file_name)
+
+        constraints = (map(int, line.rstrip('\n').split('\t'))
+                       for line in fp if line != '\n')
+
+        return build_graph(X, D, constraints, E)
+
+
+def build_graph(X, D, constraints, E=None):
+    '''
+    returns the GRAPH of X variables with D values each, constrained by the
+    (x, y) pairs of constraints
+    duplicated constraints are dropped and neighbours keep the order in
+    which they first appear
+    raises ValueError on a variable out of range, or if E is given and does
+    not match the number of constraints
+    '''
+    tails = array('i')
+    heads = array('i')
+    seen = set()
+    count = 0
+
+    for x, y in constraints:
+        count += 1
+
+        if not (0 <= x < X and 0 <= y < X):
+            raise ValueError('variable out of range: %d, %d' % (x, y))
+
+        if x > y:
+            x, y = y, x
+
+        key = x * X + y
+        if key not in seen:
+            seen.add(key)
+            tails.append(x)
+            heads.append(y)
+
+    if E is None:
+        E = count
+    elif count != E:
+        raise ValueError('expected %d constraints, found %d' % (E, count))
+
+    del seen
+
+    # counting sort of both directions of every edge into CSR rows
+    indptr = array('q', bytes(8 * (X + 1)))
+    for x, y in zip(tails, heads):
+        indptr[x + 1] += 1
+        if x != y:
+            indptr[y + 1] += 1
+
+    for variable in range(X):
+        indptr[variable + 1] += indptr[variable]
+
+    fill = indptr[:-1]
+    indices = array('i', bytes(4 * indptr[X]))
+    for x, y in zip(tails, heads):
+        indices[fill[x]] = y
+        fill[x] += 1
+        if x != y:
+            indices[fill[y]] = x
+            fill[y] += 1
+
+    return GRAPH(X, D, E, indptr, indices)
+
+
+def subgraph(graph, variables):
+    '''
+    returns the GRAPH induced by variables; variable variables[i] of graph
+    is variable i of the subgraph
+    '''
+    local = dict((variable, idx) for (idx, variable) in enumerate(variables))
+    constraints = ((idx, local[neighbour])
+                   for (idx, variable) in enumerate(variables)
+                   for neighbour in graph.neighbours(variable)
+                   if neighbour in local and variable <= neighbour)
+
+    return build_graph(len(variables), graph.D, constraints)
+
+
+def has_self_loop(graph):
+    '''
+    returns true iff a variable is constrained with itself, so no
+    assignment can satisfy graph
+    '''
+    return any(variable in graph.neighbours(variable)
+               for variable in range(graph.X))
+
+
+def degeneracy_order(graph):
+    '''
+    returns every variable in smallest-last order: the reverse of repeatedly
+    removing a variable of minimum degree, so each variable has at most
+    degeneracy neighbours before it
+    bucket queue, O(X + E)
+    '''
+    degree = [graph.degree(variable) for variable in range(graph.X)]
+    buckets = [set() for _ in range(max(degree, default=0) + 1)]
+    for variable in range(graph.X):
+        buckets[degree[variable]].add(variable)
+
+    removed = [False] * graph.X
+    order = []
+    low = 0
+
+    for _ in range(graph.X):
+        # removing a variable lowers the minimum degree by at most one
+        low = max(low - 1, 0)
+        while not buckets[low]:
+            low += 1
+
+        variable = buckets[low].pop()
+        removed[variable] = True
+        order.append(variable)
+
+        for neighbour in graph.neighbours(variable):
+            if not removed[neighbour] and neighbour != variable:
+                buckets[degree[neighbour]].discard(neighbour)
+                degree[neighbour] -= 1
+                buckets[degree[neighbour]].add(neighbour)
+
+    order.reverse()
+
+    return order
+
+
+def k_core(graph, D):
+    '''
+    k-core reduction: a variable with fewer than D neighbours left can
+    always be colored once the rest is, so remove it and repeat
+    returns (core, peeled): the variables left, and the removed ones in the
+    order they were removed; a variable with a self-loop is never removed
+    '''
+    degree = [graph.degree(variable) for variable in range(graph.X)]
+    for variable in range(graph.X):
+        if variable in graph.neighbours(variable):
+            degree[variable] = graph.X + D
+
+    removed = [degree[variable] < D for variable in range(graph.X)]
+    stack = [variable for variable in range(graph.X) if removed[variable]]
+    peeled = []
+
+    while stack:
+        variable = stack.pop()
+        peeled.append(variable)
+        for neighbour in graph.neighbours(variable):
+            degree[neighbour] -= 1
+            if not removed[neighbour] and degree[neighbour] < D:
+                removed[neighbour] = True
+                stack.append(neighbour)
+
+    core = [variable for variable in range(graph.X) if not removed[variable]]
+
+    return core, peeled
+
+
+def color_peeled(graph, core, assignment, peeled):
+    '''
+    returns the value of every variable of graph, given the assignment of
+    the core variables (indexed like core) and the variables removed by
+    peel, which are colored greedily in reverse order of removal: each one
+    then has fewer than D colored neighbours, so a value is always left
+    '''
+    ret = [None] * graph.X
+    for (variable, value) in zip(core, assignment):
+        ret[variable] = value
+
+    for variable in reversed(peeled):
+        used = set(ret[neighbour] for neighbour in graph.neighbours(variable))
+        value = 0
+        while value in used:
+            value += 1
+        ret[variable] = value
+
+    return ret
+
+
+def cache_path(file_name):
+    return file_name + CACHE_SUFFIX
+
+
+def source_stamp(file_name):
+    stat = os.stat(file_name)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_cache(graph, path, stamp=(0, 0)):
+    '''
+    write graph as a binary CSR cache tagged with the size and mtime of its
+    source file; written to a temporary file first so readers never see a
+    partial cache
+    '''
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+
+    with open(tmp, 'wb') as fp:
+        fp.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, stamp[0],
+                                   stamp[1], graph.X, graph.D, graph.E,
+                                   len(graph.indices)))
+        graph.indptr.tofile(fp)
+        graph.indices.tofile(fp)
+
+    os.replace(tmp, path)
+
+
+def read_header(fp, stamp=None):
+    '''
+    returns (X, D, E, nnz) from the cache header, or None if the cache is
+    corrupt or was built from a different version of the source
+    '''
+    header = fp.read(CACHE_HEADER.size)
+    if len(header) != CACHE_HEADER.size:
+        return None
+
+    magic, version, size, mtime, X, D, E, nnz = CACHE_HEADER.unpack(header)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        return None
+    if stamp is not None and (size, mtime) != stamp:
+        return None
+
+    return X, D, E, nnz
+
+
+def read_cache(path, stamp=None):
+    '''
+    returns the graph stored in the cache at path, or None if the cache is
+    missing, corrupt or was built from a different version of the source
+    '''
+    try:
+        fp = open(path, 'rb')
+    except OSError:
+        return None
+
+    with fp:
+        header = read_header(fp, stamp)
+        if header is None:
+            return None
+
+        X, D, E, nnz = header
+        indptr = array('q')
+        indices = array('i')
+        try:
+            indptr.fromfile(fp, X + 1)
+            indices.fromfile(fp, nnz)
+        except EOFError:
+            return None
+
+    return GRAPH(X, D, E, indptr, indices)
+
+
+def map_cache(path, stamp=None):
+    '''
+    returns the graph stored in the cache at path without copying it: the
+    file is mapped read-only and indptr/indices are memoryviews into the
+    mapping, so processes solving the same map share its page cache
+    returns None if the cache is missing, corrupt or out of date
+    '''
+    try:
+        fp = open(path, 'rb')
+    except OSError:
+        return None
+
+    with fp:
+        header = read_header(fp, stamp)
+        if header is None:
+            return None
+
+        X, D, E, nnz = header
+        end = CACHE_HEADER.size + 8 * (X + 1) + 4 * nnz
+        if os.fstat(fp.fileno()).st_size < end:
+            return None
+
+        buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(buffer)
+    indptr = view[CACHE_HEADER.size:CACHE_HEADER.size + 8 * (X + 1)].cast('q')
+    indices = view[CACHE_HEADER.size + 8 * (X + 1):end].cast('i')
+
+    return GRAPH(X, D, E, indptr, indices, buffer)
+
+
+def load_graph(file_name, cache=False, mapped=False):
+    '''
+    returns the GRAPH of the input file
+    cache: if true, reuse <file_name>.csr when it was built from the
+           current version of the input file, and (re)write it otherwise
+    mapped: serve the graph from a memory map of the cache (implies cache)
+    raises ValueError on a malformed input file
+    '''
+    if not cache and not mapped:
+        return parse_graph(file_name)
+
+    stamp = source_stamp(file_name)
+    path = cache_path(file_name)
+
+    if mapped:
+        graph = map_cache(path, stamp)
+        if graph is None:
+            write_cache(parse_graph(file_name), path, stamp)
+            graph = map_cache(path, stamp)
+        return graph
+
+    graph = read_cache(path, stamp)
+
+    if graph is None:
+        graph = parse_graph(file_name)
+        try:
+            write_cache(graph, path, stamp)
+        except OSError:
+            pass
+
+    return graph
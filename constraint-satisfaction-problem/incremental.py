@@ -0,0 +1,355 @@
+import sys
+import json
+import time
+import random
+import argparse
+import dfsb
+import minconflicts
+import solver
+from deadline import CANCELLED, DEADLINE
+from graph import build_graph, load_graph
+"""Map coloring problem: re-solve after small edits of the map"""
+
+# dfsb0/dfsb1/dfsb2: repair the edited region with DFSB mode 0/1/2, every
+# other variable keeping its value
+# minconflicts: MINCONFLICTS over the whole map, from the previous solution
+ALGORITHMS = ('dfsb0', 'dfsb1', 'dfsb2', 'minconflicts')
+
+
+class INCREMENTAL:
+    '''
+    a map coloring problem kept solved while its constraints are edited
+        adjacency: neighbour sets of every variable, so an edit costs
+                   O(edited constraints) instead of rebuilding the CSR graph
+        dirty: variables which may violate a constraint, i.e. the
+               endpoints of added constraints with the same value and the
+               added variables; only they and, if needed, growing layers of
+               their neighbours are searched again, see repair
+    variables keep their numbers across edits: added ones are numbered from
+    X on, and lowering X removes the last variables and their constraints
+    '''
+
+    def __init__(self, problem, assignment, colors=None, algorithm='dfsb1'):
+        '''
+        problem: as solver.solve
+        assignment: value of every variable, e.g. a previous solution; the
+                    variables it leaves in conflict are repaired by the
+                    next edit
+        raises ValueError on a malformed problem or assignment, or an
+        unknown algorithm
+        '''
+        if algorithm not in ALGORITHMS:
+            raise ValueError('unknown algorithm: %s' % algorithm)
+
+        graph = solver.as_graph(problem, colors)
+        if len(assignment) != graph.X:
+            raise ValueError('expected %d values, found %d' %
+                             (graph.X, len(assignment)))
+        if any(not 0 <= value < graph.D for value in assignment):
+            raise ValueError('value out of range')
+
+        self.D = graph.D
+        self.algorithm = algorithm
+        self.adjacency = [set(graph.neighbours(variable))
+                          for variable in range(graph.X)]
+        self.assignment = list(assignment)
+        self.loops = set(variable for variable in range(graph.X)
+                         if variable in self.adjacency[variable])
+        self.dirty = set(
+            variable for variable in range(graph.X)
+            if any(self.assignment[neighbour] == self.assignment[variable]
+                   for neighbour in self.adjacency[variable]))
+
+    @property
+    def X(self):
+        return len(self.adjacency)
+
+    def graph(self):
+        '''
+        returns the GRAPH of the edited problem
+        '''
+        return build_graph(self.X, self.D, (
+            (variable, neighbour) for variable in range(self.X)
+            for neighbour in self.adjacency[variable]
+            if variable <= neighbour))
+
+    def edit(self, add=(), remove=(), X=None):
+        '''
+        apply an edit of the problem, without solving it
+        add, remove: (x, y) constraints added and removed; removing one
+                     which does not exist does nothing
+        X: new number of variables, if it changes
+        raises ValueError on a variable out of range, before anything is
+        changed
+        '''
+        add = list(add)
+        remove = list(remove)
+        size = self.X if X is None else X
+        if size < 0:
+            raise ValueError('negative number of variables: %d' % size)
+        for (x, y) in remove + add:
+            if not (0 <= x < size and 0 <= y < size):
+                raise ValueError('variable out of range: %d, %d' % (x, y))
+
+        if X is not None:
+            for variable in range(X, self.X):
+                for neighbour in self.adjacency[variable]:
+                    if neighbour < X:
+                        self.adjacency[neighbour].discard(variable)
+                self.loops.discard(variable)
+                self.dirty.discard(variable)
+
+            del self.adjacency[X:]
+            del self.assignment[X:]
+            for variable in range(self.X, X):
+                self.adjacency.append(set())
+                self.assignment.append(None)
+                self.dirty.add(variable)
+
+        for (x, y) in remove:
+            self.adjacency[x].discard(y)
+            self.adjacency[y].discard(x)
+            if x == y:
+                self.loops.discard(x)
+
+        for (x, y) in add:
+            self.adjacency[x].add(y)
+            self.adjacency[y].add(x)
+            if x == y:
+                self.loops.add(x)
+            elif self.assignment[x] == self.assignment[y]:
+                self.dirty.add(x)
+                self.dirty.add(y)
+
+    def resolve(self, add=(), remove=(), X=None, timeout=60, seed=None,
+                cancelled=None):
+        '''
+        apply an edit and repair the assignment
+        inputs: add, remove, X: the edit, see edit
+                timeout, seed, cancelled: as solver.solve
+        returns: {
+                  'status': 'solved', 'unsatisfiable', 'timeout', 'cancelled'
+                            or 'failed' (local search gave up)
+                  'assignment': value of every variable, or None
+                  'nodes': csp.counter of the solvers
+                  'region': variables searched again
+                  'changed': variables whose value changed
+                  'time': seconds spent
+                  }
+        the dirty variables of an edit which was not solved are repaired by
+        the next one
+        raises ValueError on a variable out of range
+        '''
+        start = time.monotonic()
+        self.edit(add, remove, X)
+
+        if seed is not None:
+            random.seed(seed)
+
+        before = list(self.assignment)
+        ret = {'status': 'solved', 'nodes': 0, 'region': 0}
+
+        if self.loops:
+            ret['status'] = 'unsatisfiable'
+        elif self.dirty:
+            deadline = DEADLINE(timeout, cancelled)
+            try:
+                if self.algorithm == 'minconflicts':
+                    self.search(ret, deadline)
+                else:
+                    self.repair(ret, deadline)
+            except TimeoutError:
+                ret['status'] = 'timeout'
+            except CANCELLED:
+                ret['status'] = 'cancelled'
+
+        if ret['status'] == 'solved':
+            self.dirty.clear()
+            ret['assignment'] = list(self.assignment)
+        else:
+            ret['assignment'] = None
+        ret['changed'] = sum(old != new for (old, new) in
+                             zip(before, self.assignment))
+        ret['time'] = time.monotonic() - start
+
+        return ret
+
+    def repair(self, ret, deadline):
+        '''
+        search the dirty variables again with DFSB, every other variable
+        keeping its value; while that fails, add layers of neighbours until
+        the region has doubled, so the work stays proportional to the
+        region an edit actually needs
+        the problem is unsatisfiable once a region has no neighbours left
+        outside of it
+        '''
+        region = set(self.dirty)
+
+        while True:
+            ret['region'] = len(region)
+            if self.solve_region(sorted(region), ret, deadline):
+                return
+
+            size = len(region)
+            layer = region
+            while layer and len(region) < 2 * size:
+                layer = set(neighbour for variable in layer
+                            for neighbour in self.adjacency[variable]
+                            if neighbour not in region)
+                region |= layer
+
+            if len(region) == size:
+                ret['status'] = 'unsatisfiable'
+                return
+
+    def solve_region(self, region, ret, deadline):
+        '''
+        search the variables of region, the values of their neighbours
+        outside of it being removed from their domains beforehand
+        returns true iff the region was solved, its values are then set
+        '''
+        local = dict((variable, idx) for (idx, variable) in enumerate(region))
+        graph = build_graph(len(region), self.D, (
+            (idx, local[neighbour]) for (idx, variable) in enumerate(region)
+            for neighbour in self.adjacency[variable]
+            if neighbour in local and variable < neighbour))
+
+        csp = dfsb.CSP(graph, None, int(self.algorithm[-1]))
+        csp.deadline = deadline
+        domain = csp.m0_domain if csp.mode == 0 else csp.m1_domain
+        for (idx, variable) in enumerate(region):
+            for neighbour in self.adjacency[variable]:
+                if neighbour not in local:
+                    domain.remove(idx, self.assignment[neighbour])
+        if csp.mode != 0:
+            csp.selector.update(range(len(region)))
+
+        try:
+            solution = dfsb.DFSB().search(csp)
+        finally:
+            ret['nodes'] += csp.counter
+
+        if solution is None:
+            return False
+
+        for (idx, variable) in enumerate(region):
+            self.assignment[variable] = solution[idx]
+
+        return True
+
+    def search(self, ret, deadline):
+        '''
+        run MINCONFLICTS over the whole problem, starting from the current
+        assignment; added variables start with a greedy value
+        '''
+        csp = minconflicts.CSP(self.graph(), None, initializer='random')
+        csp.deadline = deadline
+
+        assignment = dict((variable, value) for (variable, value) in
+                          enumerate(self.assignment) if value is not None)
+        for variable in range(self.X):
+            if variable not in assignment:
+                assignment[variable] = csp.greedy_value(variable, assignment)
+        csp.start_from(assignment)
+
+        ret['region'] = len(csp.conflicted)
+        try:
+            solution = minconflicts.MINCONFLICTS().main_process(csp)
+        finally:
+            ret['nodes'] += csp.counter
+
+        if not csp.goal_test(solution):
+            ret['status'] = 'failed'
+            return
+
+        self.assignment = [solution[variable] for variable in range(self.X)]
+
+
+def read_solution(file_name):
+    '''
+    returns the values of an output file of dfsb.py/minconflicts.py
+    raises ValueError if it holds no answer
+    '''
+    with open(file_name) as fp:
+        return [int(line) for line in fp if line.strip()]
+
+
+def read_diff(file_name):
+    '''
+    returns (add, remove, X) of a JSON diff file
+        {"add": [[x, y], ...], "remove": [[x, y], ...], "X": variables}
+    every key being optional
+    raises ValueError on a malformed file
+    '''
+    with open(file_name) as fp:
+        diff = json.load(fp)
+
+    try:
+        add = [(int(x), int(y)) for (x, y) in diff.get('add', ())]
+        remove = [(int(x), int(y)) for (x, y) in diff.get('remove', ())]
+        X = diff.get('X')
+    except (AttributeError, TypeError):
+        raise ValueError('invalid diff')
+
+    return add, remove, None if X is None else int(X)
+
+
+def write_problem(file_name, problem):
+    '''
+    write the edited problem in the input format, for the next edit
+    '''
+    graph = problem.graph()
+
+    with open(file_name, 'w') as fp:
+        fp.write('%d\t%d\t%d\n' % (graph.X, graph.E, graph.D))
+        for variable in range(graph.X):
+            for neighbour in graph.neighbours(variable):
+                if variable <= neighbour:
+                    fp.write('%d\t%d\n' % (variable, neighbour))
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='incremental.py',
+        description='re-solve a map coloring problem after an edit, '
+        'starting from its previous solution')
+    parser.add_argument('input_file', help='the problem before the edit')
+    parser.add_argument('solution_file', help='its previous solution')
+    parser.add_argument('diff_file',
+                        help='JSON {"add": [[x, y], ...], "remove": '
+                        '[[x, y], ...], "X": variables}')
+    parser.add_argument('output_file')
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='dfsb1',
+                        help='dfsb0/1/2: search the edited region again, '
+                        'minconflicts: local search over the whole map')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--write-input', default=None,
+                        help='also write the edited problem there')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse/write a binary graph cache next to the '
+                        'input file')
+
+    return parser.parse_args(argv[1:])
+
+
+def main():
+    args = parse_arguments(sys.argv)
+
+    try:
+        problem = INCREMENTAL(load_graph(args.input_file, args.cache),
+                              read_solution(args.solution_file),
+                              algorithm=args.algorithm)
+        add, remove, X = read_diff(args.diff_file)
+        result = problem.resolve(add, remove, X, args.timeout, args.seed)
+    except ValueError:
+        print('Invalid input file')
+        sys.exit(-1)
+
+    solver.write_output(args.output_file, result)
+    if args.write_input is not None:
+        write_problem(args.write_input, problem)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,85 +1,143 @@
 import sys
-import time
 import random
-import signal
+import heapq
+import argparse
+from collections import OrderedDict
+from domain import DOMAIN
+from deadline import CANCELLED, DEADLINE
+from checkpoint import CHECKPOINT, terminated
+from graph import GRAPH, NEIGHBOURS, color_peeled, degeneracy_order, \
+    has_self_loop, k_core, load_graph, subgraph
+from stats import STATS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 DEBUG = False
 
+# default bound on the number of visited assignments kept by TABU
+DEFAULT_TABU_SIZE = 100000
+
+ENGINES = ('python', 'numpy')
+
+# how the starting assignment is built
+#     random: uniformly random values
+#     greedy: greedy coloring in degeneracy order
+#     dsatur: greedy coloring, most saturated variable first (Brelaz)
+INITIALIZERS = ('random', 'greedy', 'dsatur')
+DEFAULT_INITIALIZER = 'dsatur'
+
+# share of the variables given a random value when a greedy start restarts
+RESTART_NOISE = 0.1
+
 
 class CSP:
-    def __init__(self, argv):
-        if len(argv) != 3:
-            print('Invalid input arguments. Usage:')
-            print('\tminconflicts.py <input_file> <output_file>')
-            sys.exit(-1)
-
-        self.csp = self.parse_input(argv[1])
-        self.output = argv[2]
+    # counters reported by STATS: (name, attribute), steps being the
+    # iterations of the search loop over all runs and resumes, best_conflicts
+    # the fewest violated constraints seen so far
+    COUNTERS = (('steps', 'counter'), ('moves', 'move_counter'),
+                ('plateau_moves', 'plateau_counter'),
+                ('restarts', 'restart_counter'),
+                ('best_conflicts', 'best_conflicts'))
+
+    def __init__(self, input_file, output_file=None, cache=False,
+                 mapped=False, initializer=DEFAULT_INITIALIZER,
+                 assignment=None, tables=True):
+        '''
+        input_file: path of the input file, or an already loaded GRAPH
+        initializer: one of INITIALIZERS
+        assignment: complete assignment to start from instead of one built
+                    by initializer, which then only serves restarts
+        tables: build the Zobrist keys and the conflict table MINCONFLICTS
+                works on, X * D Python ints each; NUMPY_MINCONFLICTS counts
+                conflicts over the CSR arrays itself and does without them
+        raises ValueError on a malformed input file or an unknown initializer
+        '''
+        if initializer not in INITIALIZERS:
+            raise ValueError('unknown initializer: %s' % initializer)
+
+        self.tables = tables
+        self.csp = self.parse_input(input_file, cache, mapped)
+        self.output = output_file
+        self.initializer = initializer
+        self.deadline = DEADLINE()
+        self.stats = None
+        self.checkpoint = None
+        # (full graph, core, peeled) when only the core of the input is
+        # searched, see expand
+        self.peeled = None
         self.counter = 0
+        # moves changing a value, those of them not lowering the conflicts
+        # of the variable, and restarts
+        self.move_counter = 0
+        self.plateau_counter = 0
+        self.restart_counter = 0
+        # the assignment violating the fewest constraints so far, see
+        # record_best
+        self.best = None
+        self.best_conflicts = None
+        self.journal = None
         self.domain = self.init_domain()
-        self.assign = self.initial_complete_assignment()
+        if assignment is None:
+            self.assign = self.initial_complete_assignment()
+        else:
+            self.assign = dict(assignment)
         self.last_variable = 0
+        self.zobrist = None
+        if tables:
+            self.init_zobrist()
+        self.reset()
 
-    def parse_input(self, file_name):
+    def parse_input(self, file_name, cache=False, mapped=False):
         '''
         parse input file
         inputs: input file
+                cache: reuse/write the binary graph cache, see graph.py
+                mapped: read the neighbours straight from a memory map of
+                        the cache
         returns: csp {
                       'X': variables
                       'D': domains
                       'C':{'counts': number of counstraints
-                           'counstraint': each constraint}
+                           'constraint': neighbours of each variable}
                       }
+        without tables, the neighbours are read from the CSR arrays of the
+        graph rather than copied into a list per variable
         '''
-        ret = {}
-        fp = open(file_name, 'r')
-
-        try:
-            ret['C'] = {}
-            ret['X'], ret['C']['counts'], ret['D'] = map(
-                int,
-                fp.readline().rstrip('\n').split('\t'))
-            constraints = fp.readlines()
-
-            if len(constraints) != ret['C']['counts']:
-                raise
-
-            ret['C']['constraint'] = {val: [] for val in range(ret['X'])}
-
-            for cons in constraints:
-                x, y = map(int, cons.rstrip('\n').split('\t'))
-                if y not in ret['C']['constraint'][x]:
-                    ret['C']['constraint'][x].append(y)
-                if x not in ret['C']['constraint'][y]:
-                    ret['C']['constraint'][y].append(x)
-
-            fp.close()
-        except:
-            print('Invalid input file')
-            fp.close()
-            sys.exit(-1)
-
-        return ret
+        if isinstance(file_name, GRAPH):
+            self.graph = file_name
+        else:
+            self.graph = load_graph(file_name, cache, mapped)
+
+        return {
+            'X': self.graph.X,
+            'D': self.graph.D,
+            'C': {
+                'counts': self.graph.E,
+                'constraint': self.graph.adjacency() if self.tables else
+                NEIGHBOURS(self.graph)
+            }
+        }
 
     def init_domain(self):
-        ret = {}
-
-        for variable in range(self.csp['X']):
-            ret[variable] = [value for value in range(self.csp['D'])]
-
-        return ret
+        return DOMAIN(self.csp['X'], self.csp['D'])
 
-    def create_output(self, assignment):
+    def create_output(self, assignment, conflicts=None):
         '''
         write the searching result
+        conflicts: number of constraints assignment violates; if given, an
+                   assignment which is no solution is written after a "No
+                   answer" line holding that number
         '''
         fp = open(self.output, 'w')
 
         if self.goal_test(assignment):
-            [
-                fp.write(str(assignment[result]) + '\n')
-                for result in range(self.csp['X'])
-            ]
+            [fp.write(str(value) + '\n') for value in self.expand(assignment)]
+        elif conflicts is not None and assignment is not None:
+            fp.write("No answer, %d conflicts\n" % conflicts)
+            [fp.write(str(value) + '\n') for value in self.expand(assignment)]
         else:
             fp.write("No answer")
 
@@ -96,7 +154,32 @@ class CSP:
                 print("No answer")
             print("=========================\n\n")
 
+    def expand(self, assignment):
+        '''
+        returns the value of every variable of the input; with peeled, the
+        variables left out of the search are colored greedily around
+        assignment, which adds no conflict (see graph.color_peeled)
+        '''
+        values = [assignment[variable] for variable in range(self.csp['X'])]
+        if self.peeled is None:
+            return values
+
+        full, core, peeled = self.peeled
+
+        return color_peeled(full, core, values, peeled)
+
     def initial_complete_assignment(self):
+        '''
+        returns a complete assignment built by self.initializer
+        '''
+        if self.initializer == 'dsatur':
+            return self.dsatur_assignment()
+        if self.initializer == 'greedy':
+            return self.greedy_assignment()
+
+        return self.random_assignment()
+
+    def random_assignment(self):
         '''
         randomly assign the value to each variable
         returns a complete assignment
@@ -108,43 +191,265 @@ class CSP:
 
         return assignment
 
+    def greedy_value(self, variable, assignment):
+        '''
+        returns the smallest value shared with the fewest assigned
+        neighbours of variable
+        '''
+        counts = [0] * self.csp['D']
+
+        for neighbour in self.csp['C']['constraint'][variable]:
+            if neighbour in assignment:
+                counts[assignment[neighbour]] += 1
+
+        return counts.index(min(counts))
+
+    def greedy_assignment(self):
+        '''
+        greedy coloring in degeneracy order: each variable has at most
+        degeneracy neighbours assigned before it, so on sparse maps few of
+        them are left in conflict
+        returns a complete assignment
+        '''
+        assignment = {}
+
+        for variable in degeneracy_order(self.graph):
+            assignment[variable] = self.greedy_value(variable, assignment)
+
+        return assignment
+
+    def dsatur_assignment(self):
+        '''
+        DSatur: repeatedly assign greedily the variable whose assigned
+        neighbours hold the most distinct values, the largest degree and
+        then a random draw breaking ties
+        saturation only grows, so outdated heap entries are recognised by
+        their saturation and skipped
+        returns a complete assignment
+        reference: Brelaz, New methods to color the vertices of a graph
+        '''
+        constraint = self.csp['C']['constraint']
+        assignment = {}
+        saturation = [0] * self.csp['X']
+        seen = [0] * self.csp['X']
+        heap = [(0, -len(constraint[variable]), random.random(), variable)
+                for variable in range(self.csp['X'])]
+        heapq.heapify(heap)
+
+        while heap:
+            entry = heapq.heappop(heap)
+            variable = entry[3]
+            if variable in assignment or -entry[0] != saturation[variable]:
+                continue
+
+            value = self.greedy_value(variable, assignment)
+            assignment[variable] = value
+            bit = 1 << value
+
+            for neighbour in constraint[variable]:
+                if neighbour not in assignment and not seen[neighbour] & bit:
+                    seen[neighbour] |= bit
+                    saturation[neighbour] += 1
+                    heapq.heappush(heap, (-saturation[neighbour],
+                                          -len(constraint[neighbour]),
+                                          random.random(), neighbour))
+
+        return assignment
+
+    def restart(self):
+        '''
+        start the search again from a new assignment: a fresh random one,
+        or a new greedy one with RESTART_NOISE of its values drawn at
+        random, since the greedy initializers mostly rebuild the same
+        assignment
+        '''
+        self.restart_counter += 1
+        self.assign = self.initial_complete_assignment()
+
+        if self.initializer != 'random':
+            for variable in range(self.csp['X']):
+                if random.random() < RESTART_NOISE:
+                    self.assign[variable] = random.randrange(self.csp['D'])
+
+        self.reset()
+
+    def reset(self):
+        '''
+        rebuild what is derived from the current assignment: the hash and
+        the conflict table, or only the number of violated constraints
+        without tables
+        '''
+        if self.tables:
+            self.rehash()
+            self.init_conflicts()
+            return
+
+        self.violations = sum(
+            1 for variable in range(self.csp['X'])
+            for neighbour in self.graph.neighbours(variable)
+            if variable < neighbour and
+            self.assign[variable] == self.assign[neighbour])
+        self.journal = None
+        self.record_best()
+
+    def init_zobrist(self):
+        '''
+        give every (variable, value) pair a random 64 bit key; the hash of an
+        assignment is the xor of the keys of its pairs and is updated in
+        O(1) by assign_value
+        '''
+        self.zobrist = [[random.getrandbits(64) for _ in range(self.csp['D'])]
+                        for _ in range(self.csp['X'])]
+
+    def rehash(self):
+        '''
+        compute the hash of the whole current assignment
+        '''
+        self.hash = 0
+
+        for variable in range(self.csp['X']):
+            self.hash ^= self.zobrist[variable][self.assign[variable]]
+
+    def init_conflicts(self):
+        '''
+        build the conflict table from the current assignment
+            conflicts[variable][value]: number of neighbours of variable
+                                        currently assigned value
+            conflicted: variables which have at least one conflict, kept as a
+                        list with a position index for O(1) add/remove/choice
+        '''
+        constraint = self.csp['C']['constraint']
+        self.conflicts = [[0] * self.csp['D'] for _ in range(self.csp['X'])]
+        self.conflicted = []
+        self.conflicted_index = {}
+
+        for variable in range(self.csp['X']):
+            row = self.conflicts[variable]
+            for neighbour in constraint[variable]:
+                row[self.assign[neighbour]] += 1
+
+        for variable in range(self.csp['X']):
+            self.update_conflicted(variable)
+
+        self.violations = sum(self.conflicts[variable][self.assign[variable]]
+                              for variable in range(self.csp['X'])) // 2
+        self.journal = None
+        self.record_best()
+
+    def record_best(self):
+        '''
+        remember the current assignment if it violates fewer constraints
+        than the best one so far
+        rather than copying the whole assignment on every improvement, the
+        moves made since the last copy are kept in journal and replayed
+        onto it; journal is dropped, and the next improvement copies the
+        assignment, once it holds more than X moves or the assignment was
+        replaced
+        '''
+        if self.best is not None and self.violations >= self.best_conflicts:
+            return
+
+        if self.journal is None:
+            self.best = dict(self.assign)
+        else:
+            for (variable, value) in self.journal:
+                self.best[variable] = value
+
+        self.journal = []
+        self.best_conflicts = self.violations
+
+    def snapshot(self):
+        '''
+        returns the current and the best assignment as plain data, see
+        checkpoint.CHECKPOINT
+        '''
+        return {
+            'assign': [self.assign[variable]
+                       for variable in range(self.csp['X'])],
+            'best': [self.best[variable] for variable in range(self.csp['X'])],
+            'best_conflicts': self.best_conflicts
+        }
+
+    def start_from(self, assignment):
+        '''
+        search from assignment instead, e.g. the solution of a problem
+        which was slightly edited since
+        '''
+        self.assign = dict(assignment)
+        self.best = None
+        self.reset()
+
+    def restore(self, state):
+        self.assign = dict(enumerate(state['assign']))
+        self.best = dict(enumerate(state['best']))
+        self.best_conflicts = state['best_conflicts']
+        self.reset()
+
+    def update_conflicted(self, variable):
+        '''
+        keep the conflicted list in sync with the conflicts of variable
+        '''
+        in_conflict = self.conflicts[variable][self.assign[variable]] > 0
+        index = self.conflicted_index.get(variable)
+
+        if in_conflict and index is None:
+            self.conflicted_index[variable] = len(self.conflicted)
+            self.conflicted.append(variable)
+        elif not in_conflict and index is not None:
+            last = self.conflicted.pop()
+            del self.conflicted_index[variable]
+            if last != variable:
+                self.conflicted[index] = last
+                self.conflicted_index[last] = index
+
     def assign_value(self, variable, value):
         '''
         assign variable and value to assignment
+        only the conflict rows of the neighbours of variable are updated
         '''
-        self.counter += 1
-        self.assign[variable] = value
+        old_value = self.assign[variable]
 
-    def count_conflicts(self, variable, value):
-        constraints = self.csp['C']['constraint'][variable]
-        count = 0
+        if old_value == value:
+            return
 
-        if len(constraints) > 0:
-            for conflict in constraints:
-                if self.assign[conflict] == value:
-                    count += 1
+        self.assign[variable] = value
+        self.hash ^= self.zobrist[variable][old_value] ^ \
+            self.zobrist[variable][value]
+        row = self.conflicts[variable]
+        self.violations += row[value] - row[old_value]
+
+        for neighbour in self.csp['C']['constraint'][variable]:
+            row = self.conflicts[neighbour]
+            row[old_value] -= 1
+            row[value] += 1
+            self.update_conflicted(neighbour)
+
+        self.update_conflicted(variable)
+
+        if self.journal is not None:
+            self.journal.append((variable, value))
+            if len(self.journal) > self.csp['X']:
+                self.journal = None
+        if self.violations < self.best_conflicts:
+            self.record_best()
 
+    def count_conflicts(self, variable, value):
         if DEBUG:
-            print("constraints[%d]: " % variable, constraints)
+            print("constraints[%d]: " % variable,
+                  self.csp['C']['constraint'][variable])
 
-        return count
+        return self.conflicts[variable][value]
 
     def get_conflict_list(self):
         '''
         return a list of variables which has at least one conflict
         '''
-        conflict_list = []
-
-        for idx in self.assign:
-            if self.count_conflicts(idx, self.assign[idx]) > 0:
-                conflict_list.append(idx)
-
         if DEBUG:
             print("constraints: ", self.csp['C']['constraint'])
             print("current assignment: ", self.assign)
-            print("conflict list: ", conflict_list)
+            print("conflict list: ", self.conflicted)
 
-        return conflict_list
+        return self.conflicted
 
     def goal_test(self, assignment):
         '''
@@ -169,13 +474,16 @@ class MINCONFLICTS:
     min-conflicts local search heuristic
     '''
 
-    def __init__(self):
+    def __init__(self, tabu_size=DEFAULT_TABU_SIZE, tabu_tenure=0,
+                 tabu_policy='fifo'):
         '''
-        tabu_list: a list of visited states and forbidding the algorithm to retun to these states 
+        tabu_list: bounded memory of visited states and forbidden moves, see TABU
         last_variable: keeps the last randomly selected variable to avoid picking the same variable continuously
+        iteration: step of main_process at its last deadline poll
         '''
-        self.tabu_list = {}
+        self.tabu_list = TABU(tabu_size, tabu_tenure, tabu_policy)
         self.last_variable = 0
+        self.iteration = 0
 
     def main_process(self, csp, max_steps=1000000):
         '''
@@ -189,30 +497,50 @@ class MINCONFLICTS:
 
         for iteration in range(max_steps):
 
-            if csp.goal_test(csp.assign):
-                csp.counter = iteration
+            if not csp.conflicted:
                 return csp.assign
 
+            if iteration & 0xff == 0:
+                self.iteration = iteration
+                csp.deadline.check()
+                if csp.stats is not None:
+                    csp.stats.tick()
+                if csp.checkpoint is not None:
+                    csp.checkpoint.tick(self, csp)
+
+            csp.counter += 1
             conflict_list = csp.get_conflict_list()
 
+            # a variable constrained with itself may be left the only one
             while True:
                 variable = random.choice(conflict_list)
-                if variable != self.last_variable:
+                if variable != self.last_variable or \
+                        len(conflict_list) == 1:
                     self.last_variable = variable
                     break
 
-            conflict_list = [[csp.count_conflicts(variable, value), value]
-                             for value in csp.domain[variable]]
-            values = [value[1] for value in sorted(conflict_list)]
+            # sorted is stable, so ties stay in ascending value order
+            values = sorted(csp.domain.values(variable),
+                            key=csp.conflicts[variable].__getitem__)
+
+            old_value = csp.assign[variable]
 
             for value in values:
+                if self.tabu_list.forbidden(variable, value, iteration) and \
+                        csp.conflicts[variable][value] > 0:
+                    continue
                 csp.assign_value(variable, value)
-                key = ''.join("%d" % val for (key, val) in csp.assign.items())
-                if key not in self.tabu_list:
-                    self.tabu_list[key] = 1
+                if self.tabu_list.visit(csp.hash):
                     valid_assign = True
                     break
 
+            if csp.assign[variable] != old_value:
+                self.tabu_list.forbid(variable, old_value, iteration)
+                csp.move_counter += 1
+                if csp.conflicts[variable][csp.assign[variable]] >= \
+                        csp.conflicts[variable][old_value]:
+                    csp.plateau_counter += 1
+
             if not valid_assign:
                 count += 1
 
@@ -220,36 +548,382 @@ class MINCONFLICTS:
 
             if count == 100:
                 count = 0
-                csp.initial_complete_assignment()
+                csp.restart()
 
         return csp.assign
 
+    def snapshot(self, csp):
+        '''
+        returns the search state as plain data for checkpoint.CHECKPOINT:
+        the assignments of csp, its Zobrist keys and the tabu memory, whose
+        tenures are kept relative to the current step since main_process
+        counts its steps from 0 again
+        '''
+        state = csp.snapshot()
+        state['zobrist'] = csp.zobrist
+        state['visited'] = list(self.tabu_list.visited)
+        state['moves'] = [
+            (variable, value, expiry - self.iteration)
+            for ((variable, value), expiry) in self.tabu_list.moves.items()
+            if expiry > self.iteration
+        ]
+        state['last_variable'] = self.last_variable
+
+        return state
+
+    def restore(self, csp, state):
+        csp.zobrist = state['zobrist']
+        csp.restore(state)
+        self.tabu_list.visited = OrderedDict(
+            (key, True) for key in state['visited'])
+        self.tabu_list.moves = dict(
+            ((variable, value), expiry)
+            for (variable, value, expiry) in state['moves'])
+        self.last_variable = state['last_variable']
+        self.iteration = 0
+
+
+class NUMPY_MINCONFLICTS:
+    '''
+    vectorized min-conflicts
+        the constraint graph is held as CSR arrays (indptr, indices) and the
+        assignment as an int array; conflicts[variable, value] is built with
+        one bincount and each move only updates the rows of the neighbours
+        of the moved variable with fancy indexing
+
+    every step takes a batch of conflicted variables, picks the
+    min-conflicts value of the whole batch at once (random tie-break), and
+    applies the moves of batch members whose neighbours did not move in the
+    same step
+    '''
+
+    def __init__(self, batch_size=64, noise=0.02):
+        '''
+        batch_size: number of conflicted variables considered per step
+        noise: probability of a random value instead of the min-conflicts one
+        '''
+        if np is None:
+            raise ImportError('the numpy engine requires NumPy')
+
+        self.batch_size = batch_size
+        self.noise = noise
+
+    def csr(self, csp):
+        '''
+        returns the adjacency of csp as CSR arrays (indptr, indices),
+        sharing the buffers of the loaded graph
+        '''
+        indptr = np.frombuffer(csp.graph.indptr, dtype=np.int64)
+        indices = np.frombuffer(csp.graph.indices, dtype=np.int32)
+
+        return indptr, indices
+
+    def count_conflicts(self, indptr, indices, assign, values):
+        '''
+        returns the X * D matrix of conflict counts of every variable
+        '''
+        variables = len(assign)
+        rows = np.repeat(np.arange(variables), np.diff(indptr))
+        counts = np.bincount(rows * values + assign[indices],
+                             minlength=variables * values)
 
-class TIMER:
+        return counts.reshape(variables, values)
+
+    def main_process(self, csp, max_steps=1000000):
+        '''
+        returns a solution or failure
+        inputs: csp, a constraint satisfaction problem
+        max_steps: the number of batched steps allowed before giving up
+        '''
+        rng = np.random.default_rng(random.getrandbits(64))
+        values = csp.csp['D']
+        indptr, indices = self.csr(csp)
+        assign = np.fromiter(
+            (csp.assign[variable] for variable in range(csp.csp['X'])),
+            dtype=np.int64, count=csp.csp['X'])
+        conflicts = self.count_conflicts(indptr, indices, assign, values)
+        everyone = np.arange(csp.csp['X'])
+        moved = np.full(csp.csp['X'], -1, dtype=np.int64)
+        # best assignment of this run, if better than csp.best
+        best = None
+        best_conflicts = csp.best_conflicts
+
+        try:
+            for step in range(max_steps):
+                counts = conflicts[everyone, assign]
+                conflicted = np.flatnonzero(counts)
+
+                if conflicted.size == 0:
+                    best = assign.copy()
+                    best_conflicts = 0
+                    break
+
+                violations = int(counts.sum()) // 2
+                if violations < best_conflicts:
+                    best = assign.copy()
+                    best_conflicts = violations
+
+                csp.deadline.check()
+                if csp.stats is not None:
+                    csp.stats.tick()
+                if csp.checkpoint is not None and csp.checkpoint.due():
+                    self.sync(csp, assign, best, best_conflicts)
+                    csp.checkpoint.save(self, csp)
+
+                csp.counter += 1
+                if conflicted.size > self.batch_size:
+                    conflicted = rng.choice(conflicted, self.batch_size,
+                                            replace=False)
+
+                scores = conflicts[conflicted] + rng.random(
+                    (conflicted.size, values))
+                choice = scores.argmin(axis=1)
+                walk = rng.random(conflicted.size) < self.noise
+                choice[walk] = rng.integers(0, values, int(walk.sum()))
+
+                for variable, value in zip(conflicted.tolist(),
+                                           choice.tolist()):
+                    old_value = int(assign[variable])
+                    if value == old_value or moved[variable] == step:
+                        continue
+
+                    neighbours = indices[indptr[variable]:
+                                         indptr[variable + 1]]
+                    conflicts[neighbours, old_value] -= 1
+                    conflicts[neighbours, value] += 1
+                    assign[variable] = value
+                    moved[neighbours] = step
+                    csp.move_counter += 1
+        finally:
+            # also on timeout, so csp holds the progress of this run
+            self.sync(csp, assign, best, best_conflicts)
+
+        return csp.assign
+
+    def sync(self, csp, assign, best, best_conflicts):
+        '''
+        write the assignment and the best one of this run back to csp
+        '''
+        for variable, value in enumerate(assign.tolist()):
+            csp.assign[variable] = value
+
+        if best is not None and best_conflicts < csp.best_conflicts:
+            csp.best = dict(enumerate(best.tolist()))
+            csp.best_conflicts = best_conflicts
+
+    def snapshot(self, csp):
+        '''
+        returns the assignments of csp, see checkpoint.CHECKPOINT; the
+        arrays of main_process are rebuilt from them
+        '''
+        return csp.snapshot()
+
+    def restore(self, csp, state):
+        csp.restore(state)
+
+
+class TABU:
     '''
-    reference: https://docs.python.org/3/library/signal.html#example
+    tabu memory of the min-conflicts search
+        visited: Zobrist hashes of visited assignments; at most capacity of
+                 them are kept, evicting the oldest (fifo) or the least
+                 recently revisited (lru) one
+        tenure: after a variable leaves a value, assigning that value back is
+                forbidden for tenure steps unless it clears all conflicts of
+                the variable (0 disables it)
+    reference: Glover, Tabu Search - Part I
     '''
 
-    def __init__(self, time=60):
-        self.time = time
-        signal.signal(signal.SIGALRM, self.timeout)
-        signal.alarm(self.time)
+    def __init__(self, capacity=DEFAULT_TABU_SIZE, tenure=0, policy='fifo'):
+        if policy not in ('fifo', 'lru'):
+            raise ValueError('unknown tabu policy: %s' % policy)
+
+        self.capacity = capacity
+        self.tenure = tenure
+        self.policy = policy
+        self.visited = OrderedDict()
+        self.moves = {}
 
-    def timeout(self, signum, frame):
-        raise TimeoutError
+    def __len__(self):
+        return len(self.visited)
+
+    def visit(self, key):
+        '''
+        returns true iff the assignment hashed to key was not visited yet,
+        and remembers it
+        '''
+        if key in self.visited:
+            if self.policy == 'lru':
+                self.visited.move_to_end(key)
+            return False
+
+        if self.capacity > 0:
+            if len(self.visited) >= self.capacity:
+                self.visited.popitem(last=False)
+            self.visited[key] = True
+
+        return True
+
+    def forbid(self, variable, value, step):
+        if self.tenure > 0:
+            self.moves[(variable, value)] = step + self.tenure
+
+    def forbidden(self, variable, value, step):
+        return self.tenure > 0 and \
+            self.moves.get((variable, value), -1) > step
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='minconflicts.py',
+        description='min-conflicts local search for map coloring')
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('--tabu-size', type=int, default=DEFAULT_TABU_SIZE,
+                        help='number of visited assignments remembered')
+    parser.add_argument('--tabu-policy', choices=('fifo', 'lru'),
+                        default='fifo',
+                        help='eviction order once --tabu-size is reached')
+    parser.add_argument('--tabu-tenure', type=int, default=0,
+                        help='steps a value stays forbidden for a variable '
+                        'after leaving it (0 disables)')
+    parser.add_argument('--init', choices=INITIALIZERS,
+                        default=DEFAULT_INITIALIZER,
+                        help='starting assignment: random, greedy in '
+                        'degeneracy order or DSatur')
+    parser.add_argument('--engine', choices=ENGINES, default='python',
+                        help='python: incremental min-conflicts with tabu '
+                        'memory, numpy: vectorized CSR engine')
+    parser.add_argument('--stats', action='store_true',
+                        help='write the counters and phase timings of the '
+                        'run to stderr as a JSON line')
+    parser.add_argument('--stats-file', default=None,
+                        help='write them to this file instead (implies '
+                        '--stats)')
+    parser.add_argument('--stats-interval', type=float, default=None,
+                        help='also write a sample line every that many '
+                        'seconds of search')
+    parser.add_argument('--anytime', action='store_true',
+                        help='when no solution is found, write the '
+                        'assignment violating the fewest constraints and '
+                        'their number')
+    parser.add_argument('--checkpoint', default=None,
+                        help='save the search state to this file when the '
+                        'search times out or gets SIGTERM')
+    parser.add_argument('--checkpoint-interval', type=float, default=None,
+                        help='also save it every that many seconds of search')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the search saved in --checkpoint, if '
+                        'there is one')
+    parser.add_argument('--peel', action='store_true',
+                        help='only search the k-core of the graph, k being '
+                        'the number of colors')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse/write a binary graph cache next to the '
+                        'input file')
+    parser.add_argument('--mmap', action='store_true',
+                        help='memory-map the graph cache instead of loading '
+                        'it into Python lists (implies --cache); the python '
+                        'engine still keeps X * D conflict counts and hash '
+                        'keys, the numpy engine does not, but the dsatur '
+                        'start builds a heap of up to X * D entries')
+
+    args = parser.parse_args(argv[1:])
+
+    if args.engine == 'numpy' and np is None:
+        parser.error('--engine numpy requires NumPy')
+    if args.checkpoint is None and \
+            (args.resume or args.checkpoint_interval is not None):
+        parser.error('--resume and --checkpoint-interval need --checkpoint')
+
+    return args
 
 
 def main():
+    args = parse_arguments(sys.argv)
+
+    checkpoint = None
+    if args.checkpoint is not None:
+        checkpoint = CHECKPOINT(args.checkpoint, 'minconflicts-' + args.engine,
+                                args.checkpoint_interval)
+        deadline = DEADLINE(60, terminated())
+    else:
+        deadline = DEADLINE(60)
+
+    stream = None
+    if args.stats_file is not None:
+        stream = open(args.stats_file, 'w')
+    elif args.stats:
+        stream = sys.stderr
+    stats = STATS(stream, args.stats_interval, solver='minconflicts',
+                  engine=args.engine, input=args.input_file)
+
+    if args.engine == 'numpy':
+        engine = NUMPY_MINCONFLICTS()
+    else:
+        engine = MINCONFLICTS(args.tabu_size, args.tabu_tenure,
+                              args.tabu_policy)
+
     try:
-        TIMER(60)
-        start = time.time()
-        csp = CSP(sys.argv)
-        ret = MINCONFLICTS().main_process(csp)
-        end = time.time()
-        csp.create_output(ret)
+        with stats.phase('parse'):
+            graph = load_graph(args.input_file, args.cache, args.mmap)
+        with stats.phase('preprocess'):
+            if args.peel:
+                full = graph
+                core, peeled = k_core(full, full.D)
+                graph = subgraph(full, core)
+            csp = CSP(graph, args.output_file, args.cache, args.mmap,
+                      args.init, tables=args.engine != 'numpy')
+            if args.peel:
+                csp.peeled = (full, core, peeled)
+        csp.deadline = deadline
+        stats.watch(csp)
+    except ValueError:
+        print('Invalid input file')
+        sys.exit(-1)
+
+    if checkpoint is not None:
+        checkpoint.watch(csp)
+        if args.resume:
+            try:
+                checkpoint.load(engine, csp)
+            except ValueError:
+                print('Invalid checkpoint file')
+                sys.exit(-1)
 
+    try:
+        with stats.phase('search'):
+            if has_self_loop(graph):
+                # no assignment satisfies a variable constrained with itself
+                ret = None
+            else:
+                ret = engine.main_process(csp)
+        if ret is None:
+            status = 'unsatisfiable'
+        elif csp.goal_test(ret):
+            status = 'solved'
+        else:
+            status = 'failed'
     except TimeoutError:
-        csp.create_output(None)
+        status = 'timeout'
+    except CANCELLED:
+        status = 'cancelled'
+
+    with stats.phase('output'):
+        if checkpoint is not None:
+            if status in ('solved', 'unsatisfiable'):
+                checkpoint.discard()
+            else:
+                checkpoint.save(engine, csp)
+
+        if status == 'solved':
+            csp.create_output(ret)
+        elif args.anytime and status != 'unsatisfiable':
+            csp.create_output(csp.best, csp.best_conflicts)
+        else:
+            csp.create_output(None)
+
+    stats.emit('done', status=status)
 
 
 if __name__ == '__main__':
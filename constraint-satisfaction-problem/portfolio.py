@@ -0,0 +1,166 @@
+import sys
+import os
+import time
+import random
+import argparse
+import multiprocessing
+import dfsb
+import minconflicts
+from solver import write_output
+from graph import load_graph
+"""Map coloring problem: parallel portfolio of solvers"""
+
+# algorithms a worker can run; workers cycle through the selected ones
+ALGORITHMS = ('minconflicts', 'dfsb', 'numpy')
+
+
+def solve(job):
+    '''
+    run a single solver on the input file with its own seed
+    inputs: job, an (algorithm, input file, seed, cache, mapped) tuple
+    returns (algorithm, seed, assignment or None, finished)
+        finished is true iff the solver ran to completion, so a DFSB worker
+        returning None proves that there is no answer
+    '''
+    algorithm, input_file, seed, cache, mapped = job
+
+    try:
+        return run_solver(algorithm, input_file, seed, cache, mapped)
+    except Exception as error:
+        # a crashing worker must not take the rest of the portfolio down
+        print('%s worker (seed %d) failed: %r' % (algorithm, seed, error),
+              file=sys.stderr)
+        return algorithm, seed, None, False
+
+
+def run_solver(algorithm, input_file, seed, cache=False, mapped=False):
+    random.seed(seed)
+
+    if algorithm == 'dfsb':
+        csp = dfsb.CSP(input_file, None, 1, cache, mapped)
+        ret = dfsb.DFSB().search(csp)
+        return algorithm, seed, ret, True
+
+    csp = minconflicts.CSP(input_file, None, cache, mapped,
+                           tables=algorithm != 'numpy')
+    if algorithm == 'numpy':
+        engine = minconflicts.NUMPY_MINCONFLICTS()
+    else:
+        engine = minconflicts.MINCONFLICTS()
+    ret = engine.main_process(csp)
+
+    if csp.goal_test(ret):
+        return algorithm, seed, ret, True
+
+    return algorithm, seed, None, False
+
+
+class PORTFOLIO:
+    '''
+    launches independent solver workers with different seeds and algorithms
+    on a process pool; the first valid solution wins and the remaining
+    workers are terminated right away
+    '''
+
+    def __init__(self, workers=None, algorithms=ALGORITHMS[:2], seed=None,
+                 cache=False, mapped=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.algorithms = algorithms
+        self.seed = random.randrange(1 << 30) if seed is None else seed
+        self.cache = cache
+        self.mapped = mapped
+        self.winner = None
+
+    def jobs(self, input_file):
+        return [(self.algorithms[idx % len(self.algorithms)], input_file,
+                 self.seed + idx, self.cache, self.mapped)
+                for idx in range(self.workers)]
+
+    def search(self, input_file, timeout=60):
+        '''
+        returns a solution, or None when every worker failed or the timeout
+        expired
+        '''
+        deadline = time.time() + timeout
+        pool = multiprocessing.Pool(self.workers)
+
+        try:
+            results = pool.imap_unordered(solve, self.jobs(input_file))
+            for _ in range(self.workers):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+
+                try:
+                    algorithm, seed, ret, finished = results.next(remaining)
+                except multiprocessing.TimeoutError:
+                    break
+
+                if ret is not None:
+                    self.winner = (algorithm, seed)
+                    return ret
+
+                if finished and algorithm == 'dfsb':
+                    # exhaustive search found no answer, nobody else will
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return None
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='portfolio.py',
+        description='run several map coloring solvers in parallel')
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of solver processes')
+    parser.add_argument('--algorithms', default='minconflicts,dfsb',
+                        help='comma separated list out of %s' %
+                        ', '.join(ALGORITHMS))
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of the first worker, the others use the '
+                        'following ones')
+    parser.add_argument('--timeout', type=int, default=60)
+    parser.add_argument('--cache', action='store_true',
+                        help='parse the input once into a binary graph cache '
+                        'shared by every worker')
+    parser.add_argument('--mmap', action='store_true',
+                        help='have every worker memory-map the shared graph '
+                        'cache (implies --cache)')
+
+    args = parser.parse_args(argv[1:])
+    args.algorithms = tuple(args.algorithms.split(','))
+
+    for algorithm in args.algorithms:
+        if algorithm not in ALGORITHMS:
+            parser.error('unknown algorithm: %s' % algorithm)
+
+    if 'numpy' in args.algorithms and minconflicts.np is None:
+        parser.error('the numpy algorithm requires NumPy')
+
+    return args
+
+
+def main():
+    args = parse_arguments(sys.argv)
+
+    try:
+        graph = load_graph(args.input_file, args.cache, args.mmap)
+    except ValueError:
+        print('Invalid input file')
+        sys.exit(-1)
+
+    portfolio = PORTFOLIO(args.workers, args.algorithms, args.seed,
+                          args.cache, args.mmap)
+    ret = portfolio.search(args.input_file, args.timeout)
+    if ret is not None:
+        ret = [ret[variable] for variable in range(graph.X)]
+    write_output(args.output_file, {'assignment': ret})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import solver
+"""Map coloring problem: local solve server
+
+protocol: one JSON object per line in each direction, over a Unix socket or
+a localhost TCP port
+    {"op": "submit", "problem": {"X": .., "D": .., "edges": [[x, y], ..]}
+                     or {"input": path}, optional "colors", "algorithm",
+                     "timeout", "seed" and "peel"}  -> {"id": job id}
+    {"op": "status", "id": job id}                  -> job status and result
+    {"op": "result", "id": job id}                  -> waits until the job is
+                                                       done, then as status
+    {"op": "cancel", "id": job id}                  -> job status
+    {"op": "jobs"}                                  -> status of every job
+a job is forgotten once a response has delivered its final status, or ttl
+seconds after it finished if none did
+"""
+
+# statuses of a job which will not change anymore
+DONE = ('solved', 'unsatisfiable', 'timeout', 'failed', 'cancelled', 'error')
+
+# seconds a finished job is kept for a client to fetch its result
+DEFAULT_TTL = 3600
+
+# cancellation flags of the worker slots, shared with the pool processes
+FLAGS = None
+
+
+def init_worker(flags):
+    global FLAGS
+    FLAGS = flags
+
+
+def run_job(slot, problem, options):
+    '''
+    runs in a pool process; the search polls FLAGS[slot] so the server can
+    stop it cooperatively
+    '''
+    try:
+        return solver.solve(problem, options.get('colors'),
+                            options.get('algorithm', 'dfsb1'),
+                            options.get('timeout', 60), options.get('seed'),
+                            lambda: FLAGS[slot] != 0,
+                            options.get('peel', False))
+    except Exception as error:
+        return {'status': 'error', 'error': repr(error)}
+
+
+class JOB:
+    '''
+    a submitted problem and what became of it
+    '''
+
+    def __init__(self, job_id, problem, options):
+        self.id = job_id
+        self.problem = problem
+        self.options = options
+        self.status = 'queued'
+        self.result = None
+        self.slot = None
+        self.submitted = time.time()
+        self.finished = None
+        self.done = asyncio.Event()
+
+    def finish(self, status, result=None):
+        self.status = status
+        self.result = result
+        self.slot = None
+        self.finished = time.time()
+        self.done.set()
+
+    def report(self):
+        ret = {'id': self.id, 'status': self.status}
+        if self.result is not None:
+            ret.update(self.result)
+            ret['status'] = self.status
+
+        return ret
+
+
+class SERVER:
+    '''
+    queues submitted jobs and dispatches them to a process pool; each of the
+    workers dispatcher coroutines owns one slot of the shared cancellation
+    flags, so at most workers jobs run at once and a running job is
+    cancelled by raising the flag of its slot
+    '''
+
+    def __init__(self, workers=None, ttl=DEFAULT_TTL):
+        self.workers = workers or os.cpu_count() or 1
+        self.ttl = ttl
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.queue = None
+        self.flags = multiprocessing.Array('b', self.workers, lock=False)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                        initargs=(self.flags,))
+
+    async def dispatcher(self, slot):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            job = await self.queue.get()
+            if job.status != 'queued':
+                continue
+
+            self.flags[slot] = 0
+            job.status = 'running'
+            job.slot = slot
+            try:
+                result = await loop.run_in_executor(self.pool, run_job, slot,
+                                                    job.problem, job.options)
+            except Exception as error:
+                result = {'status': 'error', 'error': repr(error)}
+            job.finish(result.pop('status'), result)
+
+    def submit(self, problem, options):
+        job = JOB(next(self.ids), problem, options)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+
+        return job
+
+    def prune(self):
+        '''
+        forget the jobs which finished more than ttl seconds ago
+        '''
+        expired = time.time() - self.ttl
+        for job_id in [job.id for job in self.jobs.values()
+                       if job.finished is not None and
+                       job.finished <= expired]:
+            del self.jobs[job_id]
+
+    def cancel(self, job):
+        if job.status == 'queued':
+            job.finish('cancelled')
+        elif job.status == 'running':
+            self.flags[job.slot] = 1
+
+    async def handle_request(self, request):
+        if not isinstance(request, dict):
+            return {'error': 'invalid request: not an object'}
+        op = request.get('op')
+        self.prune()
+
+        if op == 'submit':
+            if 'problem' not in request:
+                return {'error': 'submit needs a problem'}
+            options = {
+                key: request[key]
+                for key in ('colors', 'algorithm', 'timeout', 'seed', 'peel')
+                if key in request
+            }
+            problem = request['problem']
+            if isinstance(problem, dict) and 'input' in problem:
+                problem = problem['input']
+            return {'id': self.submit(problem, options).id}
+
+        if op == 'jobs':
+            return {
+                'jobs': [{'id': job.id, 'status': job.status}
+                         for job in self.jobs.values()]
+            }
+
+        if op not in ('status', 'result', 'cancel'):
+            return {'error': 'unknown op: %r' % (op,)}
+
+        job_id = request.get('id')
+        if not isinstance(job_id, int) or isinstance(job_id, bool):
+            return {'error': 'invalid request: id must be an integer'}
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {'error': 'unknown job: %r' % job_id}
+
+        if op == 'cancel':
+            self.cancel(job)
+        elif op == 'result':
+            await job.done.wait()
+
+        if job.status in DONE:
+            # the result is delivered, keep no reference to it
+            self.jobs.pop(job.id, None)
+
+        return job.report()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    response = await self.handle_request(json.loads(line))
+                except ValueError as error:
+                    response = {'error': 'invalid request: %s' % error}
+
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path=None, port=None):
+        '''
+        serve on the Unix socket at path, or on localhost:port
+        '''
+        self.queue = asyncio.Queue()
+        dispatchers = [
+            asyncio.ensure_future(self.dispatcher(slot))
+            for slot in range(self.workers)
+        ]
+
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path)
+        else:
+            server = await asyncio.start_server(self.handle_client,
+                                                '127.0.0.1', port)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for dispatcher in dispatchers:
+                dispatcher.cancel()
+            for slot in range(self.workers):
+                self.flags[slot] = 1
+            self.pool.shutdown(wait=True)
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='server.py', description='local map coloring solve server')
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--socket', help='path of the Unix socket to serve on')
+    where.add_argument('--port', type=int, help='localhost TCP port')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of jobs solved at the same time')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                        help='seconds a finished job is kept when nobody '
+                        'fetches its result')
+
+    return parser.parse_args(argv[1:])
+
+
+def main():
+    args = parse_arguments(sys.argv)
+
+    try:
+        asyncio.run(SERVER(args.workers, args.ttl).serve(args.socket, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import dfsb
+import minconflicts
+from deadline import CANCELLED, DEADLINE
+from graph import GRAPH, build_graph, color_peeled, has_self_loop, \
+    k_core, load_graph, subgraph
+"""Map coloring problem: library API and batch solving"""
+
+# dfsb0/dfsb1/dfsb2: DFSB mode 0/1/2, minconflicts/numpy: MINCONFLICTS engines
+ALGORITHMS = ('dfsb0', 'dfsb1', 'dfsb2', 'minconflicts', 'numpy')
+
+
+def is_integer(value):
+    '''
+    returns true iff value is an int; bool is one too, but never a count or
+    a variable
+    '''
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def as_graph(problem, colors=None):
+    '''
+    returns the GRAPH of problem, which is one of
+        a GRAPH
+        the path of an input file
+        a dict {'X': variables, 'D': values, 'edges': [[x, y], ...]}
+    colors overrides the number of values of the problem
+    raises ValueError on a malformed problem: X missing or negative, edges
+    missing or not a list of pairs of variables in range
+    '''
+    if isinstance(problem, GRAPH):
+        graph = problem
+    elif isinstance(problem, str):
+        graph = load_graph(problem)
+    else:
+        try:
+            X = problem['X']
+            D = problem.get('D', colors)
+            edges = problem['edges']
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError('a problem needs X and edges')
+
+        if not is_integer(X) or X < 0:
+            raise ValueError('X must be a non-negative integer: %r' % (X,))
+        if D is not None and not is_integer(D):
+            raise ValueError('D must be an integer: %r' % (D,))
+        if not isinstance(edges, (list, tuple)):
+            raise ValueError('edges must be a list of [x, y] pairs')
+        for edge in edges:
+            if not isinstance(edge, (list, tuple)) or len(edge) != 2 or \
+                    not all(is_integer(variable) for variable in edge):
+                raise ValueError('an edge must be a pair of integers: %r' %
+                                 (edge,))
+
+        graph = build_graph(X, D, edges)
+
+    if colors is not None and colors != graph.D:
+        graph = graph.with_values(colors)
+    if graph.D is None or graph.D < 1:
+        raise ValueError('a problem needs at least one color')
+
+    return graph
+
+
+def solve(problem, colors=None, algorithm='dfsb1', timeout=60, seed=None,
+          cancelled=None, peel=False):
+    '''
+    solve a single map coloring problem in this process
+    inputs: problem, see as_graph
+            colors: number of colors, defaults to D of the problem
+            algorithm: one of ALGORITHMS
+            timeout: seconds allowed for the search, None for no limit;
+                     checked cooperatively, no signal is used
+            seed: seed of the random module used by the solver
+            cancelled: callable polled with the deadline, the search stops
+                       once it returns true
+            peel: only search the D-core of the graph (see graph.k_core),
+                  the peeled variables are colored greedily afterwards
+    returns: {
+              'status': 'solved', 'unsatisfiable' (exhaustive search found no
+                        answer), 'timeout', 'cancelled' or 'failed' (local
+                        search gave up)
+              'assignment': value of every variable, or None
+              'nodes': csp.counter of the solver
+              'prunes': csp.prune_counter of DFSB modes 1 and 2, else 0
+              'time': seconds spent, parsing included
+              'core': variables left to search, only with peel
+              }
+    raises ValueError on a malformed problem or an unknown algorithm
+    '''
+    if algorithm not in ALGORITHMS:
+        raise ValueError('unknown algorithm: %s' % algorithm)
+    if algorithm == 'numpy' and minconflicts.np is None:
+        raise ValueError('the numpy algorithm requires NumPy')
+
+    start = time.monotonic()
+    deadline = DEADLINE(timeout, cancelled)
+    graph = as_graph(problem, colors)
+
+    if peel:
+        full = graph
+        core, peeled = k_core(full, full.D)
+        graph = subgraph(full, core)
+
+    if seed is not None:
+        random.seed(seed)
+
+    csp = None
+    ret = None
+
+    try:
+        if graph.X == 0:
+            ret = {}
+            status = 'solved'
+        elif has_self_loop(graph):
+            # mode 0 does not check a variable against itself
+            status = 'unsatisfiable'
+        elif algorithm in ('dfsb0', 'dfsb1', 'dfsb2'):
+            csp = dfsb.CSP(graph, None, int(algorithm[-1]))
+            csp.deadline = deadline
+            ret = dfsb.DFSB().search(csp)
+            if ret is None:
+                status = 'unsatisfiable'
+            elif csp.goal_test(ret):
+                status = 'solved'
+            else:
+                ret = None
+                status = 'failed'
+        else:
+            csp = minconflicts.CSP(graph, None,
+                                   tables=algorithm != 'numpy')
+            csp.deadline = deadline
+            if algorithm == 'numpy':
+                engine = minconflicts.NUMPY_MINCONFLICTS()
+            else:
+                engine = minconflicts.MINCONFLICTS()
+            ret = engine.main_process(csp)
+            if not csp.goal_test(ret):
+                ret = None
+            status = 'solved' if ret is not None else 'failed'
+    except TimeoutError:
+        status = 'timeout'
+        ret = None
+    except CANCELLED:
+        status = 'cancelled'
+        ret = None
+
+    assignment = None
+    if ret is not None:
+        assignment = [ret[variable] for variable in range(graph.X)]
+        if peel:
+            assignment = color_peeled(full, core, assignment, peeled)
+
+    result = {
+        'status': status,
+        'assignment': assignment,
+        'nodes': 0 if csp is None else csp.counter,
+        'prunes': getattr(csp, 'prune_counter', 0),
+        'time': time.monotonic() - start
+    }
+    if peel:
+        result['core'] = graph.X
+
+    return result
+
+
+def write_output(output, result):
+    '''
+    write a solve() result in the output format of dfsb.py/minconflicts.py
+    '''
+    fp = open(output, 'w')
+
+    if result['assignment'] is not None:
+        [fp.write(str(value) + '\n') for value in result['assignment']]
+    else:
+        fp.write("No answer")
+
+    fp.close()
+
+
+def read_jobs(args, stream):
+    '''
+    yields (job id, problem, options) for every input file of args, then
+    for every JSON line of stream when --jsonl is given; a line holds either
+    {"input": path} or {"X": .., "D": .., "edges": [[x, y], ..]}, plus
+    optional "id", "colors", "algorithm", "timeout", "seed" and "peel"
+    '''
+    for input_file in args.input_files:
+        yield input_file, input_file, {}
+
+    if not args.jsonl:
+        return
+
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+
+        try:
+            job = json.loads(line)
+        except ValueError as error:
+            yield number, None, {'error': 'invalid JSON: %s' % error}
+            continue
+        if not isinstance(job, dict):
+            yield number, None, {'error': 'invalid job: not an object'}
+            continue
+
+        problem = job.get('input', job)
+        options = {
+            key: job[key]
+            for key in ('colors', 'algorithm', 'timeout', 'seed', 'peel')
+            if key in job
+        }
+        yield job.get('id', number), problem, options
+
+
+def batch(args, stream=sys.stdin, out=sys.stdout):
+    '''
+    solve every job one after the other in this process and write one JSON
+    line per result as soon as it is known
+    '''
+    for job_id, problem, options in read_jobs(args, stream):
+        record = {'id': job_id}
+
+        if 'error' in options:
+            record.update(status='error', error=options['error'])
+        else:
+            try:
+                result = solve(problem,
+                               options.get('colors', args.colors),
+                               options.get('algorithm', args.algorithm),
+                               options.get('timeout', args.timeout),
+                               options.get('seed', args.seed),
+                               peel=options.get('peel', args.peel))
+            except Exception as error:
+                # one bad job must not take the long-lived process down
+                record.update(status='error', error=repr(error))
+            else:
+                record.update(result)
+                if args.output_dir is not None and isinstance(problem, str):
+                    write_output(
+                        os.path.join(args.output_dir,
+                                     os.path.basename(problem) + '.out'),
+                        result)
+
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='solver.py',
+        description='solve many map coloring problems in one process')
+    parser.add_argument('input_files', nargs='*',
+                        help='input files in the dfsb.py/minconflicts.py '
+                        'format')
+    parser.add_argument('--jsonl', action='store_true',
+                        help='also read one JSON problem per line of stdin')
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='dfsb1')
+    parser.add_argument('--colors', type=int, default=None,
+                        help='override the number of colors of every problem')
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='seconds per problem')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--peel', action='store_true',
+                        help='only search the k-core of every problem, k '
+                        'being the number of colors')
+    parser.add_argument('--output-dir', default=None,
+                        help='also write <input>.out for every input file')
+
+    args = parser.parse_args(argv[1:])
+
+    if not args.input_files and not args.jsonl:
+        parser.error('give input files and/or --jsonl')
+
+    return args
+
+
+def main():
+    batch(parse_arguments(sys.argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import json
+import time
+from contextlib import contextmanager
+"""Solver statistics for the map coloring problem, written as JSON lines"""
+
+
+class STATS:
+    '''
+    collects the timing of the phases of a run and the counters of the csp
+    it watches, and writes them as one JSON object per line
+        counters: csp.COUNTERS lists (name, attribute) pairs of the csp
+                  class; the solvers bump these attributes anyway, so
+                  nothing is collected while no STATS watches the csp
+        samples: with an interval, the search loops call tick() where they
+                 poll their deadline and a 'sample' line is written every
+                 interval seconds
+    '''
+
+    def __init__(self, stream=None, interval=None, **fields):
+        '''
+        stream: where the lines go, None writes nothing
+        interval: seconds between samples, None for no samples
+        fields: written in every line, e.g. solver and input file
+        '''
+        self.stream = stream
+        self.interval = interval
+        self.fields = fields
+        self.start = time.monotonic()
+        self.next = None if interval is None else self.start + interval
+        self.phases = {}
+        self.csp = None
+
+    def watch(self, csp):
+        '''
+        report the counters of csp, and sample its search if an interval
+        was given
+        '''
+        self.csp = csp
+        if self.stream is not None and self.interval is not None:
+            csp.stats = self
+
+    @contextmanager
+    def phase(self, name):
+        '''
+        time the enclosed block as phase name, e.g. parse, preprocess,
+        search or output
+        '''
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + \
+                time.monotonic() - start
+
+    def tick(self):
+        now = time.monotonic()
+        if now >= self.next:
+            self.next = now + self.interval
+            self.emit('sample')
+
+    def counters(self):
+        if self.csp is None:
+            return {}
+
+        return dict((name, getattr(self.csp, attribute))
+                    for (name, attribute) in self.csp.COUNTERS)
+
+    def emit(self, event, **fields):
+        '''
+        write a line for event, 'sample' or 'done'
+        '''
+        if self.stream is None:
+            return
+
+        record = {'event': event}
+        record.update(self.fields)
+        record['elapsed'] = time.monotonic() - self.start
+        record.update(self.counters())
+        record['phases'] = dict(self.phases)
+        record.update(fields)
+
+        self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
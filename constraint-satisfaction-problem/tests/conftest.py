@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+"""Shared helpers of the map coloring tests"""
+
+# the solvers import each other as top level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from graph import build_graph  # noqa: E402
+
+
+def coloring_is_valid(graph, assignment):
+    '''
+    returns true iff assignment gives every variable of graph a value of its
+    domain, different from the values of its neighbours, as double_check.py
+    checks an output file
+    '''
+    if assignment is None or len(assignment) != graph.X:
+        return False
+
+    return all(
+        0 <= assignment[variable] < graph.D and
+        all(assignment[variable] != assignment[neighbour]
+            for neighbour in graph.neighbours(variable))
+        for variable in range(graph.X))
+
+
+@pytest.fixture
+def valid():
+    return coloring_is_valid
+
+
+@pytest.fixture
+def make_graph():
+    '''
+    build_graph over a list of edges
+    '''
+    return lambda X, D, edges: build_graph(X, D, edges)
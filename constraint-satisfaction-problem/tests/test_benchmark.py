@@ -0,0 +1,48 @@
+import pytest
+import benchmark
+"""Tests of the benchmark harness"""
+
+
+@pytest.mark.parametrize('share,expected', (
+    (0, 1), (0.5, 5.5), (0.99, 9.91), (1, 10)))
+def test_percentile_interpolates_between_ranks(share, expected):
+    values = list(range(1, 11))
+
+    assert benchmark.percentile(values, share) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('share', (0, 0.5, 0.99, 1))
+def test_percentile_of_a_single_sample(share):
+    assert benchmark.percentile([3.5], share) == 3.5
+
+
+def test_percentile_of_two_samples_reaches_the_tail():
+    assert benchmark.percentile([1, 101], 0.99) == pytest.approx(100)
+    assert benchmark.percentile([1, 101], 0.5) == pytest.approx(51)
+
+
+def test_summarize_aggregates_every_algorithm():
+    results = [
+        {'algorithm': 'dfsb1', 'status': 'solved', 'time': 3, 'nodes': 10,
+         'prunes': 4, 'rss_kb': 100},
+        {'algorithm': 'dfsb1', 'status': 'unsatisfiable', 'time': 1,
+         'nodes': 5, 'prunes': 1, 'rss_kb': 300},
+        {'algorithm': 'dfsb1', 'status': 'timeout', 'time': 2},
+        {'algorithm': 'minconflicts', 'status': 'failed', 'time': 0.5},
+    ]
+
+    summary = benchmark.summarize(results)
+
+    assert sorted(summary) == ['dfsb1', 'minconflicts']
+    dfsb1 = summary['dfsb1']
+    assert dfsb1['runs'] == 3
+    assert dfsb1['decided'] == 2
+    assert dfsb1['success_rate'] == pytest.approx(2 / 3)
+    assert dfsb1['median_time'] == 2
+    assert dfsb1['p90_time'] == pytest.approx(2.8)
+    assert dfsb1['p99_time'] == pytest.approx(2.98)
+    assert dfsb1['total_time'] == 6
+    assert (dfsb1['nodes'], dfsb1['prunes'], dfsb1['max_rss_kb']) == \
+        (15, 5, 300)
+    assert summary['minconflicts']['decided'] == 0
+    assert summary['minconflicts']['p99_time'] == 0.5
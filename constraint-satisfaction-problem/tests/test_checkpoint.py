@@ -0,0 +1,91 @@
+import random
+import pytest
+import dfsb
+import generate
+import minconflicts
+from checkpoint import CHECKPOINT
+"""Tests of saving and resuming searches"""
+
+
+@pytest.mark.parametrize('mode', (0, 1, 2))
+@pytest.mark.parametrize('planted', (False, True))
+@pytest.mark.parametrize('seed', range(3))
+def test_dfsb_resumes_from_a_fresh_process(tmp_path, make_graph, valid, mode,
+                                           planted, seed):
+    graph = make_graph(40, 3, generate.threshold(40, 3, seed, planted))
+    random.seed(seed)
+    csp = dfsb.CSP(graph, None, mode)
+    expected = dfsb.DFSB().search(csp)
+    nodes = csp.counter
+
+    checkpoint = CHECKPOINT(str(tmp_path / 'search.ck'), 'dfsb%d' % mode)
+    random.seed(seed)
+    csp = dfsb.CSP(graph, None, mode)
+    engine = dfsb.DFSB()
+    saves = 0
+    while True:
+        ret = engine.search(csp, max_nodes=2)
+        if ret is not dfsb.PAUSED:
+            break
+        checkpoint.save(engine, csp)
+        saves += 1
+        # everything but the file is lost, the random state included
+        random.seed(seed + 1000)
+        csp = dfsb.CSP(graph, None, mode)
+        engine = dfsb.DFSB()
+        assert checkpoint.load(engine, csp)
+
+    assert saves > 0
+    assert (ret is None) == (expected is None)
+    assert ret is None or valid(graph, ret)
+    if mode == 0:
+        assert ret == expected
+        assert csp.counter == nodes
+
+
+def test_minconflicts_resumes_its_assignments(tmp_path, make_graph):
+    # unsatisfiable, so the search is still going when it is saved
+    graph = make_graph(200, 3, generate.threshold(200, 3, 1))
+    checkpoint = CHECKPOINT(str(tmp_path / 'search.ck'), 'minconflicts')
+    random.seed(1)
+    csp = minconflicts.CSP(graph, None, initializer='random')
+    engine = minconflicts.MINCONFLICTS()
+    engine.main_process(csp, 300)
+    assert csp.conflicted
+    checkpoint.save(engine, csp)
+
+    resumed = minconflicts.CSP(graph, None, initializer='random')
+    assert checkpoint.load(minconflicts.MINCONFLICTS(), resumed)
+
+    assert resumed.assign == csp.assign
+    assert resumed.best == csp.best
+    assert resumed.best_conflicts == csp.best_conflicts
+    assert resumed.counter == csp.counter
+    assert sorted(resumed.conflicted) == sorted(csp.conflicted)
+
+
+def test_load_rejects_foreign_checkpoints(tmp_path, make_graph):
+    path = str(tmp_path / 'search.ck')
+    graph = make_graph(10, 3, generate.threshold(10, 3, 0))
+    other = make_graph(10, 3, generate.threshold(10, 3, 1))
+    csp = dfsb.CSP(graph, None, 1)
+    engine = dfsb.DFSB()
+    engine.search(csp, max_nodes=1)
+
+    assert not CHECKPOINT(path, 'dfsb1').load(dfsb.DFSB(), csp)
+    CHECKPOINT(path, 'dfsb1').save(engine, csp)
+
+    with pytest.raises(ValueError):
+        CHECKPOINT(path, 'dfsb2').load(dfsb.DFSB(),
+                                       dfsb.CSP(graph, None, 2))
+    with pytest.raises(ValueError):
+        CHECKPOINT(path, 'dfsb1').load(dfsb.DFSB(),
+                                       dfsb.CSP(other, None, 1))
+
+    with open(path, 'wb') as fp:
+        fp.write(b'not a checkpoint')
+    with pytest.raises(ValueError):
+        CHECKPOINT(path, 'dfsb1').load(dfsb.DFSB(), csp)
+
+    CHECKPOINT(path, 'dfsb1').discard()
+    assert not (tmp_path / 'search.ck').exists()
@@ -0,0 +1,103 @@
+import itertools
+import pytest
+import chromatic
+import generate
+import minconflicts
+"""Tests of the chromatic number mode"""
+
+
+def cycle(X):
+    return [(variable, (variable + 1) % X) for variable in range(X)]
+
+
+def grid(rows, columns):
+    return [(row * columns + column, row * columns + column + 1)
+            for row in range(rows) for column in range(columns - 1)] + \
+        [(row * columns + column, (row + 1) * columns + column)
+         for row in range(rows - 1) for column in range(columns)]
+
+
+def petersen():
+    return cycle(5) + [(5 + idx, 5 + (idx + 2) % 5) for idx in range(5)] + \
+        [(idx, idx + 5) for idx in range(5)]
+
+
+# (name, X, edges, chromatic number)
+GRAPHS = (
+    ('odd cycle', 7, cycle(7), 3),
+    ('even cycle', 8, cycle(8), 2),
+    ('grid', 20, grid(4, 5), 2),
+    ('K4', 4, list(itertools.combinations(range(4), 2)), 4),
+    ('K4 and a path', 8,
+     list(itertools.combinations(range(4), 2)) + cycle(8)[3:7], 4),
+    ('petersen', 10, petersen(), 3),
+    ('wheel', 8, cycle(7) + [(7, idx) for idx in range(7)], 4),
+    ('isolated', 3, [], 1),
+)
+
+
+@pytest.mark.parametrize('name,X,edges,colors', GRAPHS)
+def test_greedy_clique_is_a_clique(make_graph, name, X, edges, colors):
+    graph = make_graph(X, 1, edges)
+
+    clique = chromatic.greedy_clique(graph)
+
+    assert 1 <= len(clique) <= colors
+    assert len(set(clique)) == len(clique)
+    for x, y in itertools.combinations(clique, 2):
+        assert y in graph.neighbours(x)
+
+
+@pytest.mark.parametrize('name,X,edges,colors', GRAPHS)
+def test_lower_bound_never_exceeds_the_chromatic_number(make_graph, name, X,
+                                                        edges, colors):
+    bound = chromatic.lower_bound(make_graph(X, 1, edges))
+
+    assert bound <= colors
+    if name in ('odd cycle', 'even cycle', 'grid', 'K4', 'petersen'):
+        # a clique, or an odd cycle on a triangle-free map, meets it
+        assert bound == colors
+
+
+@pytest.mark.parametrize('name,X,edges,colors', GRAPHS)
+def test_solve_finds_the_chromatic_number(make_graph, valid, name, X, edges,
+                                          colors):
+    graph = make_graph(X, 1, edges)
+
+    ret = chromatic.solve(graph, timeout=None, seed=0)
+
+    assert ret['status'] == 'optimal'
+    assert ret['colors'] == colors
+    assert ret['lower_bound'] == colors
+    assert valid(make_graph(X, colors, edges), ret['assignment'])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_solve_colors_planar_maps_with_at_most_four_colors(make_graph, valid,
+                                                          seed):
+    edges = generate.delaunay(60, 4, seed)
+
+    ret = chromatic.solve(make_graph(60, 4, edges), timeout=None, seed=seed)
+
+    assert ret['status'] == 'optimal'
+    assert ret['colors'] <= 4
+    assert valid(make_graph(60, ret['colors'], edges), ret['assignment'])
+
+
+def test_solve_rejects_self_loops():
+    ret = chromatic.solve({'X': 2, 'edges': [(0, 1), (1, 1)]}, timeout=None)
+
+    assert ret['status'] == 'unsatisfiable'
+    assert ret['assignment'] is None
+
+
+def test_minconflicts_starts_from_the_given_assignment(make_graph):
+    graph = make_graph(8, 2, cycle(8))
+    start = dict((variable, 0) for variable in range(8))
+
+    csp = minconflicts.CSP(graph, None, assignment=start)
+
+    assert csp.assign == start
+    assert csp.assign is not start
+    assert sorted(csp.conflicted) == list(range(8))
+    assert csp.best_conflicts == 8
@@ -0,0 +1,59 @@
+import pytest
+import decompose
+import generate
+import solver
+"""Tests of the decomposition into connected and biconnected pieces"""
+
+
+def test_blocks_split_at_articulation_points(make_graph):
+    # triangles 0-1-2 and 2-3-4 share 2, the bridge 4-5 hangs off 4 and 6 is
+    # isolated
+    graph = make_graph(7, 3, [(0, 1), (1, 2), (0, 2), (2, 3), (3, 4), (2, 4),
+                              (4, 5)])
+
+    assert sorted(sorted(block) for block in decompose.blocks(graph)) == \
+        [[0, 1, 2], [2, 3, 4], [4, 5], [6]]
+    assert sorted(sorted(component) for component in
+                  decompose.components(graph)) == [[0, 1, 2, 3, 4, 5], [6]]
+
+
+def test_blocks_ignore_self_loops(make_graph):
+    graph = make_graph(3, 3, [(0, 0), (0, 1), (1, 2)])
+
+    assert sorted(sorted(block) for block in decompose.blocks(graph)) == \
+        [[0, 1], [1, 2]]
+
+
+def test_stitch_recolors_blocks_at_articulation_points(make_graph, valid):
+    graph = make_graph(6, 3, [(0, 1), (1, 2), (0, 2), (2, 3), (3, 4), (2, 4),
+                              (4, 5)])
+    pieces = [[0, 1, 2], [2, 3, 4], [4, 5]]
+    # every piece colored on its own, disagreeing on 2 and on 4
+    colorings = [[0, 1, 2], [0, 1, 2], [0, 1]]
+
+    assignment = decompose.stitch(graph.X, pieces, colorings)
+
+    assert valid(graph, assignment)
+    assert assignment[:3] == [0, 1, 2]
+
+
+@pytest.mark.parametrize('biconnected', (False, True))
+@pytest.mark.parametrize('seed', range(6))
+def test_solve_agrees_with_plain_search(make_graph, valid, biconnected,
+                                        seed):
+    # a sparse planar map has many articulation points
+    graph = make_graph(60, 3, generate.delaunay(60, 3, seed, 0.6))
+    expected = solver.solve(graph, None, 'dfsb0', None, seed)
+    ret = decompose.solve(graph, None, 'dfsb1', None, seed,
+                          biconnected=biconnected)
+
+    assert ret['pieces'] > 1 or not biconnected
+    assert ret['status'] == expected['status']
+    if ret['status'] == 'solved':
+        assert valid(graph, ret['assignment'])
+
+
+def test_solve_rejects_self_loops(make_graph):
+    graph = make_graph(3, 3, [(0, 1), (2, 2)])
+
+    assert decompose.solve(graph)['status'] == 'unsatisfiable'
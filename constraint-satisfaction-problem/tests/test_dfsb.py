@@ -0,0 +1,177 @@
+import sys
+import random
+import pytest
+import dfsb
+import generate
+"""Tests of the DFSB solver"""
+
+
+def search(graph, mode, seed, **options):
+    random.seed(seed)
+    csp = dfsb.CSP(graph, None, mode, **options)
+
+    return csp, dfsb.DFSB().search(csp)
+
+
+@pytest.mark.parametrize('mode', (0, 1, 2))
+@pytest.mark.parametrize('planted', (False, True))
+@pytest.mark.parametrize('seed', range(3))
+def test_pause_resume_matches_uninterrupted_search(make_graph, valid, mode,
+                                                   planted, seed):
+    graph = make_graph(30, 3, generate.threshold(30, 3, seed, planted))
+    csp, expected = search(graph, mode, seed)
+    nodes = csp.counter
+
+    random.seed(seed)
+    csp = dfsb.CSP(graph, None, mode)
+    engine = dfsb.DFSB()
+    pauses = 0
+    while True:
+        ret = engine.search(csp, max_nodes=5)
+        if ret is not dfsb.PAUSED:
+            break
+        pauses += 1
+
+    assert pauses > 0
+    assert (ret is None) == (expected is None)
+    assert ret is None or valid(graph, ret)
+    if mode == 0:
+        # no random tie-breaks, the search is the same node for node
+        assert ret == expected
+        assert csp.counter == nodes
+
+
+def instances():
+    '''
+    small seeded instances around the 3-coloring threshold, satisfiable or
+    not, plus planar maps which 3 colors often cannot color
+    '''
+    for seed in range(6):
+        yield 'threshold', generate.threshold(40, 3, seed), 40, 3
+        yield 'planted', generate.threshold(40, 3, seed, True), 40, 3
+        yield 'er', generate.erdos_renyi(40, 3, 4.3, seed), 40, 3
+        yield 'delaunay', generate.delaunay(25, 3, seed, 0.8), 25, 3
+
+
+@pytest.mark.parametrize('kind,edges,X,D', list(instances()))
+@pytest.mark.parametrize('options', (
+    {}, {'inference': 'fc'}, {'inference': 'ac3rm'}, {'nogoods': 2},
+    {'symmetry': True}))
+def test_backjumping_agrees_with_plain_search(make_graph, valid, kind, edges,
+                                              X, D, options):
+    graph = make_graph(X, D, edges)
+    _, expected = search(graph, 0, 0)
+    _, mac = search(graph, 1, 0)
+    csp, ret = search(graph, 2, 0, **options)
+
+    assert (mac is None) == (expected is None)
+    assert (ret is None) == (expected is None)
+    assert ret is None or valid(graph, ret)
+    assert len(csp.nogoods) <= csp.nogoods.capacity
+
+
+@pytest.mark.parametrize('kind,edges,X,D', list(instances()))
+@pytest.mark.parametrize('inference', dfsb.INFERENCES)
+@pytest.mark.parametrize('mode', (1, 2))
+def test_inference_agrees_with_plain_search(make_graph, valid, kind, edges,
+                                            X, D, inference, mode):
+    graph = make_graph(X, D, edges)
+    _, expected = search(graph, 0, 0)
+    _, ret = search(graph, mode, 0, inference=inference)
+
+    assert (ret is None) == (expected is None)
+    assert ret is None or valid(graph, ret)
+
+
+def symmetric_instances():
+    '''
+    instances(), plus small maps whose answer hinges on the colors of the
+    first few variables
+    '''
+    def wheel(n):
+        return [(x, (x + 1) % n) for x in range(n)] + \
+            [(n, x) for x in range(n)]
+
+    yield 'K4', [(x, y) for x in range(4) for y in range(x)], 4, 3
+    yield 'odd wheel', wheel(5), 6, 3
+    yield 'even wheel', wheel(6), 7, 3
+    yield 'K4 with 4 colors', [(x, y) for x in range(4) for y in range(x)], \
+        4, 4
+    for instance in instances():
+        yield instance
+
+
+@pytest.mark.parametrize('kind,edges,X,D', list(symmetric_instances()))
+@pytest.mark.parametrize('inference', dfsb.INFERENCES)
+@pytest.mark.parametrize('mode', (1, 2))
+def test_symmetry_breaking_agrees_with_plain_search(make_graph, valid, kind,
+                                                    edges, X, D, inference,
+                                                    mode):
+    graph = make_graph(X, D, edges)
+    _, expected = search(graph, 0, 0)
+    plain, _ = search(graph, mode, 0, inference=inference)
+    csp, ret = search(graph, mode, 0, inference=inference, symmetry=True)
+
+    assert (ret is None) == (expected is None)
+    assert ret is None or valid(graph, ret)
+    if ret is None:
+        # the cut only removes subtrees equivalent to searched ones
+        assert csp.counter <= plain.counter
+
+
+@pytest.mark.parametrize('retain', (False, True))
+def test_backjumping_with_restarts(make_graph, valid, retain):
+    for seed in range(6):
+        graph = make_graph(40, 3, generate.threshold(40, 3, seed))
+        _, expected = search(graph, 0, seed)
+
+        random.seed(seed)
+        csp = dfsb.CSP(graph, None, 2)
+        ret = dfsb.DFSB().search_restarting(csp, dfsb.RESTARTS('luby', 4),
+                                            retain)
+
+        assert (ret is None) == (expected is None)
+        assert ret is None or valid(graph, ret)
+
+
+def test_nogoods_are_bounded_and_matched():
+    nogoods = dfsb.NOGOODS(capacity=2, max_size=2)
+    nogoods.learn(frozenset([(0, 1), (1, 1)]))
+    nogoods.learn(frozenset([(0, 1), (1, 1), (2, 0)]))
+    assert len(nogoods) == 1
+
+    assert nogoods.violated({0: 1}, 1, 1) == frozenset([(0, 1), (1, 1)])
+    assert nogoods.violated({0: 2}, 1, 1) is None
+
+    nogoods.learn(frozenset([(2, 0)]))
+    nogoods.learn(frozenset([(3, 0)]))
+    assert len(nogoods) == 2
+    assert nogoods.violated({}, 3, 0) is not None
+
+
+def test_restarts_need_a_randomized_mode():
+    argv = ['dfsb.py', 'in.txt', 'out.txt']
+    with pytest.raises(SystemExit):
+        dfsb.parse_arguments(argv + ['0', '--restarts', 'luby'])
+
+    for mode in ('1', '2'):
+        args = dfsb.parse_arguments(argv + [mode, '--restarts', 'luby'])
+        assert args.restarts == 'luby'
+
+
+@pytest.mark.parametrize('mode', ('1', '2'))
+def test_peel_writes_a_coloring_of_the_whole_map(tmp_path, monkeypatch,
+                                                 make_graph, valid, mode):
+    # 10 variables are peeled off, the other 50 searched
+    edges = generate.delaunay(60, 4, 0)
+    input_file = str(tmp_path / 'map.txt')
+    output_file = str(tmp_path / 'map.out')
+    generate.write_problem(input_file, 60, 4, edges)
+    monkeypatch.setattr(sys, 'argv', ['dfsb.py', input_file, output_file,
+                                      mode, '--peel'])
+
+    dfsb.main()
+
+    with open(output_file) as fp:
+        assignment = [int(line) for line in fp]
+    assert valid(make_graph(60, 4, edges), assignment)
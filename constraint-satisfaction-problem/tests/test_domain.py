@@ -0,0 +1,53 @@
+from domain import DOMAIN
+"""Tests of the bitset domains and their trail"""
+
+
+def test_remove_and_reduce():
+    domain = DOMAIN(3, 4)
+
+    assert domain.remove(0, 2)
+    assert not domain.remove(0, 2)
+    assert domain.values(0) == [0, 1, 3]
+    assert domain.removed(0) == [2]
+    assert domain.size(0) == 3
+    assert not domain.contains(0, 2)
+
+    domain.reduce(1, 3)
+    assert domain.values(1) == [3]
+    assert domain.singleton(1) == 3
+    assert domain.singleton(2) is None
+
+
+def test_undo_restores_every_removal_since_mark():
+    domain = DOMAIN(3, 4)
+    domain.remove(0, 1)
+    bits = list(domain.bits)
+    sizes = list(domain.sizes)
+
+    mark = domain.mark()
+    domain.remove(1, 0)
+    domain.reduce(2, 3)
+    domain.remove(0, 3)
+    assert sorted(domain.changed(mark)) == [0, 1, 2]
+
+    assert sorted(domain.undo(mark)) == [0, 1, 2]
+    assert domain.bits == bits
+    assert domain.sizes == sizes
+    assert domain.mark() == mark
+    assert domain.changed(mark) == []
+
+
+def test_nested_marks_undo_in_order():
+    domain = DOMAIN(2, 3)
+    outer = domain.mark()
+    domain.remove(0, 0)
+    inner = domain.mark()
+    domain.reduce(1, 2)
+
+    domain.undo(inner)
+    assert domain.values(0) == [1, 2]
+    assert domain.values(1) == [0, 1, 2]
+
+    domain.undo(outer)
+    assert domain.values(0) == [0, 1, 2]
+    assert domain.sizes == [3, 3]
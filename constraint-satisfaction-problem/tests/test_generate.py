@@ -0,0 +1,54 @@
+import pytest
+import generate
+import solver
+from graph import parse_graph
+"""Tests of the instance generators"""
+
+
+@pytest.mark.parametrize('kind', generate.KINDS)
+@pytest.mark.parametrize('planted', (False, True))
+def test_generators_are_reproducible(kind, planted):
+    first = generate.generate(kind, 80, 3, 7, planted=planted)
+
+    assert first == generate.generate(kind, 80, 3, 7, planted=planted)
+    assert first != generate.generate(kind, 80, 3, 8, planted=planted)
+    assert first == sorted(set(first))
+    assert all(0 <= x < y < 80 for (x, y) in first)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_planted_instances_are_satisfiable(make_graph, valid, seed):
+    edges = generate.threshold(100, 3, seed, planted=True)
+    graph = make_graph(100, 3, edges)
+
+    result = solver.solve(graph, None, 'dfsb1', None, seed)
+
+    assert len(edges) == round(generate.THRESHOLDS[3] * 100 / 2)
+    assert result['status'] == 'solved'
+    assert valid(graph, result['assignment'])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_delaunay_maps_are_planar_triangulations(seed):
+    edges = generate.delaunay(50, 4, seed)
+
+    # a planar graph has at most 3X - 6 edges, a triangulation close to it
+    assert 2 * 50 <= len(edges) <= 3 * 50 - 6
+    assert len(generate.delaunay(50, 4, seed, 0.5)) < len(edges)
+
+
+def test_written_problems_parse_back(tmp_path):
+    path = str(tmp_path / 'problem.txt')
+    edges = generate.erdos_renyi(30, 4, 3.0, 1)
+    generate.write_problem(path, 30, 4, edges)
+
+    graph = parse_graph(path)
+
+    assert (graph.X, graph.D, graph.E) == (30, 4, len(edges))
+    assert sorted((x, y) for x in range(30) for y in graph.neighbours(x)
+                  if x < y) == edges
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        generate.generate('grid', 10, 3)
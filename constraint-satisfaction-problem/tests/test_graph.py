@@ -0,0 +1,173 @@
+import os
+import itertools
+import pytest
+import generate
+import solver
+from graph import cache_path, color_peeled, degeneracy_order, k_core, \
+    load_graph, read_cache, subgraph
+"""Tests of the graph loader and its binary cache"""
+
+LOADS = (
+    ('text', False, False),
+    ('cache', True, False),
+    ('mmap', False, True),
+)
+
+
+def write_problem(tmp_path, X=50, D=3, seed=0):
+    path = str(tmp_path / 'problem.txt')
+    generate.write_problem(path, X, D, generate.threshold(X, D, seed))
+
+    return path
+
+
+def same_graph(graph, expected):
+    assert (graph.X, graph.D, graph.E) == (expected.X, expected.D, expected.E)
+    for variable in range(expected.X):
+        assert list(graph.neighbours(variable)) == \
+            list(expected.neighbours(variable))
+        assert graph.degree(variable) == expected.degree(variable)
+    assert [list(row) for row in graph.adjacency()] == expected.adjacency()
+
+
+@pytest.mark.parametrize('name,cache,mapped', LOADS)
+def test_every_load_gives_the_same_graph(tmp_path, name, cache, mapped):
+    path = write_problem(tmp_path)
+    expected = load_graph(path)
+
+    # the first load writes the cache, the second one reads it
+    for _ in range(2):
+        graph = load_graph(path, cache, mapped)
+        same_graph(graph, expected)
+        assert graph.is_mapped() == mapped
+
+    assert os.path.exists(cache_path(path)) == (cache or mapped)
+
+
+@pytest.mark.parametrize('name,cache,mapped', LOADS[1:])
+def test_stale_cache_is_rebuilt(tmp_path, name, cache, mapped):
+    path = write_problem(tmp_path, seed=0)
+    load_graph(path, cache, mapped)
+
+    write_problem(tmp_path, X=60, seed=1)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    same_graph(load_graph(path, cache, mapped), load_graph(path))
+
+
+@pytest.mark.parametrize('name,cache,mapped', LOADS[1:])
+@pytest.mark.parametrize('corrupt', ('garbage', 'truncated'))
+def test_corrupt_cache_falls_back_to_the_text_file(tmp_path, name, cache,
+                                                   mapped, corrupt):
+    path = write_problem(tmp_path)
+    load_graph(path, True)
+    with open(cache_path(path), 'rb') as fp:
+        data = fp.read()
+
+    with open(cache_path(path), 'wb') as fp:
+        if corrupt == 'garbage':
+            fp.write(b'not a graph cache')
+        else:
+            fp.write(data[:len(data) - 16])
+
+    same_graph(load_graph(path, cache, mapped), load_graph(path))
+    # and the cache was rewritten
+    assert read_cache(cache_path(path)) is not None
+
+
+def naive_degeneracy(graph):
+    '''
+    largest minimum degree seen while removing a variable of minimum degree
+    over and over, O(X^2)
+    '''
+    left = set(range(graph.X))
+    ret = 0
+
+    while left:
+        degree = dict((variable, sum(1 for neighbour in
+                                     graph.neighbours(variable)
+                                     if neighbour in left and
+                                     neighbour != variable))
+                      for variable in left)
+        variable = min(left, key=degree.__getitem__)
+        ret = max(ret, degree[variable])
+        left.remove(variable)
+
+    return ret
+
+
+def graphs():
+    yield 'path', 6, [(x, x + 1) for x in range(5)], 1
+    yield 'cycle', 7, [(x, (x + 1) % 7) for x in range(7)], 2
+    yield 'K5', 5, list(itertools.combinations(range(5), 2)), 4
+    yield 'isolated', 4, [], 0
+    for seed in range(3):
+        yield 'delaunay', 80, generate.delaunay(80, 4, seed), None
+        yield 'threshold', 80, generate.threshold(80, 3, seed), None
+
+
+@pytest.mark.parametrize('kind,X,edges,degeneracy', list(graphs()))
+def test_degeneracy_order_bounds_the_back_degree(make_graph, kind, X, edges,
+                                                 degeneracy):
+    graph = make_graph(X, 4, edges)
+    if degeneracy is None:
+        degeneracy = naive_degeneracy(graph)
+
+    order = degeneracy_order(graph)
+
+    assert sorted(order) == list(range(X))
+    position = dict((variable, idx) for (idx, variable) in enumerate(order))
+    back = [sum(1 for neighbour in graph.neighbours(variable)
+                if position[neighbour] < position[variable])
+            for variable in order]
+    assert max(back, default=0) <= degeneracy
+    if kind == 'delaunay':
+        # planar maps are 5-degenerate
+        assert degeneracy <= 5
+
+
+@pytest.mark.parametrize('kind,X,edges,degeneracy', list(graphs()))
+@pytest.mark.parametrize('D', (2, 3, 4))
+def test_k_core_peels_only_variables_of_low_degree(make_graph, kind, X,
+                                                   edges, degeneracy, D):
+    graph = make_graph(X, D, edges)
+
+    core, peeled = k_core(graph, D)
+
+    assert sorted(core + peeled) == list(range(X))
+    left = set(range(X))
+    for variable in peeled:
+        assert sum(1 for neighbour in graph.neighbours(variable)
+                   if neighbour in left) < D
+        left.remove(variable)
+    assert left == set(core)
+    for variable in core:
+        assert sum(1 for neighbour in graph.neighbours(variable)
+                   if neighbour in left) >= D
+
+
+def test_k_core_keeps_self_loops(make_graph):
+    core, peeled = k_core(make_graph(3, 3, [(0, 1), (2, 2)]), 3)
+
+    assert core == [2]
+    assert sorted(peeled) == [0, 1]
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('D', (3, 4))
+def test_color_peeled_extends_a_core_coloring(make_graph, valid, seed, D):
+    # both colorable: a planar map with 4 colors, a planted instance with 3
+    if D == 4:
+        edges = generate.delaunay(80, D, seed)
+    else:
+        edges = generate.threshold(80, D, seed, planted=True)
+    graph = make_graph(80, D, edges)
+    core, peeled = k_core(graph, D)
+    result = solver.solve(subgraph(graph, core), None, 'dfsb1', None, seed)
+
+    assert peeled
+    assert result['status'] == 'solved'
+    assert valid(subgraph(graph, core), result['assignment'])
+    assert valid(graph, color_peeled(graph, core, result['assignment'],
+                                     peeled))
@@ -0,0 +1,125 @@
+import random
+import itertools
+import pytest
+import generate
+import solver
+from incremental import ALGORITHMS, INCREMENTAL
+"""Tests of re-solving after edits of the map"""
+
+
+def solved(graph, seed=0):
+    result = solver.solve(graph, None, 'dfsb1', None, seed)
+    assert result['status'] == 'solved'
+
+    return result['assignment']
+
+
+def random_edit(problem, rng):
+    '''
+    returns an edit adding chords between variables two constraints apart,
+    removing a few constraints and adding two connected variables
+    '''
+    add = []
+    for _ in range(4):
+        x = rng.randrange(problem.X)
+        if problem.adjacency[x]:
+            middle = rng.choice(sorted(problem.adjacency[x]))
+            y = rng.choice(sorted(problem.adjacency[middle]))
+            if y != x:
+                add.append((x, y))
+    remove = []
+    for _ in range(2):
+        x = rng.randrange(problem.X)
+        if problem.adjacency[x]:
+            remove.append((x, rng.choice(sorted(problem.adjacency[x]))))
+    X = problem.X + 2
+    add += [(X - 2, rng.randrange(X - 2)), (X - 2, X - 1),
+            (X - 1, rng.randrange(X - 2))]
+
+    return add, remove, X
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+@pytest.mark.parametrize('seed', range(3))
+def test_repair_agrees_with_a_full_solve(make_graph, valid, algorithm, seed):
+    graph = make_graph(80, 4, generate.delaunay(80, 4, seed))
+    problem = INCREMENTAL(graph, solved(graph, seed), algorithm=algorithm)
+    rng = random.Random(seed)
+
+    for step in range(6):
+        ret = problem.resolve(*random_edit(problem, rng), timeout=None,
+                              seed=step)
+        edited = problem.graph()
+        expected = solver.solve(edited, None, 'dfsb1', None, step, peel=True)
+
+        if ret['status'] == 'solved':
+            assert valid(edited, ret['assignment'])
+            assert expected['status'] == 'solved'
+        elif algorithm == 'minconflicts':
+            assert ret['status'] == 'failed'
+        else:
+            assert ret['status'] == expected['status']
+        if expected['status'] != 'solved':
+            break
+
+
+@pytest.mark.parametrize('algorithm', ('dfsb0', 'dfsb1', 'dfsb2'))
+def test_region_grows_until_unsatisfiable(make_graph, algorithm):
+    # a planar map is 4-colorable, a clique of 5 of its variables is not
+    graph = make_graph(60, 4, generate.delaunay(60, 4, 2))
+    problem = INCREMENTAL(graph, solved(graph), algorithm=algorithm)
+
+    ret = problem.resolve(add=itertools.combinations(range(5), 2),
+                          timeout=None)
+
+    assert ret['status'] == 'unsatisfiable'
+    assert ret['assignment'] is None
+    # every layer of neighbours up to the whole connected map was searched
+    assert ret['region'] == problem.X
+
+
+def test_unsolved_edit_is_repaired_by_the_next_one(make_graph, valid):
+    graph = make_graph(60, 4, generate.delaunay(60, 4, 3))
+    problem = INCREMENTAL(graph, solved(graph))
+    clique = list(itertools.combinations(range(5), 2))
+
+    assert problem.resolve(add=clique, timeout=None)['status'] == \
+        'unsatisfiable'
+    ret = problem.resolve(remove=clique[:1], timeout=None)
+
+    assert ret['status'] == 'solved'
+    assert valid(problem.graph(), ret['assignment'])
+
+
+def test_self_loops_are_unsatisfiable(make_graph):
+    graph = make_graph(3, 3, [(0, 1), (1, 2)])
+    problem = INCREMENTAL(graph, [0, 1, 0])
+
+    assert problem.resolve(add=[(2, 2)])['status'] == 'unsatisfiable'
+    assert problem.resolve(remove=[(2, 2)])['status'] == 'solved'
+
+
+def test_shrinking_drops_variables_and_their_constraints(make_graph):
+    graph = make_graph(4, 2, [(0, 1), (1, 2), (2, 3)])
+    problem = INCREMENTAL(graph, [0, 1, 0, 1])
+
+    ret = problem.resolve(add=[(0, 2)], X=3, timeout=None)
+
+    assert problem.X == 3
+    assert ret['status'] == 'unsatisfiable'
+    assert problem.adjacency[2] == set([0, 1])
+
+
+def test_invalid_edit_changes_nothing(make_graph):
+    graph = make_graph(4, 3, [(0, 1), (1, 2), (2, 3)])
+    problem = INCREMENTAL(graph, [0, 1, 0, 1])
+    before = ([set(neighbours) for neighbours in problem.adjacency],
+              list(problem.assignment), set(problem.dirty))
+
+    with pytest.raises(ValueError):
+        problem.edit(add=[(0, 2), (0, 5)], remove=[(0, 1)], X=5)
+    with pytest.raises(ValueError):
+        problem.edit(remove=[(0, 1), (3, 0)], X=3)
+
+    assert before == ([set(neighbours) for neighbours in problem.adjacency],
+                      list(problem.assignment), set(problem.dirty))
@@ -0,0 +1,261 @@
+import sys
+import random
+import pytest
+import generate
+import minconflicts
+from checkpoint import CHECKPOINT
+"""Tests of the min-conflicts engines"""
+
+numpy_only = pytest.mark.skipif(minconflicts.np is None,
+                                reason='NumPy is not installed')
+
+
+def run(engine, graph, seed, max_steps=1000000):
+    random.seed(seed)
+    csp = minconflicts.CSP(graph, None, initializer='random')
+
+    return csp, engine.main_process(csp, max_steps)
+
+
+@numpy_only
+@pytest.mark.parametrize('seed', range(3))
+def test_numpy_engine_returns_a_valid_coloring(make_graph, valid, seed):
+    graph = make_graph(60, 4, generate.delaunay(60, 4, seed))
+
+    csp, ret = run(minconflicts.NUMPY_MINCONFLICTS(), graph, seed)
+
+    assert csp.goal_test(ret)
+    assert valid(graph, ret)
+    # the best-so-far is the solution, not the last improvement before it
+    assert csp.best_conflicts == 0
+    assert valid(graph, csp.best)
+
+
+@numpy_only
+@pytest.mark.parametrize('seed', range(3))
+def test_numpy_engine_agrees_on_an_unsatisfiable_map(make_graph, seed):
+    # a planar map with a clique of 5 of its variables needs 5 colors
+    edges = generate.delaunay(40, 4, seed) + \
+        [(x, y) for x in range(5) for y in range(x + 1, 5)]
+    graph = make_graph(40, 4, edges)
+
+    python, expected = run(minconflicts.MINCONFLICTS(), graph, seed, 2000)
+    numpy, ret = run(minconflicts.NUMPY_MINCONFLICTS(), graph, seed, 200)
+
+    assert not python.goal_test(expected)
+    assert not numpy.goal_test(ret)
+    assert python.best_conflicts > 0
+    assert numpy.best_conflicts > 0
+
+
+@pytest.mark.parametrize('engine', ('python', 'numpy'))
+def test_steps_count_iterations_across_resumes(tmp_path, make_graph, engine):
+    if engine == 'numpy' and minconflicts.np is None:
+        pytest.skip('NumPy is not installed')
+    make_engine = minconflicts.MINCONFLICTS if engine == 'python' else \
+        minconflicts.NUMPY_MINCONFLICTS
+    # unsatisfiable, so every run uses all of its steps
+    graph = make_graph(200, 3, generate.threshold(200, 3, 1))
+    checkpoint = CHECKPOINT(str(tmp_path / 'search.ck'), engine)
+
+    searcher = make_engine()
+    csp, _ = run(searcher, graph, 0, 300)
+    assert csp.counter == 300
+    checkpoint.save(searcher, csp)
+
+    resumed = minconflicts.CSP(graph, None, initializer='random')
+    searcher = make_engine()
+    assert checkpoint.load(searcher, resumed)
+    searcher.main_process(resumed, 200)
+    assert resumed.counter == 500
+
+
+@pytest.mark.parametrize('engine', minconflicts.ENGINES)
+def test_peel_writes_a_coloring_of_the_whole_map(tmp_path, monkeypatch,
+                                                 make_graph, valid, engine):
+    if engine == 'numpy' and minconflicts.np is None:
+        pytest.skip('NumPy is not installed')
+    # 10 variables are peeled off, the other 50 searched
+    edges = generate.delaunay(60, 4, 0)
+    input_file = str(tmp_path / 'map.txt')
+    output_file = str(tmp_path / 'map.out')
+    generate.write_problem(input_file, 60, 4, edges)
+    monkeypatch.setattr(sys, 'argv', ['minconflicts.py', input_file,
+                                      output_file, '--peel', '--engine',
+                                      engine])
+
+    minconflicts.main()
+
+    with open(output_file) as fp:
+        assignment = [int(line) for line in fp]
+    assert valid(make_graph(60, 4, edges), assignment)
+
+
+@pytest.mark.parametrize('policy', ('fifo', 'lru'))
+def test_tabu_memory_is_bounded_and_evicts_by_policy(policy):
+    tabu = minconflicts.TABU(capacity=3, policy=policy)
+    assert all(tabu.visit(key) for key in (1, 2, 3))
+    # a hit refreshes the key under lru only
+    assert not tabu.visit(1)
+
+    assert tabu.visit(4)
+
+    assert len(tabu) == 3
+    if policy == 'fifo':
+        assert list(tabu.visited) == [2, 3, 4]
+        assert tabu.visit(1)
+    else:
+        assert list(tabu.visited) == [3, 1, 4]
+        assert not tabu.visit(1)
+        assert tabu.visit(2)
+    assert len(tabu) == 3
+
+
+def test_tabu_without_capacity_remembers_nothing():
+    tabu = minconflicts.TABU(capacity=0)
+
+    assert tabu.visit(1)
+    assert tabu.visit(1)
+    assert len(tabu) == 0
+
+
+def test_tabu_tenure_expires():
+    tabu = minconflicts.TABU(tenure=5)
+    tabu.forbid(3, 1, 10)
+
+    assert tabu.forbidden(3, 1, 10)
+    assert tabu.forbidden(3, 1, 14)
+    assert not tabu.forbidden(3, 1, 15)
+    assert not tabu.forbidden(3, 2, 10)
+    assert not tabu.forbidden(2, 1, 10)
+
+    untimed = minconflicts.TABU(tenure=0)
+    untimed.forbid(3, 1, 10)
+    assert not untimed.forbidden(3, 1, 10)
+
+
+def test_tabu_rejects_unknown_policies():
+    with pytest.raises(ValueError):
+        minconflicts.TABU(policy='lifo')
+
+
+def test_incremental_hash_and_conflicts_match_a_recomputation(make_graph):
+    graph = make_graph(60, 4, generate.threshold(60, 4, 0))
+    random.seed(0)
+    csp = minconflicts.CSP(graph, None, initializer='random')
+    rng = random.Random(0)
+
+    for _ in range(500):
+        csp.assign_value(rng.randrange(60), rng.randrange(4))
+
+        incremental = (csp.hash, csp.violations, sorted(csp.conflicted),
+                       [list(row) for row in csp.conflicts])
+        csp.rehash()
+        csp.init_conflicts()
+        assert incremental == (csp.hash, csp.violations,
+                               sorted(csp.conflicted), csp.conflicts)
+
+
+def test_tabu_flags_are_used_by_main(tmp_path, monkeypatch):
+    input_file = str(tmp_path / 'map.txt')
+    generate.write_problem(input_file, 40, 4, generate.delaunay(40, 4, 0))
+    argv = ['minconflicts.py', input_file, str(tmp_path / 'map.out'),
+            '--tabu-size', '7', '--tabu-policy', 'lru', '--tabu-tenure', '3']
+    engines = []
+    monkeypatch.setattr(sys, 'argv', argv)
+    monkeypatch.setattr(minconflicts.MINCONFLICTS, 'main_process',
+                        lambda self, csp: engines.append(self) or csp.assign)
+
+    minconflicts.main()
+
+    tabu = engines[0].tabu_list
+    assert (tabu.capacity, tabu.policy, tabu.tenure) == (7, 'lru', 3)
+
+
+def conflicts_of(graph, assignment):
+    return sum(1 for variable in range(graph.X)
+               for neighbour in graph.neighbours(variable)
+               if variable < neighbour and
+               assignment[variable] == assignment[neighbour])
+
+
+@pytest.mark.parametrize('initializer', ('greedy', 'dsatur'))
+@pytest.mark.parametrize('seed', range(3))
+def test_greedy_initializers_color_sparse_maps(make_graph, initializer,
+                                               seed):
+    # a planar map is 5-degenerate, so greedy coloring in degeneracy order
+    # never needs more than 6 colors; DSatur colors it with 6 as well
+    graph = make_graph(100, 6, generate.delaunay(100, 6, seed))
+    random.seed(seed)
+
+    csp = minconflicts.CSP(graph, None, initializer=initializer)
+
+    assert sorted(csp.assign) == list(range(100))
+    assert all(0 <= value < 6 for value in csp.assign.values())
+    assert conflicts_of(graph, csp.assign) == 0
+    assert csp.conflicted == []
+    assert csp.best_conflicts == 0
+
+
+@pytest.mark.parametrize('initializer', minconflicts.INITIALIZERS)
+def test_restart_draws_a_new_consistent_assignment(make_graph, initializer):
+    graph = make_graph(200, 3, generate.threshold(200, 3, 0))
+    random.seed(0)
+    csp = minconflicts.CSP(graph, None, initializer=initializer)
+    before = dict(csp.assign)
+
+    csp.restart()
+
+    assert csp.restart_counter == 1
+    assert csp.assign != before
+    incremental = (csp.hash, csp.violations, sorted(csp.conflicted),
+                   csp.conflicts)
+    csp.rehash()
+    csp.init_conflicts()
+    assert incremental == (csp.hash, csp.violations, sorted(csp.conflicted),
+                           csp.conflicts)
+    assert csp.violations == conflicts_of(graph, csp.assign)
+
+
+@pytest.mark.parametrize('initializer', minconflicts.INITIALIZERS)
+def test_python_engine_solves_with_every_initializer(tmp_path, monkeypatch,
+                                                    make_graph, valid,
+                                                    initializer):
+    edges = generate.threshold(60, 3, 0, planted=True)
+    input_file = str(tmp_path / 'map.txt')
+    output_file = str(tmp_path / 'map.out')
+    generate.write_problem(input_file, 60, 3, edges)
+    random.seed(0)
+    monkeypatch.setattr(sys, 'argv', ['minconflicts.py', input_file,
+                                      output_file, '--init', initializer])
+
+    minconflicts.main()
+
+    with open(output_file) as fp:
+        assignment = [int(line) for line in fp]
+    assert valid(make_graph(60, 3, edges), assignment)
+
+
+def test_main_process_restarts_once_stuck(make_graph):
+    # K4 with 3 colors: every state is soon visited, so moves stop finding
+    # new ones
+    graph = make_graph(4, 3, [(x, y) for x in range(4) for y in range(x)])
+    csp, ret = run(minconflicts.MINCONFLICTS(), graph, 0, 5000)
+
+    assert not csp.goal_test(ret)
+    assert csp.restart_counter > 0
+
+
+def test_numpy_engine_needs_no_conflict_tables(make_graph, valid):
+    if minconflicts.np is None:
+        pytest.skip('NumPy is not installed')
+    graph = make_graph(60, 4, generate.delaunay(60, 4, 0))
+    random.seed(0)
+    csp = minconflicts.CSP(graph, None, initializer='random', tables=False)
+
+    assert csp.zobrist is None
+    assert csp.best_conflicts == conflicts_of(graph, csp.assign) > 0
+    ret = minconflicts.NUMPY_MINCONFLICTS().main_process(csp)
+
+    assert valid(graph, ret)
+    assert csp.best_conflicts == 0
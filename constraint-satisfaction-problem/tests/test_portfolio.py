@@ -0,0 +1,67 @@
+import sys
+import time
+import multiprocessing
+import pytest
+import generate
+import portfolio
+from graph import load_graph
+"""Tests of the parallel solver portfolio"""
+
+# the slow worker below is patched into the workers by forking them
+pytestmark = pytest.mark.skipif(
+    sys.platform == 'win32' or
+    multiprocessing.get_start_method(allow_none=False) != 'fork',
+    reason='workers are not forked')
+
+
+def write_map(tmp_path, X=60, D=4, seed=0):
+    path = str(tmp_path / 'map.txt')
+    generate.write_problem(path, X, D, generate.delaunay(X, D, seed))
+
+    return path
+
+
+def test_portfolio_returns_a_valid_coloring(tmp_path, valid):
+    path = write_map(tmp_path)
+
+    ret = portfolio.PORTFOLIO(2, seed=0).search(path, 30)
+
+    assert valid(load_graph(path), ret)
+    assert multiprocessing.active_children() == []
+
+
+def test_portfolio_terminates_the_other_workers(tmp_path, valid,
+                                                monkeypatch):
+    path = write_map(tmp_path)
+    run_solver = portfolio.run_solver
+
+    def slow_dfsb(algorithm, *args):
+        if algorithm == 'dfsb':
+            time.sleep(60)
+        return run_solver(algorithm, *args)
+
+    monkeypatch.setattr(portfolio, 'run_solver', slow_dfsb)
+    start = time.monotonic()
+
+    engine = portfolio.PORTFOLIO(2, seed=0)
+    ret = engine.search(path, 30)
+
+    assert time.monotonic() - start < 20
+    assert engine.winner[0] == 'minconflicts'
+    assert valid(load_graph(path), ret)
+    assert multiprocessing.active_children() == []
+
+
+def test_main_writes_no_answer(tmp_path, monkeypatch):
+    # an odd cycle needs 3 colors
+    path = str(tmp_path / 'cycle.txt')
+    output = str(tmp_path / 'cycle.out')
+    generate.write_problem(path, 5, 2, [(x, (x + 1) % 5) for x in range(5)])
+    monkeypatch.setattr(sys, 'argv', ['portfolio.py', path, output,
+                                      '--workers', '2', '--algorithms',
+                                      'dfsb', '--seed', '0'])
+
+    portfolio.main()
+
+    with open(output) as fp:
+        assert fp.read() == 'No answer'
@@ -0,0 +1,170 @@
+import json
+import asyncio
+import tempfile
+import itertools
+import os
+import time
+import pytest
+import server
+from server import JOB, SERVER
+"""Tests of the solve server"""
+
+
+def cycle(X):
+    return [[variable, (variable + 1) % X] for variable in range(X)]
+
+
+# K5 with 4 colors: local search never finds an answer and runs until it is
+# cancelled
+HARD = {
+    'X': 5, 'D': 4,
+    'edges': [list(edge) for edge in itertools.combinations(range(5), 2)]
+}
+
+
+class CLIENT:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, line):
+        self.writer.write(line.encode() + b'\n')
+        await self.writer.drain()
+
+        return json.loads(await self.reader.readline())
+
+    async def request(self, **request):
+        return await self.send(json.dumps(request))
+
+
+async def session(workers, scenario):
+    '''
+    run scenario(client, server) against a server on a Unix socket
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'solve.sock')
+        solve_server = SERVER(workers)
+        task = asyncio.ensure_future(solve_server.serve(path))
+        for _ in range(100):
+            if os.path.exists(path):
+                break
+            await asyncio.sleep(0.05)
+
+        reader, writer = await asyncio.open_unix_connection(path)
+        try:
+            await scenario(CLIENT(reader, writer), solve_server)
+        finally:
+            writer.close()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+def test_solve_round_trip(make_graph, valid):
+    async def scenario(client, solve_server):
+        submitted = await client.request(
+            op='submit', problem={'X': 6, 'D': 3, 'edges': cycle(6)},
+            seed=0)
+        ret = await client.request(op='result', id=submitted['id'])
+
+        assert ret['status'] == 'solved'
+        assert valid(make_graph(6, 3, cycle(6)), ret['assignment'])
+        # the result was delivered, so the job is gone
+        assert submitted['id'] not in solve_server.jobs
+        assert (await client.request(op='status', id=submitted['id'])) == \
+            {'error': 'unknown job: %d' % submitted['id']}
+
+        submitted = await client.request(
+            op='submit', problem={'X': 6, 'D': 2, 'edges': cycle(5)},
+            algorithm='dfsb2', peel=True)
+        ret = await client.request(op='result', id=submitted['id'])
+
+        assert ret['status'] == 'unsatisfiable'
+        assert ret['core'] == 5
+
+    asyncio.run(session(1, scenario))
+
+
+def test_cancel_queued_and_running_jobs():
+    async def scenario(client, solve_server):
+        running = await client.request(op='submit', problem=HARD,
+                                       algorithm='minconflicts', timeout=30)
+        queued = await client.request(op='submit', problem=HARD,
+                                      algorithm='minconflicts', timeout=30)
+        for _ in range(100):
+            status = await client.request(op='status', id=running['id'])
+            if status['status'] == 'running':
+                break
+            await asyncio.sleep(0.05)
+
+        assert status['status'] == 'running'
+        ret = await client.request(op='cancel', id=queued['id'])
+        assert ret['status'] == 'cancelled'
+
+        start = time.monotonic()
+        await client.request(op='cancel', id=running['id'])
+        ret = await client.request(op='result', id=running['id'])
+        assert ret['status'] == 'cancelled'
+        assert time.monotonic() - start < 10
+        assert (await client.request(op='jobs')) == {'jobs': []}
+
+    asyncio.run(session(1, scenario))
+
+
+def test_bad_requests_get_an_error():
+    async def scenario(client, solve_server):
+        for line in ('{"op": "status"', '[1, 2]', '"x"'):
+            assert 'invalid request' in (await client.send(line))['error']
+
+        assert 'error' in await client.request(op='submit')
+        assert 'error' in await client.request(op='status', id='1')
+        assert 'error' in await client.request(op='status', id=99)
+        submitted = await client.request(op='submit', problem={'D': 3})
+        assert (await client.request(op='frobnicate',
+                                     id=submitted['id'])) == \
+            {'error': "unknown op: 'frobnicate'"}
+        assert (await client.request(op='frobnicate')) == \
+            {'error': "unknown op: 'frobnicate'"}
+        assert (await client.request()) == {'error': 'unknown op: None'}
+        assert (await client.request(op='status')) == \
+            {'error': 'invalid request: id must be an integer'}
+
+        ret = await client.request(op='result', id=submitted['id'])
+        assert ret['status'] == 'error'
+
+    asyncio.run(session(1, scenario))
+
+
+def test_finished_jobs_expire_after_the_ttl():
+    solve_server = SERVER(1, ttl=10)
+    try:
+        old = JOB(1, None, {})
+        old.finish('solved', {'assignment': []})
+        old.finished -= 11
+        recent = JOB(2, None, {})
+        recent.finish('solved', {'assignment': []})
+        running = JOB(3, None, {})
+        running.status = 'running'
+        for job in (old, recent, running):
+            solve_server.jobs[job.id] = job
+
+        solve_server.prune()
+
+        assert sorted(solve_server.jobs) == [2, 3]
+    finally:
+        solve_server.pool.shutdown()
+
+
+@pytest.mark.parametrize('options,expected', (
+    ({}, False), ({'peel': True}, True)))
+def test_run_job_forwards_peel(monkeypatch, options, expected):
+    calls = []
+    monkeypatch.setattr(server, 'FLAGS', [0])
+    monkeypatch.setattr(server.solver, 'solve',
+                        lambda *args: calls.append(args) or {'status': 'x'})
+
+    server.run_job(0, None, options)
+
+    assert calls[0][6] is expected
@@ -0,0 +1,145 @@
+import io
+import json
+import random
+import argparse
+import itertools
+import pytest
+import generate
+import minconflicts
+import solver
+from deadline import DEADLINE
+"""Tests of the solve() API and the batch mode"""
+
+
+def cycle(X):
+    return [(variable, (variable + 1) % X) for variable in range(X)]
+
+
+@pytest.mark.parametrize('algorithm', solver.ALGORITHMS)
+def test_solve_returns_a_valid_coloring(make_graph, valid, algorithm):
+    if algorithm == 'numpy' and minconflicts.np is None:
+        pytest.skip('NumPy is not installed')
+    graph = make_graph(40, 4, generate.delaunay(40, 4, 0))
+
+    result = solver.solve(graph, None, algorithm, 30, seed=0)
+
+    assert result['status'] == 'solved'
+    assert valid(graph, result['assignment'])
+
+
+@pytest.mark.parametrize('algorithm', ('dfsb0', 'dfsb1', 'dfsb2'))
+def test_solve_reports_unsatisfiable(algorithm):
+    # an odd cycle needs 3 colors
+    problem = {'X': 5, 'D': 2, 'edges': cycle(5)}
+
+    result = solver.solve(problem, algorithm=algorithm, timeout=None)
+
+    assert result['status'] == 'unsatisfiable'
+    assert result['assignment'] is None
+
+
+@pytest.mark.parametrize('algorithm', solver.ALGORITHMS)
+def test_solve_rejects_self_loops(algorithm):
+    if algorithm == 'numpy' and minconflicts.np is None:
+        pytest.skip('NumPy is not installed')
+    problem = {'X': 3, 'D': 2, 'edges': [(0, 1), (2, 2)]}
+
+    result = solver.solve(problem, algorithm=algorithm, timeout=5)
+
+    assert result['status'] == 'unsatisfiable'
+
+
+def test_minconflicts_stops_with_a_single_self_conflicted_variable(
+        make_graph):
+    graph = make_graph(3, 2, [(0, 1), (2, 2)])
+    random.seed(0)
+    csp = minconflicts.CSP(graph, None, initializer='random')
+    csp.deadline = DEADLINE(5)
+    engine = minconflicts.MINCONFLICTS()
+    engine.last_variable = 2
+
+    ret = engine.main_process(csp, 1000)
+
+    assert not csp.goal_test(ret)
+    assert csp.conflicted == [2]
+
+
+def test_solve_respects_the_timeout():
+    # K5 with 4 colors: local search never finds an answer and only stops
+    # after max_steps, far later than the deadline
+    X = 60
+    edges = list(itertools.combinations(range(5), 2)) + \
+        [(variable, variable + 1) for variable in range(5, X - 1)]
+    problem = {'X': X, 'D': 4, 'edges': edges}
+
+    result = solver.solve(problem, algorithm='minconflicts', timeout=0.2,
+                          seed=0)
+
+    assert result['status'] == 'timeout'
+    assert result['assignment'] is None
+    assert result['time'] < 5
+
+
+def test_solve_rejects_malformed_problems():
+    with pytest.raises(ValueError):
+        solver.solve({'D': 3}, timeout=None)
+    with pytest.raises(ValueError):
+        solver.solve({'X': 2, 'D': 3, 'edges': []}, algorithm='dfs')
+
+
+@pytest.mark.parametrize('problem,message', (
+    ({'D': 3, 'edges': []}, 'a problem needs X and edges'),
+    ([1, 2], 'a problem needs X and edges'),
+    ({'X': -1, 'D': 3, 'edges': []}, 'X must be a non-negative integer'),
+    ({'X': '3', 'D': 3, 'edges': []}, 'X must be a non-negative integer'),
+    ({'X': 3, 'D': '3', 'edges': []}, 'D must be an integer'),
+    ({'X': 3, 'D': 3, 'edges': 5}, 'edges must be a list'),
+    ({'X': 3, 'D': 3, 'edges': '01'}, 'edges must be a list'),
+    ({'X': 3, 'D': 3, 'edges': [[0, 1, 2]]}, 'an edge must be a pair'),
+    ({'X': 3, 'D': 3, 'edges': [[0, 'a']]}, 'an edge must be a pair'),
+    ({'X': 3, 'D': 3, 'edges': [7]}, 'an edge must be a pair'),
+    ({'X': 3, 'D': 3, 'edges': [[0, 3]]}, 'variable out of range'),
+    ({'X': 3, 'D': 0, 'edges': []}, 'at least one color'),
+))
+def test_as_graph_explains_malformed_problems(problem, message):
+    with pytest.raises(ValueError, match=message):
+        solver.as_graph(problem)
+
+
+def batch(lines, input_files=()):
+    args = argparse.Namespace(input_files=list(input_files), jsonl=True,
+                              colors=None, algorithm='dfsb1', timeout=10,
+                              seed=0, peel=False, output_dir=None)
+    out = io.StringIO()
+    solver.batch(args, io.StringIO(''.join(line + '\n' for line in lines)),
+                 out)
+
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_batch_writes_one_record_per_job(tmp_path, make_graph, valid):
+    input_file = str(tmp_path / 'triangle.txt')
+    generate.write_problem(input_file, 3, 3, cycle(3))
+    lines = [
+        json.dumps({'id': 'odd', 'X': 5, 'D': 2, 'edges': cycle(5)}),
+        json.dumps({'X': 4, 'D': 2, 'edges': cycle(4),
+                    'algorithm': 'dfsb2'}),
+        '',
+        '[1, 2]',
+        '"x"',
+        '{"X": 2',
+        json.dumps({'X': 2, 'edges': [[0, 1]], 'algorithm': 'dfs'}),
+    ]
+
+    records = batch(lines, [input_file])
+
+    assert [record['id'] for record in records] == \
+        [input_file, 'odd', 2, 4, 5, 6, 7]
+    assert records[0]['status'] == 'solved'
+    assert valid(make_graph(3, 3, cycle(3)), records[0]['assignment'])
+    assert records[1]['status'] == 'unsatisfiable'
+    assert records[2]['status'] == 'solved'
+    assert valid(make_graph(4, 2, cycle(4)), records[2]['assignment'])
+    assert all(record['status'] == 'error' for record in records[3:])
+    assert records[3]['error'] == 'invalid job: not an object'
+    assert records[5]['error'].startswith('invalid JSON')
@@ -0,0 +1,70 @@
+import io
+import json
+import random
+import generate
+import dfsb
+import minconflicts
+from stats import STATS
+"""Tests of the solver statistics"""
+
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_done_line_holds_fields_counters_and_phases(make_graph):
+    stream = io.StringIO()
+    stats = STATS(stream, solver='dfsb', mode=1, input='map.txt')
+    graph = make_graph(40, 4, generate.delaunay(40, 4, 0))
+
+    with stats.phase('preprocess'):
+        csp = dfsb.CSP(graph, None, 1)
+    stats.watch(csp)
+    with stats.phase('search'):
+        dfsb.DFSB().search(csp)
+    stats.emit('done', status='solved')
+
+    [record] = lines(stream)
+    assert record['event'] == 'done'
+    assert (record['solver'], record['mode'], record['input']) == \
+        ('dfsb', 1, 'map.txt')
+    assert record['status'] == 'solved'
+    assert record['elapsed'] >= record['phases']['search'] >= 0
+    assert sorted(record['phases']) == ['preprocess', 'search']
+    for (name, attribute) in dfsb.CSP.COUNTERS:
+        assert record[name] == getattr(csp, attribute)
+    assert record['nodes'] > 0
+
+
+def test_samples_are_written_every_interval(make_graph):
+    stream = io.StringIO()
+    stats = STATS(stream, 0, solver='minconflicts')
+    # unsatisfiable, so the search polls its deadline until max_steps
+    graph = make_graph(200, 3, generate.threshold(200, 3, 1))
+    random.seed(0)
+    csp = minconflicts.CSP(graph, None, initializer='random')
+    stats.watch(csp)
+
+    minconflicts.MINCONFLICTS().main_process(csp, 1024)
+    stats.emit('done', status='failed')
+
+    records = lines(stream)
+    # one poll every 256 steps
+    assert [record['event'] for record in records] == ['sample'] * 4 + \
+        ['done']
+    steps = [record['steps'] for record in records]
+    assert steps == sorted(steps) and steps[-1] == 1024
+    assert all(set(name for (name, _) in minconflicts.CSP.COUNTERS) <=
+               set(record) for record in records)
+
+
+def test_nothing_is_written_without_a_stream(make_graph):
+    stats = STATS(None, 0)
+    csp = dfsb.CSP(make_graph(3, 3, [(0, 1), (1, 2)]), None, 1)
+    stats.watch(csp)
+
+    stats.emit('done')
+
+    assert csp.stats is None
+    assert stats.counters() == dict((name, getattr(csp, attribute))
+                                    for (name, attribute) in csp.COUNTERS)